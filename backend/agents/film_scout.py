@@ -1,21 +1,28 @@
 """
 Movie recommendation logic
 """
+import asyncio
 import json
-from typing import List, Dict
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from core.config import GOOGLE_API_KEY
-
-REC_LLM = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    temperature=0.4,
-    google_api_key=GOOGLE_API_KEY
+import time
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Set, Tuple
+from core.cache import rec_cache
+from core.catalog import Catalog
+from core.config import (
+    HEDGE_FILMSCOUT, REC_BATCH_ENABLED, REC_BATCH_WINDOW_MS, REC_BATCH_MAX, CATALOG_MODE, CATALOG_MIN_HITS,
+    require_env,
 )
+from core.hedge import Hedger
+from core.limiter import PRIORITY_FILMSCOUT, priority_floor
+from core.logging import get_logger
+from core.metrics import metrics
+from core.registry import registry
+from utils.helpers import normalize_query
 
-REC_PROMPT = ChatPromptTemplate.from_messages([
-    ("system",
-     """You are FilmScout. Suggest **2-3** movies the user can *legally watch online*
+logger = get_logger("film_scout")
+_STAGE = {"stage": "recommend"}
+
+REC_SYSTEM = """You are FilmScout. Suggest **2-3** movies the user can *legally watch online*
 from sources like Archive.org, YouTube, Vimeo, or other public domain/Creative Commons sources.
 
 Focus on:
@@ -26,24 +33,209 @@ Focus on:
 
 Return EACH on its own JSON line, e.g.
 {{"title":"The Hitch-Hiker","year":1953,"why":"Public-domain noir classic on Archive.org"}}
-{{"title":"Plan 9 from Outer Space","year":1959,"why":"Ed Wood classic available on YouTube"}}"""),
-    ("human", "{question}")
-])
+{{"title":"Plan 9 from Outer Space","year":1959,"why":"Ed Wood classic available on YouTube"}}"""
+
+# Several questions in one call; each pick is tagged with its question number
+REC_BATCH_HUMAN = """Answer each numbered request below separately, following the
+instructions above. Add a "q" field with the request's number to every JSON
+line, e.g. {{"q":1,"title":"Detour","year":1945,"why":"Public-domain noir"}}
+
+{questions}"""
+
+def _build_rec_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from agents.llm import guarded
+    return guarded(ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        temperature=0.4,
+        google_api_key=require_env("GOOGLE_API_KEY")
+    ), PRIORITY_FILMSCOUT)
+
+registry.register("rec_llm", _build_rec_llm)
+
+_hedger = Hedger("filmscout")
+
+@lru_cache(maxsize=None)
+def rec_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", REC_SYSTEM),
+        ("human", "{question}")
+    ])
+
+async def _ask(question: str) -> str:
+    llm = registry.get("rec_llm")
+    messages = rec_prompt().format_prompt(question=question).to_messages()
+    if HEDGE_FILMSCOUT:
+        raw = await _hedger.acall(lambda: llm.ainvoke(messages))
+    else:
+        raw = await llm.ainvoke(messages)
+    return raw.content
+
+# Fields taken from a reply line; anything else the model adds (a "url",
+# a "catalog" flag) is dropped, so only catalog entries carry a source
+_PICK_FIELDS = ("q", "title", "year", "why")
+
+def _parse(text: str) -> List[Dict]:
+    """Movie dicts from the JSON lines of a reply; other lines are skipped"""
+    movies = []
+    for line in text.splitlines():
+        if not line.lstrip().startswith("{"):
+            continue
+        try:
+            m = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(m, dict) and "title" in m and "year" in m:
+            movies.append({k: m[k] for k in _PICK_FIELDS if k in m})
+    return movies
+
+async def _recommend_one(question: str) -> List[Dict]:
+    return _parse(await _ask(question))[:3]
+
+class RecBatcher:
+    """Coalesces concurrent recommendation requests into one Gemini call.
+
+    Requests arriving within ``window_ms`` of the first (or until ``max_size``
+    are waiting) go out as one numbered prompt sharing the system prompt;
+    the tagged reply lines are split back to each caller. A question with
+    no usable lines in the reply, or a batch whose call fails, falls back
+    to single-question calls. The batch runs at the most urgent priority
+    among its callers. Runs on the event loop.
+    """
+
+    def __init__(self, window_ms: float = REC_BATCH_WINDOW_MS, max_size: int = REC_BATCH_MAX):
+        self.window_s = window_ms / 1000
+        self.max_size = max_size
+        self._pending: List[Tuple[str, asyncio.Future, float, int]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def submit(self, question: str) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((question, fut, time.monotonic(), priority_floor.get()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._spawn(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float, int]]) -> None:
+        now = time.monotonic()
+        for _, _, queued, _ in batch:
+            # What batching cost each caller: time spent waiting for the window
+            metrics.observe("rec_batch_wait_ms", (now - queued) * 1000)
+        metrics.observe("rec_batch_size", len(batch))
+        priority_floor.set(min(floor for _, _, _, floor in batch))
+
+        if len(batch) == 1:
+            question, fut, _, _ = batch[0]
+            await self._settle(fut, _recommend_one(question))
+            return
+
+        by_q: Dict[int, List[Dict]] = {}
+        try:
+            questions = "\n".join(f"{i}. {q}" for i, (q, _, _, _) in enumerate(batch, 1))
+            started = time.monotonic()
+            text = await _ask(REC_BATCH_HUMAN.format(questions=questions))
+            # One call instead of len(batch); what it saved is roughly the
+            # other calls' latency had they been queued behind each other
+            metrics.inc("rec_batch_calls_saved_total", len(batch) - 1)
+            metrics.observe("rec_batch_call_ms", (time.monotonic() - started) * 1000)
+            for m in _parse(text):
+                try:
+                    by_q.setdefault(int(m.pop("q")), []).append(m)
+                except (KeyError, TypeError, ValueError):
+                    continue
+        except Exception as e:
+            logger.warning("Batched FilmScout call for %d questions failed: %s", len(batch), e, extra=_STAGE)
+
+        for i, (question, fut, _, _) in enumerate(batch, 1):
+            movies = by_q.get(i)
+            if movies:
+                if not fut.done():
+                    fut.set_result(movies[:3])
+            else:
+                metrics.inc("rec_batch_fallbacks_total")
+                self._spawn(self._settle(fut, _recommend_one(question)))
+
+    @staticmethod
+    async def _settle(fut: asyncio.Future, coro) -> None:
+        try:
+            result: Any = await coro
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(result)
+
+rec_batcher = RecBatcher() if REC_BATCH_ENABLED else None
+
+def _ground(catalog: Catalog, movies: List[Dict]) -> List[Dict]:
+    """Match picks to catalog entries: take the catalog's title and year,
+    attach its known URL, and move catalog-backed picks to the front"""
+    grounded = []
+    for m in movies:
+        film = catalog.lookup(m.get("title", ""), m.get("year"))
+        if film is None:
+            metrics.inc("catalog_grounded_total", result="unknown")
+            grounded.append(m)
+            continue
+        metrics.inc("catalog_grounded_total", result="url" if film.urls else "entry")
+        pick = {**m, "title": film.title, "year": film.year or m.get("year"), "catalog": True}
+        if film.urls:
+            pick["url"] = film.urls[0]
+        grounded.append(pick)
+    # Stable: known URL first, then known film, then the rest in LLM order
+    return sorted(grounded, key=lambda m: (not m.get("url"), not m.get("catalog")))
+
+async def _suggest(question: str) -> List[Dict]:
+    if rec_batcher is not None:
+        return await rec_batcher.submit(question)
+    return await _recommend_one(question)
 
 async def recommend_titles(question: str) -> List[Dict]:
-    raw = await REC_LLM.ainvoke(
-        REC_PROMPT.format_prompt(question=question).to_messages()
-    )
-
-    candidates = [
-        json.loads(line)
-        for line in raw.content.splitlines()
-        if line.lstrip().startswith("{")
-    ]
-
-    movies = [
-        m for m in candidates
-        if isinstance(m, dict) and "title" in m and "year" in m
-    ]
-
-    return movies[:3] 
\ No newline at end of file
+    key = normalize_query(question)
+    cached = rec_cache.get(key)
+    if cached is not None:
+        return [dict(m) for m in cached]
+
+    catalog = registry.get("catalog") if CATALOG_MODE != "off" else None
+    if not catalog:   # off, or nothing imported
+        movies = await _suggest(question)
+    else:
+        hits = await asyncio.to_thread(catalog.search, question)
+        if CATALOG_MODE == "retrieve" and len(hits) >= CATALOG_MIN_HITS:
+            metrics.inc("catalog_answers_total", result="retrieved")
+            movies = [f.pick() for f in hits]
+        else:
+            try:
+                movies = _ground(catalog, await _suggest(question))
+            except Exception as e:
+                if not hits:
+                    raise
+                logger.warning("FilmScout failed, answering from the catalog: %s", e, extra=_STAGE)
+                movies = []
+            if not movies and hits:
+                metrics.inc("catalog_answers_total", result="fallback")
+                movies = [f.pick() for f in hits]
+
+    if movies:
+        rec_cache.set(key, movies)
+    return [dict(m) for m in movies] 
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Chat model wrapper that guards every call with the Gemini circuit breaker
+and the global LLM limiter
+"""
+import time
+from typing import Any, Callable, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+
+from core.breaker import CircuitBreaker, CircuitOpenError, breakers
+from core.config import LLM_RATE_LIMIT
+from core.limiter import llm_limiter, estimate_tokens, is_throttle_error, priority_floor
+
+
+def _prompt_text(messages) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def _tokens_used(result: ChatResult):
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+class GuardedChatModel(BaseChatModel):
+    """Delegates to ``inner`` once the breaker and (optionally) the limiter
+    let the call through"""
+    inner: Any
+    priority: int
+    limit: bool = True
+    breaker_name: str = "gemini"
+
+    @property
+    def _llm_type(self) -> str:
+        return f"guarded-{self.inner._llm_type}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        breaker = _breaker(self.breaker_name)
+        permit = None
+        if self.limit:
+            priority = max(self.priority, priority_floor.get())
+            permit = llm_limiter.acquire_sync(priority, estimate_tokens(_prompt_text(messages)))
+        _admit(breaker, permit)
+        started = time.monotonic()
+        error = result = None
+        try:
+            result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _settle(breaker, permit, started, error, result)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        breaker = _breaker(self.breaker_name)
+        permit = None
+        if self.limit:
+            priority = max(self.priority, priority_floor.get())
+            permit = await llm_limiter.acquire(priority, estimate_tokens(_prompt_text(messages)))
+        _admit(breaker, permit)
+        started = time.monotonic()
+        error = result = None
+        try:
+            result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _settle(breaker, permit, started, error, result)
+
+
+def _breaker(name: str) -> CircuitBreaker:
+    """The named breaker; fails fast while it is open, without claiming the
+    half-open probe, which waits until the limiter admits the call"""
+    breaker = breakers.get(name)
+    if breaker.is_open:
+        breaker.check()
+    return breaker
+
+
+def _admit(breaker: CircuitBreaker, permit) -> None:
+    """Let the call through the breaker now it holds a permit; the permit
+    goes back if the breaker refuses"""
+    try:
+        breaker.check()
+    except CircuitOpenError:
+        if permit is not None:
+            llm_limiter.cancel(permit)
+        raise
+
+
+def _settle(breaker, permit, started: float, error: Optional[BaseException], result=None) -> None:
+    """Record a guarded call's outcome and give its permit back; runs on
+    every exit path, cancellation included"""
+    if error is not None and not isinstance(error, Exception):
+        # Cancelled (or interrupted): no verdict on the provider, but a
+        # cancelled half-open probe must not hold the breaker
+        breaker.cancel()
+        if permit is not None:
+            llm_limiter.cancel(permit)
+        return
+    breaker.record(error is None, time.monotonic() - started)
+    if permit is None:
+        return
+    if error is None:
+        llm_limiter.release(permit, tokens_used=_tokens_used(result) if result is not None else None)
+    else:
+        llm_limiter.release(permit, ok=False, throttled=is_throttle_error(error))
+
+
+def guarded_call(fn: Callable[[], Any], priority: int, prompt_text: str,
+                 breaker_name: str = "gemini") -> Any:
+    """Run a raw (non-LangChain) Gemini request behind the same breaker and
+    limiter as GuardedChatModel; blocks, so call it from a worker thread"""
+    breaker = _breaker(breaker_name)
+    permit = None
+    if LLM_RATE_LIMIT:
+        priority = max(priority, priority_floor.get())
+        permit = llm_limiter.acquire_sync(priority, estimate_tokens(prompt_text))
+    _admit(breaker, permit)
+    started = time.monotonic()
+    error = None
+    try:
+        return fn()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _settle(breaker, permit, started, error)
+
+
+def guarded(llm: BaseChatModel, priority: int) -> BaseChatModel:
+    """Wrap a chat model; LLM_RATE_LIMIT=0 keeps the breaker but skips the limiter"""
+    return GuardedChatModel(inner=llm, priority=priority, limit=LLM_RATE_LIMIT)
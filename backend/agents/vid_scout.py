@@ -2,30 +2,18 @@
 Video finding agent
 """
 import asyncio
-from langchain.agents import Tool, AgentExecutor
-from langchain.agents.react.agent import create_react_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
+import threading
+from typing import Optional
+from core.config import require_env, VIDSCOUT_PREFIX, VIDSCOUT_MODE
+from core.limiter import PRIORITY_VIDSCOUT
+from core.logging import get_logger
+from core.registry import registry
 from tools.search import search_exa
 from tools.validation import check_playable
-from core.config import GOOGLE_API_KEY, VIDSCOUT_PREFIX
 
-VID_LLM = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    temperature=0.3,
-    google_api_key=GOOGLE_API_KEY
-)
+logger = get_logger("vid_scout")
 
-tools = [
-    Tool(name="search_exa",
-         func=search_exa,
-         description="Search the web with Exa. Input: plain query string."),
-    Tool(name="check_playable",
-         func=check_playable,
-         description="HEAD-checks a URL. Returns 'OK' or 'BAD'.")
-]
-
-prompt_template = PromptTemplate.from_template("""
+PROMPT = """
 {prefix}
 
 You have access to the following tools:
@@ -47,24 +35,64 @@ Begin!
 
 Question: {input}
 Thought:{agent_scratchpad}
-""")
+"""
+
+MAX_ITERATIONS = 4
+
+def _build_vid_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from agents.llm import guarded
+    return guarded(ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        temperature=0.3,
+        google_api_key=require_env("GOOGLE_API_KEY")
+    ), PRIORITY_VIDSCOUT)
+
+def build_tools():
+    from langchain.agents import Tool
+    return [
+        Tool(name="search_exa",
+             func=search_exa,
+             description="Search the web with Exa. Input: plain query string."),
+        Tool(name="check_playable",
+             func=check_playable,
+             description="HEAD-checks a URL. Returns 'OK' or 'BAD'.")
+    ]
+
+def _build_vid_agent():
+    from langchain.agents import AgentExecutor
+    from langchain.agents.react.agent import create_react_agent
+    from langchain_core.prompts import PromptTemplate
 
-react_chain = create_react_agent(
-    llm=VID_LLM,
-    tools=tools,
-    prompt=prompt_template,
-)
+    tools = build_tools()
+    react_chain = create_react_agent(
+        llm=registry.get("vid_llm"),
+        tools=tools,
+        prompt=PromptTemplate.from_template(PROMPT),
+    )
+    return AgentExecutor(
+        agent=react_chain,
+        tools=tools,
+        verbose=False,
+        max_iterations=MAX_ITERATIONS,
+        handle_parsing_errors=True,
+    )
 
-vid_agent: AgentExecutor = AgentExecutor(
-    agent=react_chain,
-    tools=tools,
-    verbose=False,
-    max_iterations=4,
-    handle_parsing_errors=True,
-)
+registry.register("vid_llm", _build_vid_llm)
+registry.register("vid_agent", _build_vid_agent)
 
-async def run_vid_agent(prompt: str, callbacks: list) -> str: 
+async def run_vid_agent(prompt: str, callbacks: list,
+                        stop: Optional[threading.Event] = None) -> str:
+    """Run VidScout in a worker thread; setting ``stop`` ends the run at
+    its next step"""
     try:
+        if VIDSCOUT_MODE == "tools":
+            from agents.vid_tools import run_tool_agent
+            return await asyncio.to_thread(run_tool_agent, prompt, stop=stop)
+        if stop is not None:
+            from core.callbacks import StopHandler
+            callbacks = [StopHandler(stop), *callbacks]
+        vid_agent = registry.get("vid_agent")
         result = await asyncio.to_thread(
             vid_agent.invoke,
             {"input": prompt, "prefix": VIDSCOUT_PREFIX.strip()},
@@ -72,6 +100,7 @@ async def run_vid_agent(prompt: str, callbacks: list) -> str:
         )
         return result.get("output", "")
     except Exception as e:
-        from core.logging import logger
-        logger.error(f"VidAgent error: {e}")
-        return f"Error: {e}"
\ No newline at end of file
+        if stop is not None and stop.is_set():
+            return "Agent stopped: cancelled."
+        logger.error("VidAgent error: %s", e, extra={"stage": "vidscout"})
+        return f"Error: {e}"
@@ -0,0 +1,194 @@
+"""
+VidScout on Gemini's native function calling
+"""
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import require_env, VIDSCOUT_MAX_TURNS, VIDSCOUT_TOOLS_PREFIX
+from core.limiter import PRIORITY_VIDSCOUT, estimate_tokens
+from core.registry import registry
+from core.state import get_current_state
+from tools.search import search_exa
+from tools.validation import check_playable
+
+# Conversation turns are kept provider-neutral so the benchmark fakes can
+# answer them: {"role": "user" | "model" | "tool", "parts": [...]} where a
+# part is {"text": str}, {"call": {"name", "args"}} or
+# {"result": {"name", "response"}}.
+Turn = Dict[str, Any]
+
+# name -> (description, {arg: (type, description)}, required args)
+TOOL_SPECS = {
+    "search_exa": (
+        "Search the web with Exa and return candidate URLs, most promising first.",
+        {"query": ("string", "Search query"),
+         "k": ("integer", "How many results to return (default 20)")},
+        ["query"],
+    ),
+    "check_playable": (
+        "Check whether a URL serves playable video. Returns OK or BAD.",
+        {"url": ("string", "URL to check")},
+        ["url"],
+    ),
+    "final_answer": (
+        "Finish with the playable URL, or found=false if there is none.",
+        {"found": ("boolean", "Whether a playable URL was found"),
+         "url": ("string", "The playable URL; empty when found is false"),
+         "reason": ("string", "One short sentence on why")},
+        ["found"],
+    ),
+}
+
+TOOL_FUNCS: Dict[str, Callable[..., str]] = {
+    "search_exa": lambda query, k=20: search_exa(str(query), int(k)),
+    "check_playable": lambda url: check_playable(str(url)),
+}
+
+NUDGE = "Respond with function calls only: search_exa, check_playable or final_answer."
+
+# Tool calls from one turn run side by side (check_playable blocks on I/O)
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vid-tool")
+
+
+class GeminiToolModel:
+    """``generate(turns) -> parts`` over google.generativeai with the tools
+    declared, behind the Gemini breaker and the LLM limiter"""
+
+    def __init__(self, model_name: str = "gemini-1.5-flash", temperature: float = 0.2):
+        import google.generativeai as genai
+        import google.ai.generativelanguage as glm
+        genai.configure(api_key=require_env("GOOGLE_API_KEY"))
+        self.glm = glm
+        types = {"string": glm.Type.STRING, "integer": glm.Type.INTEGER, "boolean": glm.Type.BOOLEAN}
+        declarations = [
+            glm.FunctionDeclaration(
+                name=name,
+                description=desc,
+                parameters=glm.Schema(
+                    type=glm.Type.OBJECT,
+                    properties={arg: glm.Schema(type=types[t], description=d) for arg, (t, d) in args.items()},
+                    required=required,
+                ),
+            )
+            for name, (desc, args, required) in TOOL_SPECS.items()
+        ]
+        self.model = genai.GenerativeModel(
+            model_name,
+            tools=[glm.Tool(function_declarations=declarations)],
+            generation_config={"temperature": temperature},
+        )
+
+    def _contents(self, turns: List[Turn]):
+        glm = self.glm
+        contents = []
+        for turn in turns:
+            parts = []
+            for p in turn["parts"]:
+                if "text" in p:
+                    parts.append(glm.Part(text=p["text"]))
+                elif "call" in p:
+                    parts.append(glm.Part(function_call=glm.FunctionCall(
+                        name=p["call"]["name"], args=p["call"]["args"])))
+                else:
+                    parts.append(glm.Part(function_response=glm.FunctionResponse(
+                        name=p["result"]["name"], response=p["result"]["response"])))
+            contents.append(glm.Content(role="function" if turn["role"] == "tool" else turn["role"], parts=parts))
+        return contents
+
+    def generate(self, turns: List[Turn]) -> List[Dict[str, Any]]:
+        from agents.llm import guarded_call
+        response = guarded_call(
+            lambda: self.model.generate_content(self._contents(turns)),
+            PRIORITY_VIDSCOUT,
+            json.dumps(turns),
+        )
+        parts = []
+        for part in response.candidates[0].content.parts:
+            data = type(part).to_dict(part)
+            if data.get("function_call"):
+                call = data["function_call"]
+                parts.append({"call": {"name": call.get("name", ""), "args": call.get("args") or {}}})
+            elif data.get("text"):
+                parts.append({"text": data["text"]})
+        return parts
+
+
+registry.register("vid_tool_llm", GeminiToolModel)
+
+
+def _execute(call: Dict[str, Any]) -> str:
+    func = TOOL_FUNCS.get(call["name"])
+    if func is None:
+        return f"Unknown function {call['name']}"
+    try:
+        return func(**call["args"])
+    except TypeError as e:
+        return f"Bad arguments for {call['name']}: {e}"
+
+
+def _finish(args: Dict[str, Any]) -> str:
+    url = str(args.get("url") or "").strip()
+    if args.get("found") and url:
+        return f"FINISH: {url}"
+    return f"No playable link found: {args.get('reason', '')}".strip()
+
+
+def run_tool_agent(prompt: str, max_turns: int = VIDSCOUT_MAX_TURNS,
+                   stop: Optional[threading.Event] = None) -> str:
+    """Blocking agent loop; returns ``FINISH: <url>`` like the ReAct agent.
+    Ends before its next turn once ``stop`` is set."""
+    model = registry.get("vid_tool_llm")
+    state = get_current_state()
+    turns: List[Turn] = [{"role": "user", "parts": [{"text": f"{VIDSCOUT_TOOLS_PREFIX.strip()}\n\n{prompt}"}]}]
+
+    for _ in range(max_turns):
+        if stop is not None and stop.is_set():
+            return "Agent stopped: cancelled."
+        if state:
+            state.llm_calls += 1
+            state.prompt_tokens += estimate_tokens(json.dumps(turns), completion=0)
+        parts = model.generate(turns)
+        turns.append({"role": "model", "parts": parts})
+
+        calls = [p["call"] for p in parts if "call" in p]
+        final = next((c for c in calls if c["name"] == "final_answer"), None)
+        if final is not None:
+            return _finish(final["args"])
+        if not calls:
+            # Plain text instead of a call costs a round trip; count it
+            if state:
+                state.parse_failures += 1
+            turns.append({"role": "user", "parts": [{"text": NUDGE}]})
+            continue
+
+        # Each call keeps the job's context (current_state) on its worker thread
+        futures = [_pool.submit(contextvars.copy_context().run, _execute, c) for c in calls]
+        results = [f.result() for f in futures]
+        for call, result in zip(calls, results):
+            if state:
+                if result.startswith(("Unknown function", "Bad arguments")):
+                    state.parse_failures += 1
+                state.scratchpad.append({"tool": call["name"], "input": json.dumps(call["args"]),
+                                         "thought": "", "observation": result})
+        turns.append({"role": "tool", "parts": [
+            {"result": {"name": c["name"], "response": {"result": r}}} for c, r in zip(calls, results)
+        ]})
+
+    # Out of turns, but a check may already have passed
+    ok = last_checked_ok(turns)
+    return f"FINISH: {ok}" if ok else "Agent stopped due to turn limit."
+
+
+def last_checked_ok(turns: List[Turn]) -> Optional[str]:
+    """The most recent URL whose check_playable call returned OK"""
+    for i in range(len(turns) - 1, 0, -1):
+        if turns[i]["role"] != "tool":
+            continue
+        calls = [p["call"] for p in turns[i - 1]["parts"] if "call" in p]
+        for call, part in zip(calls, turns[i]["parts"]):
+            if call["name"] == "check_playable" and part["result"]["response"].get("result") == "OK":
+                return call["args"].get("url")
+    return None
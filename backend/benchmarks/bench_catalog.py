@@ -0,0 +1,73 @@
+"""
+Catalog import time and search latency, SQLite FTS5 vs the inverted index.
+
+    python -m benchmarks.bench_catalog --films 20000 --queries 500
+
+Films are synthetic: random titles, years, genres and descriptions drawn
+from small vocabularies, so every query has plenty of candidates.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+GENRES = ["horror", "noir", "comedy", "western", "sci-fi", "drama", "silent", "musical",
+          "documentary", "animation", "romance", "thriller", "war", "crime", "adventure"]
+WORDS = ["night", "dead", "detour", "shadow", "city", "stranger", "road", "planet", "ghost",
+         "house", "river", "train", "love", "gun", "moon", "island", "doctor", "secret",
+         "black", "white", "spooky", "short", "stunts", "screwball", "budget", "fun", "haunted",
+         "detective", "monster", "desert", "ocean", "mystery", "escape", "revenge", "silent"]
+QUERIES = [
+    "Find me a spooky black and white movie",
+    "A silent comedy with great stunts",
+    "Something noir and short for tonight",
+    "A classic screwball comedy",
+    "Low budget sci-fi that is fun to watch",
+    "haunted house horror",
+]
+
+
+def films(n: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(n):
+        title = " ".join(rng.sample(WORDS, rng.randint(1, 3))).title()
+        yield {"title": f"{title} {i}", "year": rng.randint(1915, 1975),
+               "genres": rng.sample(GENRES, 2),
+               "description": " ".join(rng.choices(WORDS + GENRES, k=25)),
+               "urls": [f"https://archive.org/details/film-{i}"] if rng.random() < 0.5 else []}
+
+
+def measure(use_fts: bool, n_films: int, n_queries: int, seed: int) -> dict:
+    from core.catalog import Catalog
+    catalog = Catalog(use_fts=use_fts)
+    start = time.perf_counter()
+    catalog.add(films(n_films, seed))
+    load_ms = (time.perf_counter() - start) * 1000
+    times = []
+    for i in range(n_queries):
+        start = time.perf_counter()
+        catalog.search(QUERIES[i % len(QUERIES)])
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {"backend": catalog.backend, "films": len(catalog), "load_ms": round(load_ms, 1),
+            "search_p50_ms": round(statistics.median(times), 3),
+            "search_p99_ms": round(times[int(len(times) * 0.99) - 1], 3),
+            "top_hit": [f.title for f in catalog.search(QUERIES[0], 1)]}
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Benchmark the film catalog")
+    p.add_argument("--films", type=int, default=20000)
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+    print(json.dumps([measure(fts, args.films, args.queries, args.seed) for fts in (True, False)], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare the domain classifier against the old WHITELIST regex + substring scan.
+
+    python -m benchmarks.bench_classifier --urls 20000 --unique 2000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.config import WHITELIST
+from tools.classify import _classify, classify_url, TRUSTED, HEURISTIC
+
+# The checks _head_ok_robust ran before the classifier existed
+STREAMING_INDICATORS = [
+    'archive.org', 'youtube.com', 'youtu.be', 'vimeo.com',
+    'movie', 'watch', 'stream', 'video', 'film'
+]
+
+HOSTS = [
+    "https://www.youtube.com/watch?v={id}",
+    "https://m.youtube.com/watch?v={id}",
+    "https://youtu.be/{id}",
+    "https://archive.org/details/{id}",
+    "https://ia800.us.archive.org/download/{id}/{id}.mp4",
+    "https://vimeo.com/{n}",
+    "https://fmovies.to/film/{id}",
+    "https://www.dailymotion.com/video/{id}",
+    "https://en.wikipedia.org/wiki/{id}",
+    "https://www.imdb.com/title/tt{n}/",
+    "https://www.rottentomatoes.com/m/{id}",
+    "https://www.reddit.com/r/movies/comments/{id}",
+    "https://videogamesnews.example.com/articles/{id}",
+    "https://example.org/embed/{id}",
+    "https://cdn.example.net/media/{id}.m3u8",
+    "https://blog.example.com/{id}-review",
+]
+
+
+def legacy(url: str) -> bool:
+    if WHITELIST.search(url):
+        return True
+    url_lower = url.lower()
+    return any(indicator in url_lower for indicator in STREAMING_INDICATORS)
+
+
+def corpus(n: int, unique: int, seed: int):
+    """n URLs drawn from a pool of `unique`; agents see the same URLs repeatedly"""
+    rng = random.Random(seed)
+    pool = [
+        rng.choice(HOSTS).format(id=f"item{rng.randrange(10**6)}", n=rng.randrange(10**7))
+        for _ in range(unique)
+    ]
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def timed(fn, urls, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for u in urls:
+            fn(u)
+        best = min(best, time.perf_counter() - start)
+    return best / len(urls) * 1e9
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Benchmark URL classification")
+    p.add_argument("--urls", type=int, default=20000)
+    p.add_argument("--unique", type=int, default=2000, help="distinct URLs in the corpus")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+
+    urls = corpus(args.urls, args.unique, args.seed)
+    classify_url.cache_clear()
+    report = {
+        "urls": len(urls),
+        "unique": args.unique,
+        "legacy_ns_per_url": round(timed(legacy, urls, args.repeat), 1),
+        "classifier_ns_per_url": round(timed(_classify, urls, args.repeat), 1),
+        "classifier_cached_ns_per_url": round(timed(classify_url, urls, args.repeat), 1),
+    }
+
+    accepted_new = {u for u in urls if classify_url(u).kind in (TRUSTED, HEURISTIC)}
+    accepted_old = {u for u in urls if legacy(u)}
+    report["accepted_legacy"] = len(accepted_old)
+    report["accepted_classifier"] = len(accepted_new)
+    report["only_legacy"] = sorted(accepted_old - accepted_new)[:5]
+    report["only_classifier"] = sorted(accepted_new - accepted_old)[:5]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
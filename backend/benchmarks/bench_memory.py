@@ -0,0 +1,104 @@
+"""
+Resident memory per 1000 finished jobs, as the API keeps them in `jobs`.
+
+    python -m benchmarks.bench_memory --jobs 5000 --logs 120
+
+Each representation is measured in a fresh interpreter: "dicts" is the
+old dict-of-dicts layout with ISO timestamp strings, "records" the
+JobRecord / LogRing layout from core.records.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Shaped like what run_backend logs for one movie attempt
+MESSAGES = [
+    ("info", "Starting search: {q}"),
+    ("info", "Planner step: [{{'title': 'Detour', 'year': 1945, 'why': 'Public-domain noir'}}]"),
+    ("info", "Trying Detour (1945) …"),
+    ("debug", "🧠 LLM thinking..."),
+    ("debug", "💭 I should search for a streaming page for Detour {n}"),
+    ("info", "🔍 Searching: Detour 1945 full movie archive.org"),
+    ("info", "🔧 Checking: archive.org/details/detour-{n}"),
+    ("success", "Found link: https://archive.org/details/detour-{n}"),
+]
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def build(kind: str, n_jobs: int, n_logs: int):
+    import datetime as dt
+    import time
+    from core.records import JobRecord
+
+    jobs = {}
+    for j in range(n_jobs):
+        job_id = f"{j:08d}-0000-4000-8000-000000000000"
+        query = f"Find me a spooky black and white movie #{j}"
+        if kind == "records":
+            job = JobRecord(job_id, query)
+            for i in range(n_logs):
+                level, text = MESSAGES[i % len(MESSAGES)]
+                job.logs.add(level, text.format(q=query, n=i))
+            job.status, job.completed = "completed", time.time()
+        else:
+            logs = []
+            for i in range(n_logs):
+                level, text = MESSAGES[i % len(MESSAGES)]
+                logs.append({"type": level, "message": text.format(q=query, n=i),
+                             "timestamp": dt.datetime.utcnow().isoformat()})
+            job = {"id": job_id, "status": "completed", "query": query, "results": [],
+                   "logs": logs, "created_at": dt.datetime.utcnow().isoformat(),
+                   "completed_at": dt.datetime.utcnow().isoformat()}
+        jobs[job_id] = job
+    return jobs
+
+
+def measure(kind: str, n_jobs: int, n_logs: int) -> dict:
+    import gc
+    import core.records  # noqa: F401  (import cost isn't job memory)
+    gc.collect()
+    before = rss_kb()
+    jobs = build(kind, n_jobs, n_logs)
+    gc.collect()
+    after = rss_kb()
+    return {"kind": kind, "jobs": len(jobs), "logs_per_job": n_logs,
+            "rss_mb_per_1000_jobs": round((after - before) / 1024 / n_jobs * 1000, 2)}
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Benchmark job memory")
+    p.add_argument("--jobs", type=int, default=5000)
+    p.add_argument("--logs", type=int, default=120, help="log entries per job")
+    p.add_argument("--kind", choices=("dicts", "records"), help="measure one layout in this process")
+    args = p.parse_args(argv)
+
+    if args.kind:
+        print(json.dumps(measure(args.kind, args.jobs, args.logs)))
+        return
+    results = []
+    for kind in ("dicts", "records"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--kind", kind,
+             "--jobs", str(args.jobs), "--logs", str(args.logs)],
+            cwd=BACKEND_DIR, env={**os.environ, "JOB_LOG_MAX": str(max(args.logs, 1))},
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Encode cost per WebSocket frame and bytes on the wire, per serializer.
+
+    python -m benchmarks.bench_serialization --frames 20000 --recipients 4
+"""
+import argparse
+import datetime as dt
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.serialization import dumps_str, msgpack_available, packb, orjson
+
+# Shapes broadcast by run_backend and process_search
+FRAMES = {
+    "log": {"type": "log", "message": "Trying Night of the Living Dead (1968) …",
+            "timestamp": dt.datetime(2024, 5, 1, 12, 0).isoformat(), "level": "info"},
+    "status": {"type": "status", "status": "processing"},
+    "result": {"type": "result", "result": {
+        "title": "Night of the Living Dead", "year": 1968,
+        "why": "Public-domain horror classic on Archive.org",
+        "url": "https://archive.org/details/night_of_the_living_dead"}},
+    "batch_log": {"type": "log", "message": "VidScout step: FINISH: archive.org/details/detour_1945",
+                  "timestamp": dt.datetime(2024, 5, 1, 12, 0).isoformat(), "level": "info",
+                  "job_id": "6f1c2a9e-0d7b-4b7e-9a51-3f0c8e2d4b11"},
+}
+
+
+def starlette_send_json(message) -> bytes:
+    """What WebSocket.send_json encoded per recipient"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def timed(fn, message, n: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn(message)
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e9
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Benchmark WebSocket frame encoding")
+    p.add_argument("--frames", type=int, default=20000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--recipients", type=int, default=4,
+                   help="sockets per job; send_json encoded once for each")
+    args = p.parse_args(argv)
+
+    codecs = {"stdlib_json": starlette_send_json, "json": lambda m: dumps_str(m).encode()}
+    if msgpack_available():
+        codecs["msgpack"] = packb
+
+    report = {"orjson": orjson is not None, "recipients": args.recipients, "frames": {}}
+    for name, message in FRAMES.items():
+        row = {}
+        for codec, fn in codecs.items():
+            ns = timed(fn, message, args.frames, args.repeat)
+            row[codec] = {"encode_ns": round(ns), "bytes": len(fn(message))}
+        # Per broadcast: the old path encoded for every recipient, the new one once
+        row["broadcast_ns"] = {
+            "before": round(row["stdlib_json"]["encode_ns"] * args.recipients),
+            "after": row["json"]["encode_ns"],
+        }
+        report["frames"][name] = row
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
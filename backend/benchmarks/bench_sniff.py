@@ -0,0 +1,123 @@
+"""
+Validator verdicts and cost against a local fixture server, HEAD vs sniff.
+
+    python -m benchmarks.bench_sniff --budget 8192
+
+Every fixture is served from 127.0.0.1, so this runs offline. Paths carry no
+media extension, which the URL heuristics would pass without a request;
+"/video/detour" matches the path heuristic, which only HEAD mode trusts.
+"/files/ignores-range" answers 200 with a 4 MB body whatever Range says; the
+sniff check must still stop at the byte budget.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_PAGE = b"<!DOCTYPE html><html><head><title>%s</title></head><body>%s</body></html>"
+
+# path -> (content type, body, honours Range, expected playable)
+FIXTURES = {
+    "/files/1": ("video/mp4", b"\x00\x00\x00\x20ftypisom\x00\x00\x02\x00" + bytes(60000), True, True),
+    "/files/2": ("video/webm", b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\x82\x84webm" + bytes(60000), True, True),
+    "/files/3": ("video/x-matroska", b"\x1a\x45\xdf\xa3\xa3\x42\x82\x88matroska" + bytes(60000), True, True),
+    "/live/master": ("application/vnd.apple.mpegurl", b"#EXTM3U\n#EXT-X-VERSION:3\n#EXTINF:10,\nseg0.ts\n", True, True),
+    "/live/manifest": ("application/dash+xml",
+                       b'<?xml version="1.0"?>\n<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static"></MPD>', True, True),
+    "/archive-embed": ("text/html", _PAGE % (b"Detour", b'<iframe src="https://archive.org/embed/Detour1945"></iframe>'),
+                       True, True),
+    "/youtube-embed": ("text/html", _PAGE % (b"Nosferatu", b'<iframe src="//www.youtube.com/embed/FC6jFoYm3xs"></iframe>'),
+                       True, True),
+    "/mentions-video": ("text/html", _PAGE % (b"Watch free video online", b"<p>Best video streams of 2024</p>" * 50),
+                        True, False),
+    "/search?q=detour": ("text/html", _PAGE % (b"Search", b'<a href="/detour">Detour video</a>' * 50), True, False),
+    "/video/detour": ("text/html", _PAGE % (b"Detour", b"<p>Coming soon</p>"), True, False),
+    "/notes.txt": ("text/plain", b"See free versions of the film below." + bytes(100), True, False),
+    "/octet": ("application/octet-stream", bytes(60000), True, False),
+    "/files/ignores-range": ("video/mp4", b"\x00\x00\x00\x18ftypmp42" + bytes(4 * 1024 * 1024), False, True),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _serve(self, with_body: bool) -> None:
+        fixture = FIXTURES.get(self.path)
+        if fixture is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        ctype, body, ranged, _ = fixture
+        status = 200
+        spec = self.headers.get("Range", "")
+        if ranged and spec.startswith("bytes=0-"):
+            body = body[:int(spec[len("bytes=0-"):]) + 1]
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if with_body:
+            try:
+                for i in range(0, len(body), 65536):
+                    self.wfile.write(body[i:i + 65536])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def do_HEAD(self) -> None:
+        self._serve(False)
+
+    def do_GET(self) -> None:
+        self._serve(True)
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Benchmark the sniffing validator")
+    p.add_argument("--budget", type=int, default=8192, help="SNIFF_MAX_BYTES")
+    args = p.parse_args(argv)
+
+    import asyncio
+    from core.breaker import breakers
+    from tools import http, validation
+    from tools.sniff import sniff
+    validation.SNIFF_MAX_BYTES = args.budget
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    rows, wrong = [], {"head": 0, "sniff": 0}
+    try:
+        for path, (_, _, _, expected) in FIXTURES.items():
+            url = base + path
+            row = {"path": path, "expected": "OK" if expected else "BAD"}
+            for mode, check in (("head", lambda: asyncio.run(validation._head_ok_robust(url))),
+                                ("sniff", lambda: validation._sniff_ok(url))):
+                breakers.host("127.0.0.1").record(True, 0.0)
+                start = time.perf_counter()
+                row[mode] = check()
+                row[f"{mode}_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                wrong[mode] += row[mode] != row["expected"]
+            prefix = http.get_prefix(url, args.budget)
+            sniffed = sniff(prefix.body, prefix.content_type)
+            row.update(kind=sniffed.kind, bytes_read=len(prefix.body))
+            assert len(prefix.body) <= args.budget, path
+            rows.append(row)
+    finally:
+        server.shutdown()
+        http.close()
+    print(json.dumps({"budget": args.budget, "wrong_verdicts": wrong, "fixtures": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measure API cold start: import time, first response and backend build times.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+PROBE = """
+import time, json
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "self_reported_ms": main.STARTUP["import_ms"]}))
+"""
+
+
+def cold_imports(runs: int):
+    env = {**os.environ, "PRELOAD_BACKENDS": "0"}
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        )
+        wall = (time.perf_counter() - start) * 1000
+        samples.append({**json.loads(out.stdout.strip().splitlines()[-1]), "process_ms": wall})
+    return samples
+
+
+async def in_process():
+    """First response latency, then the cost of building every backend"""
+    import httpx
+    import main
+    from core.registry import registry
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await client.get("/")
+        first_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        status = await asyncio.to_thread(registry.init_all)
+        build_ms = (time.perf_counter() - start) * 1000
+        ready = (await client.get("/api/ready")).status_code
+    return {"first_response_ms": round(first_ms, 2), "build_all_ms": round(build_ms, 1),
+            "ready_status": ready, "backends": status}
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Measure API cold start")
+    p.add_argument("--runs", type=int, default=5)
+    args = p.parse_args(argv)
+
+    samples = cold_imports(args.runs)
+    report = {
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "process_ms_median": round(statistics.median(s["process_ms"] for s in samples), 1),
+        "samples": [{k: round(v, 1) for k, v in s.items()} for s in samples],
+    }
+    os.environ.setdefault("PRELOAD_BACKENDS", "0")
+    report.update(asyncio.run(in_process()))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
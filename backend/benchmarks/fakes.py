@@ -0,0 +1,343 @@
+"""
+Offline stand-ins for Gemini, Exa and the validated hosts
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class SimulatedFailure(RuntimeError):
+    """Raised by a fake backend when its failure rate fires"""
+
+
+@dataclass
+class LatencyModel:
+    """Latency distribution plus failure rate for one simulated dependency.
+
+    Spec strings look like ``const:50``, ``uniform:20,80``,
+    ``lognormal:200,0.5`` (median ms, sigma) or ``exp:100`` (mean ms).
+    """
+    kind: str = "const"
+    a: float = 0.0
+    b: float = 0.0
+    failure_rate: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str, failure_rate: float = 0.0) -> "LatencyModel":
+        kind, _, args = spec.partition(":")
+        nums = [float(x) for x in args.split(",") if x]
+        nums += [0.0] * (2 - len(nums))
+        if kind not in ("const", "uniform", "lognormal", "exp"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        return cls(kind=kind, a=nums[0], b=nums[1], failure_rate=failure_rate)
+
+    def sample(self, rng: random.Random) -> float:
+        """Return one latency sample in seconds"""
+        if self.kind == "uniform":
+            ms = rng.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            ms = rng.lognormvariate(0.0, self.b) * self.a
+        elif self.kind == "exp":
+            ms = rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        else:
+            ms = self.a
+        return max(ms, 0.0) / 1000.0
+
+    def fails(self, rng: random.Random) -> bool:
+        return rng.random() < self.failure_rate
+
+
+# Small fixed pool so FilmScout answers look like the real thing
+FILM_POOL = [
+    ("The Hitch-Hiker", 1953),
+    ("Plan 9 from Outer Space", 1959),
+    ("Night of the Living Dead", 1968),
+    ("His Girl Friday", 1940),
+    ("Nosferatu", 1922),
+    ("The General", 1926),
+    ("Detour", 1945),
+    ("Charade", 1963),
+    ("The Little Shop of Horrors", 1960),
+    ("Carnival of Souls", 1962),
+]
+
+_OBS_RE = re.compile(r"Observation:(.*?)(?:\nThought:|$)", re.S)
+_CHECK_RE = re.compile(r"Action:\s*check_playable\s*\nAction Input:\s*(\S+)")
+
+
+def _urls(observation: str) -> List[str]:
+    """URL lines of a search observation (which may drop the https:// prefix)"""
+    return [line.strip() for line in observation.splitlines()
+            if "/" in line and " " not in line.strip()]
+
+
+def _stable_seed(text: str) -> int:
+    return int(hashlib.blake2b(text.encode(), digest_size=8).hexdigest(), 16)
+
+
+class FakeGemini(BaseChatModel):
+    """Chat model that answers FilmScout and VidScout prompts from a script.
+
+    FilmScout prompts get JSON lines drawn from ``FILM_POOL`` (per numbered
+    request, tagged with ``q``, for batched prompts). ReAct prompts
+    are answered by reading the scratchpad: search first, then check each
+    returned URL in order, and finish on the first ``OK``.
+    """
+    latency: Any = None
+    seed: int = 0
+    format_error_rate: float = 0.0   # share of ReAct replies with no parseable action
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _rng(self, prompt: str) -> random.Random:
+        return random.Random(self.seed ^ _stable_seed(prompt) ^ time.perf_counter_ns())
+
+    def _reply(self, prompt: str) -> str:
+        if "FilmScout" in prompt and '"q"' in prompt:
+            requests = re.findall(r"^(\d+)\. (.*)$", prompt, re.M)
+            lines = []
+            for n, question in requests:
+                rng = random.Random(self.seed ^ _stable_seed(question))
+                lines += [f'{{"q":{n},"title":"{t}","year":{y},"why":"Simulated public-domain pick"}}'
+                          for t, y in rng.sample(FILM_POOL, 3)]
+            return "\n".join(lines)
+        if "FilmScout" in prompt:
+            rng = random.Random(self.seed ^ _stable_seed(prompt))
+            picks = rng.sample(FILM_POOL, 3)
+            return "\n".join(
+                f'{{"title":"{t}","year":{y},"why":"Simulated public-domain pick"}}'
+                for t, y in picks
+            )
+
+        title = re.search(r'Find a playable link for "([^"]*)"', prompt)
+        title = title.group(1) if title else "film"
+        observations = [o.strip() for o in _OBS_RE.findall(prompt)]
+        checked = _CHECK_RE.findall(prompt)
+
+        if observations and observations[-1] == "OK" and checked:
+            return f"Thought: I now know the final answer\nFinal Answer: FINISH: {checked[-1]}"
+
+        urls: List[str] = []
+        for obs in observations:
+            found = _urls(obs)
+            if found:
+                urls = found
+        remaining = [u for u in urls if u not in checked]
+        if self.format_error_rate and self._rng(prompt).random() < self.format_error_rate:
+            return "I should look for a streaming page for this film next."
+        if remaining:
+            return (f"Thought: check the next candidate\n"
+                    f"Action: check_playable\nAction Input: {remaining[0]}")
+        return (f"Thought: search for streaming pages\n"
+                f"Action: search_exa\nAction Input: {title} full movie archive.org")
+
+    def _result(self, messages) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(prompt)))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        rng = self._rng(str(messages[-1].content))
+        time.sleep(self.latency.sample(rng))
+        if self.latency.fails(rng):
+            raise SimulatedFailure("429 Resource has been exhausted (simulated)")
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        rng = self._rng(str(messages[-1].content))
+        await asyncio.sleep(self.latency.sample(rng))
+        if self.latency.fails(rng):
+            raise SimulatedFailure("429 Resource has been exhausted (simulated)")
+        return self._result(messages)
+
+
+class FakeToolGemini:
+    """Stand-in for ``agents.vid_tools.GeminiToolModel``.
+
+    Searches once, then checks up to ``parallel`` candidates per turn with
+    parallel function calls and answers through ``final_answer`` as soon as
+    one is OK. ``format_error_rate`` of turns reply with plain text.
+    """
+
+    def __init__(self, latency: LatencyModel, seed: int = 0, parallel: int = 3,
+                 format_error_rate: float = 0.0):
+        self.latency = latency
+        self.seed = seed
+        self.parallel = parallel
+        self.format_error_rate = format_error_rate
+
+    def generate(self, turns: List[dict]) -> List[dict]:
+        from agents.llm import guarded_call
+        from core.limiter import PRIORITY_VIDSCOUT
+        return guarded_call(lambda: self._generate(turns), PRIORITY_VIDSCOUT, json.dumps(turns))
+
+    def _generate(self, turns: List[dict]) -> List[dict]:
+        prompt = turns[0]["parts"][0]["text"]
+        rng = random.Random(self.seed ^ _stable_seed(json.dumps(turns)) ^ time.perf_counter_ns())
+        time.sleep(self.latency.sample(rng))
+        if self.latency.fails(rng):
+            raise SimulatedFailure("429 Resource has been exhausted (simulated)")
+        if rng.random() < self.format_error_rate:
+            return [{"text": "Let me search for a streaming page for this film."}]
+
+        urls: List[str] = []
+        checked = set()
+        for i, turn in enumerate(turns):
+            if turn["role"] != "tool":
+                continue
+            calls = [p["call"] for p in turns[i - 1]["parts"] if "call" in p]
+            for call, part in zip(calls, turn["parts"]):
+                result = part["result"]["response"]["result"]
+                if call["name"] == "check_playable":
+                    checked.add(call["args"]["url"])
+                    if result == "OK":
+                        return [{"call": {"name": "final_answer", "args": {
+                            "found": True, "url": call["args"]["url"], "reason": "Checked OK"}}}]
+                else:
+                    urls = _urls(result)
+
+        remaining = [u for u in urls if u not in checked][:self.parallel]
+        if remaining:
+            return [{"call": {"name": "check_playable", "args": {"url": u}}} for u in remaining]
+        title = re.search(r'Find a playable link for "([^"]*)"', prompt)
+        query = f"{title.group(1) if title else 'film'} full movie archive.org"
+        return [{"call": {"name": "search_exa", "args": {"query": query}}}]
+
+
+@dataclass
+class _Result:
+    url: str
+
+
+@dataclass
+class _Response:
+    results: List[_Result]
+
+
+class FakeExa:
+    """Drop-in for ``exa_py.Exa`` returning a mix of trusted and stub-host URLs.
+
+    ``trusted_ratio`` of the results point at whitelisted domains (which the
+    validator accepts without a request); the rest point at ``host_base`` so
+    that they exercise the HTTP check against :class:`StubHosts`.
+    ``listing_ratio`` of those are search-result pages, which never play.
+    """
+
+    def __init__(self, latency: LatencyModel, host_base: str,
+                 trusted_ratio: float = 0.3, listing_ratio: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.host_base = host_base.rstrip("/")
+        self.trusted_ratio = trusted_ratio
+        self.listing_ratio = listing_ratio
+        self.seed = seed
+
+    def search(self, query: str, num_results: int = 10, **kwargs) -> _Response:
+        rng = random.Random(self.seed ^ _stable_seed(query) ^ time.perf_counter_ns())
+        time.sleep(self.latency.sample(rng))
+        if self.latency.fails(rng):
+            raise SimulatedFailure("Exa search failed (simulated)")
+
+        # Hashed slugs keep stub URLs free of words the validator treats as hints
+        slug = hashlib.blake2b(query.encode(), digest_size=5).hexdigest()
+        urls = []
+        for i in range(num_results):
+            if rng.random() < self.trusted_ratio:
+                urls.append(f"https://archive.org/details/{slug}-{i}")
+            elif rng.random() < self.listing_ratio:
+                urls.append(f"{self.host_base}/search?q={slug}-{i}")
+            else:
+                urls.append(f"{self.host_base}/item/{slug}-{i}")
+        return _Response(results=[_Result(url=u) for u in urls])
+
+
+# A film page with an embedded player, so VALIDATE_MODE=sniff passes it too
+_STUB_PAGE = b'<html><head></head><body><iframe src="https://archive.org/embed/stub"></iframe></body></html>'
+
+
+class StubHosts:
+    """Minimal HTTP/1.1 server standing in for every non-whitelisted host.
+
+    Each request sleeps for a latency sample and answers 200, or 404 when the
+    failure rate fires or the path is a ``/search`` listing. Only what the validator sends (HEAD and ranged GET)
+    needs to work. It also answers archive.org's advanced-search and
+    file-list endpoints for ``archive_titles``, each with a trailer decoy.
+    """
+
+    def __init__(self, latency: LatencyModel, seed: int = 0, archive_titles: Iterable[str] = ()):
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.archive = {t: y for t, y in FILM_POOL if t in set(archive_titles)}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.port = 0
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self) -> "StubHosts":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            method, path = head.split(b" ", 2)[:2]
+            self.requests += 1
+            await asyncio.sleep(self.latency.sample(self.rng))
+            ctype = b"text/html"
+            if path.startswith((b"/advancedsearch.php", b"/metadata/")):
+                status, body = self._archive_reply(path.decode())
+                ctype = b"application/json"
+            else:
+                failed = self.latency.fails(self.rng) or path.startswith(b"/search")
+                status = b"404 Not Found" if failed else b"200 OK"
+                body = b"" if method == b"HEAD" else _STUB_PAGE
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\n"
+                b"Content-Type: " + ctype + b"\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _archive_reply(self, path: str) -> Tuple[bytes, bytes]:
+        parts = urlsplit(path)
+        if parts.path == "/advancedsearch.php":
+            q = parse_qs(parts.query).get("q", [""])[0]
+            words = set(re.findall(r"\w+", q.partition("title:(")[2].partition(")")[0].lower()))
+            docs = []
+            for title, year in self.archive.items():
+                if words and words <= set(re.findall(r"\w+", title.lower())):
+                    slug = re.sub(r"\W+", "_", title.lower())
+                    docs += [{"identifier": f"{slug}_trailer", "title": f"{title} - Trailer",
+                              "year": str(year + 1), "downloads": 90000},
+                             {"identifier": f"{slug}_{year}", "title": title, "year": str(year),
+                              "downloads": 12000}]
+            return b"200 OK", json.dumps({"response": {"numFound": len(docs), "docs": docs}}).encode()
+        identifier = parts.path.split("/")[2]
+        files = [{"name": f"{identifier}.ogv", "format": "Ogg Video", "size": "310000000"},
+                 {"name": f"{identifier}.mp4", "format": "h.264", "size": "420000000"},
+                 {"name": f"{identifier}_meta.xml", "format": "Metadata"}]
+        return b"200 OK", json.dumps({"result": files}).encode()
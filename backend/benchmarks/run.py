@@ -0,0 +1,316 @@
+"""
+Offline end-to-end benchmark for run_backend and the FastAPI app.
+
+Runs every job against the stand-ins in ``benchmarks.fakes``, so no API
+quota is used. Example:
+
+    python -m benchmarks.run --target api --concurrency 1,8,32 --jobs 64 \
+        --llm-latency lognormal:400,0.4 --exa-latency lognormal:300,0.5 \
+        --set SOME_FLAG=1 --label parallel --out results.json
+
+``--target batch`` sends the same queries through /api/ask/batch, with
+``--concurrency`` batches of ``--batch-size`` queries in flight.
+
+Backends are built lazily on first use. Deploys set PRELOAD_BACKENDS=1 so
+startup pays for that; the bench builds them before timing instead and
+reports the cold start as ``init_ms``, apart from the levels.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fakes import FILM_POOL, FakeExa, FakeGemini, FakeToolGemini, LatencyModel, StubHosts
+
+QUERIES = [
+    "Find me a spooky black and white movie",
+    "A silent comedy with great stunts",
+    "Something noir and short for tonight",
+    "A classic screwball comedy",
+    "Low budget sci-fi that is fun to watch",
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies: List[float], errors: int, wall: float) -> Dict[str, Any]:
+    ms = [x * 1000 for x in latencies]
+    return {
+        "jobs": len(latencies),
+        "ok": len(latencies) - errors,
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+        "wall_s": round(wall, 3),
+        "jobs_per_s": round(len(latencies) / wall, 3) if wall else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def install_fakes(args, hosts: StubHosts) -> None:
+    """Swap the real Gemini and Exa clients for the stand-ins"""
+    import agents.film_scout  # noqa: F401  (registers the backends)
+    import agents.vid_scout  # noqa: F401
+    from agents.llm import guarded
+    from core.limiter import PRIORITY_FILMSCOUT, PRIORITY_VIDSCOUT
+    from core.registry import registry
+
+    llm_latency = LatencyModel.parse(args.llm_latency, args.llm_fail)
+    registry.override("rec_llm", guarded(
+        FakeGemini(latency=llm_latency, seed=args.seed), PRIORITY_FILMSCOUT))
+    registry.override("vid_llm", guarded(
+        FakeGemini(latency=llm_latency, seed=args.seed + 1,
+                   format_error_rate=args.format_errors), PRIORITY_VIDSCOUT))
+    registry.reset("vid_agent")
+    import agents.vid_tools  # noqa: F401
+    registry.override("vid_tool_llm", FakeToolGemini(
+        llm_latency, seed=args.seed + 1, format_error_rate=args.format_errors))
+    registry.override("exa", FakeExa(
+        LatencyModel.parse(args.exa_latency, args.exa_fail),
+        host_base=hosts.base_url,
+        trusted_ratio=args.trusted_ratio,
+        listing_ratio=args.listing_ratio,
+        seed=args.seed,
+    ))
+    import tools.archive
+    tools.archive.ARCHIVE_BASE_URL = hosts.base_url
+
+    # The first --catalog-ratio of the film pool, each with a playable stub page
+    from core.catalog import Catalog
+    catalog = Catalog()
+    catalog.add({"title": t, "year": y, "genres": "classic", "description": "Simulated catalog entry",
+                 "urls": [hosts.base_url + "/item/" + re.sub(r"\W+", "-", t.lower())]}
+                for t, y in FILM_POOL[:round(len(FILM_POOL) * args.catalog_ratio)])
+    registry.override("catalog", catalog)
+
+
+async def _backend_job(query: str) -> bool:
+    from inference import run_backend
+    out = await run_backend(query)
+    return out.get("status") == "completed"
+
+
+async def _api_job(client, query: str) -> bool:
+    r = await client.post("/api/ask", json={"q": query})
+    r.raise_for_status()
+    job_id = r.json()["job_id"]
+    while True:
+        await asyncio.sleep(0.02)
+        status = (await client.get(f"/api/poll/{job_id}")).json()["status"]
+        if status in ("completed", "failed"):
+            return status == "completed"
+
+
+async def run_batch_level(client, concurrency: int, n_jobs: int, batch_size: int) -> Dict[str, Any]:
+    """``n_jobs`` queries sent ``batch_size`` at a time through /api/ask/batch,
+    ``concurrency`` batches in flight; latency is per query"""
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(first: int) -> None:
+        nonlocal errors
+        queries = [QUERIES[i % len(QUERIES)] for i in range(first, min(first + batch_size, n_jobs))]
+        async with sem:
+            start = time.perf_counter()
+            r = await client.post("/api/ask/batch", json={"queries": queries})
+            r.raise_for_status()
+            batch_id = r.json()["batch_id"]
+            done = set()
+            while len(done) < len(queries):
+                await asyncio.sleep(0.02)
+                for job in (await client.get(f"/api/batch/{batch_id}")).json()["jobs"]:
+                    if job["status"] in ("completed", "failed") and job["job_id"] not in done:
+                        done.add(job["job_id"])
+                        latencies.append(time.perf_counter() - start)
+                        errors += 0 if job["status"] == "completed" else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(0, n_jobs, batch_size)))
+    return {"concurrency": concurrency, "batch_size": batch_size,
+            **summarize(latencies, errors, time.perf_counter() - start)}
+
+
+async def run_level(job, concurrency: int, n_jobs: int) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                ok = await job(QUERIES[i % len(QUERIES)])
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_jobs)))
+    return {"concurrency": concurrency, **summarize(latencies, errors, time.perf_counter() - start)}
+
+
+async def main_async(args) -> Dict[str, Any]:
+    held = [t for t, _ in FILM_POOL[:round(len(FILM_POOL) * args.archive_ratio)]]
+    hosts = await StubHosts(LatencyModel.parse(args.host_latency, args.host_fail), args.seed,
+                            archive_titles=held).start()
+    install_fakes(args, hosts)
+    # Build the remaining backends (the VidScout agent) before anything is
+    # timed, as PRELOAD_BACKENDS does at startup; reported as init_ms
+    from core.registry import registry
+    start = time.perf_counter()
+    await asyncio.to_thread(registry.init_all)
+    init_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    levels = []
+    if args.target in ("api", "batch"):
+        import httpx
+        import main as api
+        transport = httpx.ASGITransport(app=api.app)
+        await api.app.router.startup()
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for c in args.concurrency:
+                if args.target == "batch":
+                    levels.append(await run_batch_level(client, c, args.jobs, args.batch_size))
+                else:
+                    levels.append(await run_level(lambda q: _api_job(client, q), c, args.jobs))
+        await api.app.router.shutdown()
+    else:
+        for c in args.concurrency:
+            levels.append(await run_level(_backend_job, c, args.jobs))
+
+    # Don't wait on anything the app left running in the background
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    await hosts.stop()
+
+    from core.metrics import metrics
+    return {
+        "label": args.label,
+        "target": args.target,
+        "settings": dict(args.set),
+        "config": {
+            "llm_latency": args.llm_latency, "llm_fail": args.llm_fail,
+            "exa_latency": args.exa_latency, "exa_fail": args.exa_fail,
+            "host_latency": args.host_latency, "host_fail": args.host_fail,
+            "trusted_ratio": args.trusted_ratio, "listing_ratio": args.listing_ratio,
+            "format_errors": args.format_errors, "jobs": args.jobs, "seed": args.seed,
+            "archive_ratio": args.archive_ratio, "catalog_ratio": args.catalog_ratio,
+        },
+        "init_ms": init_ms,
+        "host_requests": hosts.requests,
+        "first_check": {
+            name: count for name, count in metrics.snapshot()["counters"].items()
+            if name.startswith("first_check_total")
+        },
+        "levels": levels,
+        "vidscout": {
+            name: summary for name, summary in metrics.snapshot()["histograms"].items()
+            if name.startswith("vidscout_")
+        },
+        "resolved": {
+            name: count for name, count in metrics.snapshot()["counters"].items()
+            if name.startswith(("resolved_total", "archive_resolve_total", "catalog_"))
+        },
+        "rec_batch": {
+            name: value for kind in ("histograms", "counters")
+            for name, value in metrics.snapshot()[kind].items() if name.startswith("rec_batch_")
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _kv(text: str):
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    return key, value
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--target", choices=("backend", "api", "batch"), default="backend",
+                   help="call run_backend directly, go through the ASGI app, or use /api/ask/batch")
+    p.add_argument("--batch-size", type=int, default=20, help="queries per batch (--target batch)")
+    p.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16])
+    p.add_argument("--jobs", type=int, default=32, help="jobs per concurrency level")
+    p.add_argument("--llm-latency", default="lognormal:300,0.4")
+    p.add_argument("--llm-fail", type=float, default=0.0)
+    p.add_argument("--exa-latency", default="lognormal:250,0.5")
+    p.add_argument("--exa-fail", type=float, default=0.0)
+    p.add_argument("--host-latency", default="lognormal:80,0.6")
+    p.add_argument("--host-fail", type=float, default=0.3)
+    p.add_argument("--trusted-ratio", type=float, default=0.3)
+    p.add_argument("--listing-ratio", type=float, default=0.0,
+                   help="share of stub-host results that are never-playable search pages")
+    p.add_argument("--format-errors", type=float, default=0.0,
+                   help="share of VidScout replies with no usable action")
+    p.add_argument("--archive-ratio", type=float, default=0.5,
+                   help="share of films the stub archive.org holds (with --set ARCHIVE_RESOLVER=first|race)")
+    p.add_argument("--catalog-ratio", type=float, default=0.0,
+                   help="share of films in the local catalog, with a known URL")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--set", type=_kv, action="append", default=[],
+                   help="KEY=VALUE environment override applied before import (repeatable)")
+    p.add_argument("--label", default="default", help="name for this run in the report")
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    os.environ.setdefault("PRELOAD_BACKENDS", "0")
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    os.environ.setdefault("HISTORY_ENABLED", "1")
+    os.environ.setdefault("TRACES_ENABLED", "0")
+    os.environ.setdefault("CLIENT_RATE_PER_MIN", "0")   # every bench job comes from one client
+    os.environ.setdefault("CLIENT_MAX_PENDING", "100000")
+    os.environ.setdefault("RANKER_PATH", "")    # start every run untrained
+    os.environ.setdefault("ARCHIVE_RESOLVER", "off")   # compare VidScout alone unless asked
+    for cache in ("REC", "SEARCH", "RESULT", "ARCHIVE"):
+        # Measure the pipeline, not cache hits; enable with --set
+        os.environ.setdefault(f"{cache}_CACHE_TTL_S", "0")
+    for key, value in args.set:
+        os.environ[key] = value
+
+    # Only the report goes to stdout, whatever a library prints
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
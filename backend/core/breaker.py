@@ -0,0 +1,181 @@
+"""
+Circuit breakers for external dependencies
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Tuple
+
+from core.config import (
+    BREAKER_WINDOW_S,
+    BREAKER_MIN_CALLS,
+    BREAKER_ERROR_RATE,
+    BREAKER_SLOW_CALL_S,
+    BREAKER_SLOW_RATE,
+    BREAKER_OPEN_S,
+    BREAKER_PROBE_TIMEOUT_S,
+    BREAKER_MAX_HOSTS,
+)
+from core.metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling time window.
+
+    Opens when, with at least ``min_calls`` outcomes in the last
+    ``window_s`` seconds, the error rate or the slow-call rate crosses its
+    threshold. After ``open_s`` one probe call is let through (half-open);
+    its outcome closes the breaker or re-opens it. A probe that is
+    cancelled counts as a failure (``cancel``); one that never reports back
+    is replaced after ``probe_timeout_s``.
+    """
+
+    def __init__(self, name: str, window_s: float = BREAKER_WINDOW_S,
+                 min_calls: int = BREAKER_MIN_CALLS, error_rate: float = BREAKER_ERROR_RATE,
+                 slow_call_s: float = BREAKER_SLOW_CALL_S, slow_rate: float = BREAKER_SLOW_RATE,
+                 open_s: float = BREAKER_OPEN_S, probe_timeout_s: float = BREAKER_PROBE_TIMEOUT_S):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_s = open_s
+        self.probe_timeout_s = probe_timeout_s
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window_s:
+            self._outcomes.popleft()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set("breaker_state", _STATE_GAUGE[state], name=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; counts a rejection if not"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.open_s:
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and (
+                    not self._probing or now - self._probe_started >= self.probe_timeout_s):
+                self._probing = True
+                self._probe_started = now
+                return True
+        metrics.inc("breaker_rejected_total", name=self.name)
+        return False
+
+    def check(self) -> None:
+        """Like allow(), but raise CircuitOpenError when the call is refused"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def cancel(self) -> None:
+        """A call let through ended without an outcome. Closed, that says
+        nothing; as the half-open probe it re-opens the breaker, so the
+        next probe is due after ``open_s``."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def record(self, ok: bool, latency: float = 0.0) -> None:
+        now = time.monotonic()
+        slow = latency > self.slow_call_s
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if ok and not slow:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                else:
+                    self.opened_at = now
+                    self._set_state(OPEN)
+                return
+
+            self._outcomes.append((now, ok, slow))
+            self._trim(now)
+            total = len(self._outcomes)
+            if self.state != CLOSED or total < self.min_calls:
+                return
+            errors = sum(1 for _, good, _ in self._outcomes if not good)
+            slows = sum(1 for _, _, s in self._outcomes if s)
+            if errors / total >= self.error_rate or slows / total >= self.slow_rate:
+                self.opened_at = now
+                self._set_state(OPEN)
+                metrics.inc("breaker_opened_total", name=self.name)
+
+    @property
+    def is_open(self) -> bool:
+        """Open and not yet due for a probe"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.open_s
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            total = len(self._outcomes)
+            errors = sum(1 for _, good, _ in self._outcomes if not good)
+            return {
+                "state": self.state,
+                "calls_in_window": total,
+                "error_rate": round(errors / total, 3) if total else 0.0,
+                "open_for_s": round(max(0.0, self.open_s - (time.monotonic() - self.opened_at)), 1)
+                if self.state == OPEN else 0.0,
+            }
+
+
+class Breakers:
+    """Named breakers, created on first use. Per-host breakers are capped at
+    ``BREAKER_MAX_HOSTS``, dropping the least recently used closed ones."""
+
+    def __init__(self, max_hosts: int = BREAKER_MAX_HOSTS):
+        self.max_hosts = max_hosts
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name)
+                self._evict()
+            else:
+                self._breakers.move_to_end(name)
+            return breaker
+
+    def host(self, host: str) -> CircuitBreaker:
+        return self.get(f"host:{host}")
+
+    def _evict(self) -> None:
+        hosts = [n for n in self._breakers if n.startswith("host:")]
+        for name in hosts[:max(0, len(hosts) - self.max_hosts)]:
+            if self._breakers[name].state == CLOSED:
+                del self._breakers[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self._breakers.items())
+        return {name: b.snapshot() for name, b in items}
+
+
+breakers = Breakers()
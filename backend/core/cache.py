@@ -0,0 +1,71 @@
+"""
+Shared TTL caches for recommendations, searches, results and archive.org lookups
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from core.config import (
+    CACHE_MAX_ENTRIES,
+    REC_CACHE_TTL_S,
+    SEARCH_CACHE_TTL_S,
+    RESULT_CACHE_TTL_S,
+    ARCHIVE_CACHE_TTL_S,
+)
+from core.metrics import metrics
+
+
+class TTLCache:
+    """Thread-safe LRU with a per-cache time to live; ``ttl`` 0 disables it"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] < time.monotonic():
+                del self._data[key]
+                item = None
+            if item is not None:
+                self._data.move_to_end(key)
+        metrics.inc("cache_hits_total" if item is not None else "cache_misses_total", cache=self.name)
+        return item[1] if item is not None else None
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] >= time.monotonic()
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+rec_cache = TTLCache("recommendations", REC_CACHE_TTL_S)     # normalized query -> FilmScout picks
+search_cache = TTLCache("search", SEARCH_CACHE_TTL_S)         # (query, k) -> Exa URLs
+result_cache = TTLCache("results", RESULT_CACHE_TTL_S)        # normalized query -> final result
+archive_cache = TTLCache("archive", ARCHIVE_CACHE_TTL_S)      # (title, year) -> ArchiveHit or False
+
+
+def cache_sizes() -> Dict[str, int]:
+    return {c.name: len(c) for c in (rec_cache, search_cache, result_cache, archive_cache)}
@@ -0,0 +1,83 @@
+"""
+LangChain callback handlers
+"""
+from langchain.callbacks.base import BaseCallbackHandler
+from core.limiter import estimate_tokens
+from core.logging import get_logger
+
+logger = get_logger("vid_scout")
+_STAGE = {"stage": "vidscout"}
+
+class AgentCancelled(Exception):
+    """Raised inside a running agent once its ``stop`` event is set"""
+
+class StopHandler(BaseCallbackHandler):
+    """Ends an agent run at its next LLM call or tool call after ``stop`` is
+    set; cancelling the asyncio task doesn't reach the worker thread"""
+    raise_error = True
+
+    def __init__(self, stop):
+        self.stop = stop
+
+    def _check(self):
+        if self.stop.is_set():
+            raise AgentCancelled()
+
+    def on_llm_start(self, serialized, prompts, **kw):
+        self._check()
+
+    def on_tool_start(self, serialized, input_str, **kw):
+        self._check()
+
+class LogHandler(BaseCallbackHandler):
+    def __init__(self, state): 
+        self.state = state
+        self._last_tool = None
+
+    def _add_sync(self, msg: str, lvl: str = "info"):
+        """Synchronous logging without WebSocket broadcast"""
+        self.state.logs.add(lvl, msg)
+        (logger.debug if lvl == "debug" else logger.info)("%s", msg, extra=_STAGE)
+        
+        # Don't use asyncio.create_task here - it causes event loop issues
+
+    def on_llm_start(self, serialized, prompts, **kw):
+        self.state.llm_calls += 1
+        self.state.prompt_tokens += sum(estimate_tokens(p, completion=0) for p in prompts)
+        self._add_sync(f"🧠 LLM thinking...", "debug")
+
+    def on_llm_end(self, response, **kw):
+        text = response.generations[0][0].text.strip()
+        if "Thought:" in text:
+            thought = text.split("Thought:")[-1].split("Action:")[0].strip()
+            if thought:
+                self._add_sync(f"💭 {thought}", "debug")
+
+    def on_tool_start(self, tool, input_str, **kw):
+        tool_name = tool.name if hasattr(tool, 'name') else str(tool)
+        self._last_tool = tool_name
+        # Don't log here to avoid duplicates with tool functions
+
+    def on_agent_action(self, action, **kw):
+        if action.tool == "_Exception":
+            # handle_parsing_errors turned an unparseable reply into a retry
+            self.state.parse_failures += 1
+        # Kept whole for the trace archive (core/traces.py)
+        self.state.scratchpad.append({
+            "tool": action.tool,
+            "input": str(action.tool_input),
+            "thought": action.log.strip(),
+            "observation": "",
+        })
+
+    def on_tool_end(self, output, **kw):
+        # Don't log here - tools handle their own logging
+        self.state.last_obs = str(output)
+        if self.state.scratchpad and not self.state.scratchpad[-1]["observation"]:
+            self.state.scratchpad[-1]["observation"] = self.state.last_obs
+
+    def on_agent_finish(self, finish, **kw):
+        output = finish.return_values.get("output", "")
+        if "FINISH:" in output.upper():
+            url = output.split(":", 1)[1].strip()
+            self._add_sync(f"🎯 Agent finished with: {url}", "success")
@@ -0,0 +1,239 @@
+"""
+Local catalog of public-domain and CC-licensed films with full-text search
+"""
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from core.config import CATALOG_PATH, CATALOG_FTS, CATALOG_TOP_K
+from core.logging import get_logger
+from core.registry import registry
+from utils.helpers import normalize_query
+
+logger = get_logger("catalog")
+
+# Field weights for ranking: title, genres, description
+WEIGHTS = (5.0, 3.0, 1.0)
+
+# Words that say nothing about which film is wanted
+STOPWORDS = frozenset("""
+a an and any are as at be by can for from give good great i in is it like me movie movies
+film films find of on one or please recommend show some something that the this to tonight
+want watch what with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ARTICLE_RE = re.compile(r"^(?:the|a|an) ")
+
+
+class Film(NamedTuple):
+    title: str
+    year: Optional[int]
+    genres: Tuple[str, ...]
+    description: str
+    urls: Tuple[str, ...]
+
+    def pick(self) -> Dict[str, Any]:
+        """As a FilmScout suggestion, with the first known URL if any"""
+        movie = {"title": self.title, "year": self.year, "why": self.description[:160], "catalog": True}
+        if self.urls:
+            movie["url"] = self.urls[0]
+        return movie
+
+
+def title_key(title: str) -> str:
+    return _ARTICLE_RE.sub("", normalize_query(title))
+
+
+def _terms(text: str) -> List[str]:
+    """Lowercase word tokens minus stopwords, with a crude plural strip"""
+    terms = []
+    for t in _TOKEN_RE.findall(text.lower()):
+        if t in STOPWORDS:
+            continue
+        terms.append(t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t)
+    return terms
+
+
+def _as_tuple(value: Any) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return tuple(v.strip() for v in value.split(",") if v.strip())
+    return tuple(str(v) for v in value)
+
+
+def _film(record: Dict[str, Any]) -> Film:
+    year = record.get("year")
+    return Film(
+        title=str(record["title"]).strip(),
+        year=int(year) if str(year or "").strip().isdigit() else None,
+        genres=_as_tuple(record.get("genres")),
+        description=str(record.get("description") or ""),
+        urls=_as_tuple(record.get("urls") or record.get("url")),
+    )
+
+
+class _FtsIndex:
+    """SQLite FTS5 in memory, ranked by bm25()"""
+
+    name = "fts5"
+
+    def __init__(self):
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.execute("CREATE VIRTUAL TABLE films USING fts5("
+                           "title, genres, description, tokenize='porter unicode61')")
+        self._lock = threading.Lock()
+
+    def add(self, rows: Iterable[Tuple[int, Film]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO films (rowid, title, genres, description) VALUES (?, ?, ?, ?)",
+                [(i, f.title, " ".join(f.genres), f.description) for i, f in rows])
+
+    def search(self, terms: List[str], limit: int) -> List[int]:
+        match = " OR ".join(f'"{t}"' for t in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid FROM films WHERE films MATCH ? ORDER BY bm25(films, ?, ?, ?) LIMIT ?",
+                (match, *WEIGHTS, limit)).fetchall()
+        return [r[0] for r in rows]
+
+
+class _InvertedIndex:
+    """Field-weighted BM25 over a plain dict of postings"""
+
+    name = "inverted"
+    k1, b = 1.2, 0.75
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._lengths: Dict[int, float] = {}
+
+    def add(self, rows: Iterable[Tuple[int, Film]]) -> None:
+        for i, f in rows:
+            tf: Counter = Counter()
+            for text, weight in zip((f.title, " ".join(f.genres), f.description), WEIGHTS):
+                for t in _terms(text):
+                    tf[t] += weight
+            for t, n in tf.items():
+                self._postings[t][i] = n
+            self._lengths[i] = sum(tf.values())
+
+    def search(self, terms: List[str], limit: int) -> List[int]:
+        if not self._lengths:
+            return []
+        n_docs = len(self._lengths)
+        avg = sum(self._lengths.values()) / n_docs
+        scores: Counter = Counter()
+        for t in set(terms):
+            docs = self._postings.get(t)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for i, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[i] / avg)
+                scores[i] += idf * tf * (self.k1 + 1) / norm
+        return [i for i, _ in scores.most_common(limit)]
+
+
+class Catalog:
+    """Films by id, a title lookup table and a full-text index.
+
+    Uses SQLite FTS5 when the interpreter's sqlite3 has it (and CATALOG_FTS
+    is on), else the in-memory inverted index; both rank with BM25.
+    """
+
+    def __init__(self, use_fts: bool = CATALOG_FTS):
+        self.films: List[Film] = []
+        self._by_title: Dict[str, List[int]] = defaultdict(list)
+        self._index: Any = None
+        if use_fts:
+            try:
+                self._index = _FtsIndex()
+            except sqlite3.OperationalError:   # built without FTS5
+                logger.info("SQLite has no FTS5; using the in-memory catalog index")
+        if self._index is None:
+            self._index = _InvertedIndex()
+
+    @property
+    def backend(self) -> str:
+        return self._index.name
+
+    def __len__(self) -> int:
+        return len(self.films)
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Index ``records`` ({"title", "year", "genres", "description",
+        "urls"}); records without a title are skipped"""
+        rows = []
+        for record in records:
+            if not record.get("title"):
+                continue
+            film = _film(record)
+            i = len(self.films)
+            self.films.append(film)
+            self._by_title[title_key(film.title)].append(i)
+            rows.append((i, film))
+        self._index.add(rows)
+        return len(rows)
+
+    def load(self, path: str) -> int:
+        """Bulk import from a JSON Lines file (or one JSON array)"""
+        text = Path(path).read_text(encoding="utf-8")
+        if text.lstrip().startswith("["):
+            records = json.loads(text)
+        else:
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return self.add(records)
+
+    def search(self, text: str, limit: int = CATALOG_TOP_K) -> List[Film]:
+        """Best matches for a free-text request, best first"""
+        terms = _terms(text)
+        if not terms or not self.films:
+            return []
+        return [self.films[i] for i in self._index.search(terms, limit)]
+
+    def lookup(self, title: str, year: Any = None) -> Optional[Film]:
+        """The entry for a title, the closest year within one if ``year`` is given"""
+        ids = self._by_title.get(title_key(title))
+        if not ids:
+            return None
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            return self.films[ids[0]]
+        dated = [self.films[i] for i in ids if self.films[i].year is not None]
+        if not dated:
+            return self.films[ids[0]]
+        best = min(dated, key=lambda f: abs(f.year - year))
+        return best if abs(best.year - year) <= 1 else None
+
+
+def _build_catalog() -> Catalog:
+    catalog = Catalog()
+    if CATALOG_PATH and Path(CATALOG_PATH).is_file():
+        n = catalog.load(CATALOG_PATH)
+        logger.info("Loaded %d catalog entries from %s (%s)", n, CATALOG_PATH, catalog.backend)
+    return catalog
+
+registry.register("catalog", _build_catalog)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    catalog = Catalog()
+    print(f"{catalog.load(sys.argv[1])} entries ({catalog.backend})")
+    for question in sys.argv[2:]:
+        start = time.perf_counter()
+        hits = catalog.search(question)
+        print(f"{question!r} ({(time.perf_counter() - start) * 1000:.2f} ms)")
+        for film in hits:
+            print(f"  {film.title} ({film.year}) {', '.join(film.urls)}")
@@ -4,22 +4,25 @@ Environment variables and configuration constants
 import os
 import re
 
-# Environment validation
-if "GOOGLE_API_KEY" not in os.environ:
-    raise RuntimeError("GOOGLE_API_KEY env-var is required")
-if "EXA_API_KEY" not in os.environ:
-    raise RuntimeError("EXA_API_KEY env-var is required")
-if "TOGETHER_API_KEY" not in os.environ:
-    raise RuntimeError("TOGETHER_API_KEY env-var is required")
-if "OPENAI_API_KEY" not in os.environ:
-    raise RuntimeError("OPENAI_API_KEY env-var is required")
-
-# API Keys
+# API Keys. Missing keys are reported when the backend that needs them is
+# first built (see core/registry.py), not at import, so the API can start
+# and answer health/readiness checks without every credential.
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 EXA_API_KEY = os.getenv("EXA_API_KEY")
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+def require_env(name: str) -> str:
+    """Return an env-var or raise the error import used to raise"""
+    value = os.getenv(name)
+    if not value:
+        raise RuntimeError(f"{name} env-var is required")
+    return value
+
+# Build the LLM clients and agents in the background at startup instead of
+# on the first request
+PRELOAD_BACKENDS = os.getenv("PRELOAD_BACKENDS", "1") == "1"
+
 # Regex patterns
 URL_RE = re.compile(r'https?://\S+')
 PLAYABLE_CT = re.compile(
@@ -73,6 +76,177 @@ WHITELIST = re.compile(
     re.I,
 )
 
+# Domain classifier tables (tools/classify.py). These cover the same hosts as
+# WHITELIST, which is kept for reference and benchmarks/bench_classifier.py.
+TRUSTED_DOMAINS = frozenset({
+    "youtube.com", "youtu.be", "archive.org", "web.archive.org", "archive.today",
+    "vimeo.com", "player.vimeo.com", "plex.tv", "watch.plex.tv", "roku.com",
+    "dailymotion.com", "metacafe.com", "veoh.com", "break.com", "crackle.com",
+    "tubi.tv", "tubitv.com", "pluto.tv", "vudu.com", "crunchyroll.com",
+    "funimation.com",
+})
+
+# Hosts matched by their first label under any TLD, e.g. fmovies.to
+TRUSTED_BRANDS = frozenset({
+    "123movies", "123movieshd", "123moviesfree", "fmovies", "putlocker",
+    "solarmovie", "gomovies", "yesmovies", "watchseries", "primewire",
+    "movie4k", "movies123", "hdeuropix", "openload", "streamango", "vidlox",
+    "rapidvideo", "streamplay",
+})
+
+# Explicit heuristics for hosts we don't know
+MEDIA_EXTENSIONS = (".mp4", ".m4v", ".webm", ".mkv", ".mov", ".ogv", ".m3u8", ".mpd")
+HEURISTIC_PATH_RE = re.compile(
+    r"/(?:watch(?:/|$)|embed/|player/|(?:video|film|movie|stream)/[^/])", re.I
+)
+HEURISTIC_HOST_RE = re.compile(r"(?:movies?|films?|streams?|videos?|watch)(?:-|\d|$)", re.I)
+
+# Cross-job verdict cache (tools/validation.py)
+VERDICT_BLOOM_CAPACITY = int(os.getenv("VERDICT_BLOOM_CAPACITY", "100000"))
+VERDICT_BLOOM_ERROR_RATE = float(os.getenv("VERDICT_BLOOM_ERROR_RATE", "0.001"))
+# Verdicts are kept for between one and two of these; only definitive
+# failures (4xx, or a body that is not media) are remembered as bad
+VERDICT_OK_TTL_S = float(os.getenv("VERDICT_OK_TTL_S", "3600"))
+VERDICT_BAD_TTL_S = float(os.getenv("VERDICT_BAD_TTL_S", "900"))
+
+# "head" accepts any 200/301/302 to HEAD; "sniff" reads the first
+# SNIFF_MAX_BYTES with one ranged GET and checks the container signature
+# (tools/sniff.py)
+VALIDATE_MODE = os.getenv("VALIDATE_MODE", "head")
+SNIFF_MAX_BYTES = int(os.getenv("SNIFF_MAX_BYTES", "8192"))
+
+# archive.org fast path (tools/archive.py): "first" tries it before
+# VidScout, "race" runs both and takes the first link, "off" skips it.
+# Off by default: the other two call archive.org's public API for every
+# suggested film (at most two requests each, cached for ARCHIVE_CACHE_TTL_S)
+ARCHIVE_RESOLVER = os.getenv("ARCHIVE_RESOLVER", "off")
+ARCHIVE_BASE_URL = os.getenv("ARCHIVE_BASE_URL", "https://archive.org").rstrip("/")
+ARCHIVE_MIN_SCORE = float(os.getenv("ARCHIVE_MIN_SCORE", "0.85"))
+ARCHIVE_ROWS = int(os.getenv("ARCHIVE_ROWS", "10"))
+
+# Local film catalog (core/catalog.py): JSON Lines of {"title", "year",
+# "genres", "description", "urls"}, loaded at startup if the file exists.
+# "ground" checks FilmScout's picks against it (and answers from it when
+# FilmScout fails), "retrieve" answers from it alone when it has at least
+# CATALOG_MIN_HITS matches, "off" ignores it
+CATALOG_PATH = os.getenv("CATALOG_PATH", "./catalog.jsonl")
+CATALOG_MODE = os.getenv("CATALOG_MODE", "ground")
+CATALOG_TOP_K = int(os.getenv("CATALOG_TOP_K", "3"))
+CATALOG_MIN_HITS = int(os.getenv("CATALOG_MIN_HITS", "2"))
+CATALOG_FTS = os.getenv("CATALOG_FTS", "1") == "1"     # 0 forces the in-memory index
+
+# Shared outbound HTTP client (tools/http.py)
+HTTP_TIMEOUT_S = float(os.getenv("HTTP_TIMEOUT_S", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+
+# Global LLM rate limiter (core/limiter.py)
+LLM_RATE_LIMIT = os.getenv("LLM_RATE_LIMIT", "1") == "1"
+LLM_RPM = float(os.getenv("LLM_RPM", "600"))
+LLM_TPM = float(os.getenv("LLM_TPM", "1000000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_LATENCY_TARGET_S = float(os.getenv("LLM_LATENCY_TARGET_S", "10"))
+
+# Circuit breakers (core/breaker.py)
+BREAKER_WINDOW_S = float(os.getenv("BREAKER_WINDOW_S", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_S = float(os.getenv("BREAKER_SLOW_CALL_S", "20"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_S = float(os.getenv("BREAKER_OPEN_S", "30"))
+# A half-open probe that reports nothing for this long is presumed lost
+BREAKER_PROBE_TIMEOUT_S = float(os.getenv("BREAKER_PROBE_TIMEOUT_S", "60"))
+BREAKER_MAX_HOSTS = int(os.getenv("BREAKER_MAX_HOSTS", "1024"))
+
+# Hedged requests (core/hedge.py); off unless enabled per call site
+HEDGE_EXA = os.getenv("HEDGE_EXA", "0") == "1"
+HEDGE_FILMSCOUT = os.getenv("HEDGE_FILMSCOUT", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))      # max share of calls hedged
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_S = float(os.getenv("HEDGE_MIN_DELAY_S", "0.05"))
+
+# Micro-batching of FilmScout calls across jobs (agents/film_scout.py)
+REC_BATCH_ENABLED = os.getenv("REC_BATCH_ENABLED", "0") == "1"
+REC_BATCH_WINDOW_MS = float(os.getenv("REC_BATCH_WINDOW_MS", "30"))
+REC_BATCH_MAX = int(os.getenv("REC_BATCH_MAX", "8"))
+
+# Job history (core/history.py): sqlite:///path or postgresql://...
+# Off by default: the working directory of a deploy is not persistent
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sidedoor.db")
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "0") == "1"
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_S = float(os.getenv("HISTORY_FLUSH_S", "1.0"))
+HISTORY_QUEUE_MAX = int(os.getenv("HISTORY_QUEUE_MAX", "10000"))
+
+# Trace archive (core/traces.py); TRACE_COMPRESSION=zstd needs `zstandard`
+TRACES_ENABLED = os.getenv("TRACES_ENABLED", "0") == "1"
+TRACE_DIR = os.getenv("TRACE_DIR", "./traces")
+TRACE_COMPRESSION = os.getenv("TRACE_COMPRESSION", "gzip")
+TRACE_SEGMENT_MB = float(os.getenv("TRACE_SEGMENT_MB", "64"))
+TRACE_MAX_SEGMENTS = int(os.getenv("TRACE_MAX_SEGMENTS", "8"))   # oldest are deleted; 0: keep all
+TRACE_QUEUE_MAX = int(os.getenv("TRACE_QUEUE_MAX", "1000"))
+
+# Per-client admission and fair scheduling (core/fairness.py)
+API_KEY_HEADER = os.getenv("API_KEY_HEADER", "X-API-Key")
+# Reverse proxies in front of the app that append to X-Forwarded-For; the
+# client is the address that many entries from the right. 0 (direct
+# exposure) ignores the header. The Render, Heroku and Cloud Run deploy
+# files set 1: behind a proxy, every caller otherwise shares its address
+# and one client's rate limit. TRUST_FORWARDED_FOR=1 is the older spelling
+# of one hop.
+FORWARDED_HOPS = int(os.getenv("FORWARDED_HOPS", "1" if os.getenv("TRUST_FORWARDED_FOR") == "1" else "0"))
+CLIENT_RATE_PER_MIN = float(os.getenv("CLIENT_RATE_PER_MIN", "30"))   # 0 disables
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "10"))
+CLIENT_MAX_PENDING = int(os.getenv("CLIENT_MAX_PENDING", "20"))
+CLIENT_IDLE_S = float(os.getenv("CLIENT_IDLE_S", "600"))
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "32"))
+# Per POST /api/ask/batch; each query also counts against CLIENT_MAX_PENDING
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+
+# Logging (core/logging.py). LOG_LEVELS sets per-module levels, e.g.
+# "search=DEBUG,validation=WARNING"; LOG_DEBUG_SAMPLE keeps that share of
+# DEBUG records
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")   # json | text
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "1.0"))
+
+# Per-job log ring (core/records.py): older entries are dropped past the cap
+JOB_LOG_MAX = int(os.getenv("JOB_LOG_MAX", "500"))
+LOG_MESSAGE_MAX_CHARS = int(os.getenv("LOG_MESSAGE_MAX_CHARS", "2000"))
+
+# Event-loop monitor and profiler (core/loopmon.py). /api/debug/loop and
+# /api/debug/profile expose stacks and file paths: they answer 404 unless
+# ADMIN_TOKEN is set, and then require it as X-Admin-Token
+LOOPMON_ENABLED = os.getenv("LOOPMON_ENABLED", "1") == "1"
+LOOPMON_INTERVAL_S = float(os.getenv("LOOPMON_INTERVAL_S", "0.1"))
+LOOPMON_STALL_MS = float(os.getenv("LOOPMON_STALL_MS", "250"))
+LOOPMON_MAX_STALLS = int(os.getenv("LOOPMON_MAX_STALLS", "20"))
+PROFILE_MAX_S = float(os.getenv("PROFILE_MAX_S", "30"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Responses at least this big are compressed (/api/poll, /api/logs)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Caches (core/cache.py); a TTL of 0 disables that cache
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+REC_CACHE_TTL_S = float(os.getenv("REC_CACHE_TTL_S", "3600"))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", "3600"))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "1800"))
+ARCHIVE_CACHE_TTL_S = float(os.getenv("ARCHIVE_CACHE_TTL_S", "86400"))
+
+# Prefetch of popular queries (core/prefetch.py); empty PREFETCH_SOURCES
+# turns it off. Sources: redis (list at PREFETCH_REDIS_KEY), file, history
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+PREFETCH_SOURCES = [s.strip() for s in os.getenv("PREFETCH_SOURCES", "").split(",") if s.strip()]
+PREFETCH_INTERVAL_S = float(os.getenv("PREFETCH_INTERVAL_S", "900"))
+PREFETCH_FILE = os.getenv("PREFETCH_FILE", "")
+PREFETCH_REDIS_KEY = os.getenv("PREFETCH_REDIS_KEY", "demo_queries")
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+PREFETCH_HISTORY_DAYS = float(os.getenv("PREFETCH_HISTORY_DAYS", "7"))
+PREFETCH_MAX_FOREGROUND = int(os.getenv("PREFETCH_MAX_FOREGROUND", "0"))  # running jobs tolerated
+
 # Agent prompts
 VIDSCOUT_PREFIX = """
 You are **VidScout**. Find streaming links for movies.
@@ -93,4 +267,31 @@ STRATEGY:
 IMPORTANT: Test multiple URLs from each search before trying new search terms.
 """
 
+# Learned URL ranking (tools/ranker.py)
+RANKER_ENABLED = os.getenv("RANKER_ENABLED", "1") == "1"
+RANKER_PATH = os.getenv("RANKER_PATH", "")   # e.g. a persistent disk; empty: don't persist
+RANKER_DIM = int(os.getenv("RANKER_DIM", str(1 << 16)))
+RANKER_PRIOR_STRENGTH = float(os.getenv("RANKER_PRIOR_STRENGTH", "4"))
+RANKER_SAVE_EVERY = int(os.getenv("RANKER_SAVE_EVERY", "200"))
+
+# Agent observations (tools/observe.py)
+OBS_TOP_K = int(os.getenv("OBS_TOP_K", "8"))
+OBS_SHORTEN_URLS = os.getenv("OBS_SHORTEN_URLS", "1") == "1"
+
+# VidScout agent: "react" (text Thought/Action loop) or "tools" (Gemini
+# native function calling, agents/vid_tools.py)
+VIDSCOUT_MODE = os.getenv("VIDSCOUT_MODE", "react")
+VIDSCOUT_MAX_TURNS = int(os.getenv("VIDSCOUT_MAX_TURNS", "4"))
+
+VIDSCOUT_TOOLS_PREFIX = """
+You are **VidScout**. Find a legally streamable, playable link for a movie.
+
+- Call `search_exa` with specific queries, e.g. "<title> <year> archive.org full movie".
+- Check several candidate URLs at once: call `check_playable` for each of
+  the most promising URLs in the same turn.
+- As soon as a URL checks OK, call `final_answer` with it. If nothing
+  works after a couple of searches, call `final_answer` with found=false.
+- Always respond with function calls only.
+"""
+
 VIDSCOUT_SUFFIX = "Remember: stop as soon as you have a playable link."
@@ -0,0 +1,206 @@
+"""
+Per-client admission control and fair job scheduling
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from core.config import (
+    API_KEY_HEADER,
+    FORWARDED_HOPS,
+    CLIENT_RATE_PER_MIN,
+    CLIENT_BURST,
+    CLIENT_MAX_PENDING,
+    CLIENT_IDLE_S,
+    MAX_CONCURRENT_JOBS,
+)
+from core.limiter import TokenBucket
+from core.logging import get_logger
+from core.metrics import metrics
+
+logger = get_logger("fairness")
+_STAGE = {"stage": "scheduler"}
+
+# How often idle clients are swept out
+SWEEP_INTERVAL_S = 30.0
+
+
+def client_id(headers, peer: Optional[str]) -> str:
+    """Caller identity: a hash of the API key if one is sent, else the IP.
+
+    Behind FORWARDED_HOPS proxies the IP comes from X-Forwarded-For,
+    counted from the right: entries further left are whatever the client
+    sent and can't be trusted.
+    """
+    key = headers.get(API_KEY_HEADER)
+    if key:
+        return "key:" + hashlib.sha256(key.encode()).hexdigest()[:12]
+    if FORWARDED_HOPS and headers.get("x-forwarded-for"):
+        hops = [h.strip() for h in headers["x-forwarded-for"].split(",") if h.strip()]
+        if hops:
+            return "ip:" + hops[-min(FORWARDED_HOPS, len(hops))]
+    return "ip:" + (peer or "unknown")
+
+
+@dataclass
+class _Client:
+    bucket: Optional[TokenBucket]
+    weight: float = 1.0
+    pending: Deque[Callable[[], Awaitable[Any]]] = field(default_factory=deque)
+    running: int = 0
+    deficit: float = 0.0
+    admitted: int = 0
+    throttled: int = 0
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+class Throttled(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class FairScheduler:
+    """Token bucket per client in front of a deficit-round-robin job queue.
+
+    ``admit`` charges the client's bucket (``rate_per_min``, ``burst``;
+    rate 0 turns it off) and caps how many of its jobs may wait. Admitted
+    jobs run at most ``max_concurrent`` at a time; when a slot frees up,
+    clients with waiting jobs take turns, each round adding ``weight`` to a
+    client's deficit and starting one job per whole unit. A client that
+    submits 100 jobs therefore can't delay another client's single job by
+    more than one round. Clients with nothing queued or running are dropped
+    after ``idle_s``, so state stays proportional to active clients.
+    All methods run on the event loop.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS,
+                 rate_per_min: float = CLIENT_RATE_PER_MIN, burst: float = CLIENT_BURST,
+                 max_pending: int = CLIENT_MAX_PENDING, idle_s: float = CLIENT_IDLE_S):
+        self.max_concurrent = max_concurrent
+        self.rate_per_min = rate_per_min
+        self.burst = burst
+        self.max_pending = max_pending
+        self.idle_s = idle_s
+        self.running = 0
+        self._clients: Dict[str, _Client] = {}
+        self._active: "OrderedDict[str, None]" = OrderedDict()   # clients with pending jobs, in turn order
+        self._last_sweep = time.monotonic()
+        # The loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _client(self, cid: str) -> _Client:
+        client = self._clients.get(cid)
+        if client is None:
+            bucket = TokenBucket(self.rate_per_min, self.burst) if self.rate_per_min > 0 else None
+            client = self._clients[cid] = _Client(bucket)
+        client.last_seen = time.monotonic()
+        return client
+
+    def set_weight(self, cid: str, weight: float) -> None:
+        self._client(cid).weight = max(0.01, weight)
+
+    def admit(self, cid: str, jobs: int = 1) -> None:
+        """Charge one request that queues ``jobs`` jobs to ``cid``; raises
+        Throttled if it's over its rate or would queue more than
+        ``max_pending`` jobs"""
+        self._sweep()
+        client = self._client(cid)
+        if len(client.pending) + jobs > self.max_pending:
+            self._throttle(client, "too many queued jobs", 1.0)
+        if client.bucket is not None:
+            wait = client.bucket.wait_time(1, time.monotonic())
+            if wait > 0:
+                self._throttle(client, "rate limit exceeded", wait)
+            client.bucket.take(1)
+        client.admitted += 1
+
+    def _throttle(self, client: _Client, reason: str, retry_after: float) -> None:
+        client.throttled += 1
+        metrics.inc("client_throttled_total")
+        raise Throttled(reason, retry_after)
+
+    def submit(self, cid: str, job: Callable[[], Awaitable[Any]]) -> None:
+        """Queue ``job`` (a coroutine factory) for ``cid`` and start what fits"""
+        client = self._client(cid)
+        client.pending.append(job)
+        self._active.setdefault(cid, None)
+        self._dispatch()
+
+    def _next(self) -> Optional[str]:
+        """Deficit round robin: whose job starts next"""
+        while self._active:
+            cid = next(iter(self._active))
+            client = self._clients[cid]
+            if client.deficit >= 1.0:
+                client.deficit -= 1.0
+                if len(client.pending) == 1:
+                    client.deficit = 0.0   # leaving the active set; don't bank credit
+                    del self._active[cid]
+                return cid
+            client.deficit += client.weight
+            self._active.move_to_end(cid)
+        return None
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrent:
+            cid = self._next()
+            if cid is None:
+                break
+            client = self._clients[cid]
+            job = client.pending.popleft()
+            client.running += 1
+            self.running += 1
+            task = asyncio.create_task(self._run(cid, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        metrics.set("fair_queue_depth", self.queued)
+        metrics.set("fair_running_jobs", self.running)
+
+    async def _run(self, cid: str, job: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await job()
+        except Exception as e:
+            logger.error("Scheduled job for %s failed: %s", cid, e, extra=_STAGE)
+        finally:
+            self.running -= 1
+            client = self._clients.get(cid)
+            if client is not None:
+                client.running -= 1
+                client.last_seen = time.monotonic()
+            self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(self._clients[cid].pending) for cid in self._active)
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL_S:
+            return
+        self._last_sweep = now
+        idle = [cid for cid, c in self._clients.items()
+                if not c.pending and not c.running and now - c.last_seen > self.idle_s]
+        for cid in idle:
+            del self._clients[cid]
+        metrics.set("fair_clients", len(self._clients))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "clients": {
+                cid: {"queued": len(c.pending), "running": c.running, "admitted": c.admitted,
+                      "throttled": c.throttled, "weight": c.weight,
+                      "idle_s": round(time.monotonic() - c.last_seen, 1)}
+                for cid, c in self._clients.items()
+            },
+        }
+
+
+scheduler = FairScheduler()
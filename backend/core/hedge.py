@@ -0,0 +1,150 @@
+"""
+Hedged requests for tail-latency-sensitive calls
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from core.config import (
+    HEDGE_PERCENTILE,
+    HEDGE_BUDGET,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MIN_DELAY_S,
+)
+from core.metrics import metrics
+
+T = TypeVar("T")
+
+# Recent latencies kept per hedger for the trigger percentile
+LATENCY_WINDOW = 512
+
+# Cap on saved-up hedges, so a quiet spell can't fund a burst of them
+MAX_BUDGET_CREDIT = 10.0
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+        return _executor
+
+
+class Hedger:
+    """Starts a second identical call when the first is slower than usual.
+
+    The trigger is the ``percentile`` of this hedger's recent latencies, and
+    nothing is hedged until ``min_samples`` calls have been seen. Every call
+    earns ``budget`` credit and every hedge spends one, so at most that
+    share of traffic is duplicated. Errors are not hedged: a primary that
+    fails before the trigger fails the call.
+    """
+
+    def __init__(self, name: str, percentile: float = HEDGE_PERCENTILE,
+                 budget: float = HEDGE_BUDGET, min_samples: int = HEDGE_MIN_SAMPLES,
+                 min_delay: float = HEDGE_MIN_DELAY_S):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if there's no trigger yet"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))])
+
+    def _start_call(self) -> None:
+        metrics.inc("hedge_calls_total", name=self.name)
+        with self._lock:
+            self._credit = min(MAX_BUDGET_CREDIT, self._credit + self.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                metrics.inc("hedge_budget_denied_total", name=self.name)
+                return False
+            self._credit -= 1.0
+        metrics.inc("hedge_fired_total", name=self.name)
+        return True
+
+    def _record(self, latency: float, hedge_won: bool) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+        if hedge_won:
+            metrics.inc("hedge_won_total", name=self.name)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run blocking ``fn``, hedging it on a worker thread if it's slow"""
+        self._start_call()
+        trigger = self.delay()
+        started = time.monotonic()
+        if trigger is None:
+            result = fn()
+            self._record(time.monotonic() - started, False)
+            return result
+
+        primary = _pool().submit(fn)
+        done, _ = wait([primary], timeout=trigger)
+        if done or not self._spend():
+            result = primary.result()
+            self._record(time.monotonic() - started, False)
+            return result
+
+        # The loser can't be interrupted; it finishes on its worker and is dropped
+        hedge = _pool().submit(fn)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None or not pending:
+                    self._record(time.monotonic() - started, fut is hedge and fut.exception() is None)
+                    return fut.result()
+
+    async def acall(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()``, starting a second ``fn()`` if the first is slow"""
+        self._start_call()
+        trigger = self.delay()
+        started = time.monotonic()
+        if trigger is None:
+            result = await fn()
+            self._record(time.monotonic() - started, False)
+            return result
+
+        primary = asyncio.ensure_future(fn())
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=trigger)
+        except BaseException:
+            primary.cancel()
+            raise
+        if done or not self._spend():
+            result = await primary
+            self._record(time.monotonic() - started, False)
+            return result
+
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        self._record(time.monotonic() - started, task is hedge and task.exception() is None)
+                        return task.result()
+        finally:
+            # Safe for guarded LLM calls: a cancelled call gives back its
+            # limiter permit and any breaker probe (agents/llm.py)
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,317 @@
+"""
+Durable job history with write-behind batching
+"""
+import asyncio
+import base64
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import (
+    DATABASE_URL,
+    HISTORY_BATCH_SIZE,
+    HISTORY_FLUSH_S,
+    HISTORY_QUEUE_MAX,
+)
+from core.logging import get_logger
+from core.metrics import metrics
+from core.records import LogRing
+
+logger = get_logger("history")
+_STAGE = {"stage": "history"}
+
+COLUMNS = ("job_id", "query", "normalized_query", "title", "year", "url", "status",
+           "error", "timings", "log_summary", "created_at", "completed_at")
+
+# created_at / completed_at are ISO-8601 UTC strings on both backends, so
+# they sort correctly as text and cursors are portable between them
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS job_history (
+        job_id TEXT PRIMARY KEY,
+        query TEXT NOT NULL,
+        normalized_query TEXT NOT NULL,
+        title TEXT,
+        year TEXT,
+        url TEXT,
+        status TEXT NOT NULL,
+        error TEXT,
+        timings TEXT,
+        log_summary TEXT,
+        created_at TEXT NOT NULL,
+        completed_at TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS job_history_normq_idx ON job_history (normalized_query, created_at, job_id)",
+    "CREATE INDEX IF NOT EXISTS job_history_created_idx ON job_history (created_at, job_id)",
+]
+
+# Most requested queries since a time (one original spelling each); {p1}
+# and {p2} are the backend's parameter placeholders
+TOP_SQL = """SELECT MIN(query), COUNT(*) AS n FROM job_history
+    WHERE created_at >= {p1} GROUP BY normalized_query ORDER BY n DESC LIMIT {p2}"""
+
+# Queued by JobHistory.stop; the writer flushes everything before it and exits
+_STOP = object()
+
+Cursor = Tuple[str, str]   # (created_at, job_id) of the last row on a page
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    return base64.urlsafe_b64encode(f"{cursor[0]}|{cursor[1]}".encode()).decode()
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Inverse of encode_cursor; raises ValueError on a malformed token"""
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(token.encode()).decode().split("|", 1)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {token!r}") from e
+    return created_at, job_id
+
+
+def _page_sql(placeholder, query: Optional[str], cursor: Optional[Cursor]) -> Tuple[str, List[Any]]:
+    """Keyset pagination, newest first; ``placeholder(i)`` renders parameter i"""
+    where, params = [], []
+    if query is not None:
+        params.append(query)
+        where.append(f"normalized_query = {placeholder(len(params))}")
+    if cursor is not None:
+        params.extend(cursor)
+        where.append(f"(created_at, job_id) < ({placeholder(len(params) - 1)}, {placeholder(len(params))})")
+    sql = f"SELECT {', '.join(COLUMNS)} FROM job_history"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY created_at DESC, job_id DESC LIMIT ", params
+
+
+class SQLiteHistory:
+    """sqlite3 on a worker thread; for local runs and tests"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _open(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for stmt in SCHEMA:
+            self._conn.execute(stmt)
+        self._conn.commit()
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._open)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO job_history ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                [tuple(row.get(c) for c in COLUMNS) for row in rows],
+            )
+
+    async def write_many(self, rows: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, rows)
+
+    def _page(self, limit: int, query: Optional[str], cursor: Optional[Cursor]) -> List[Dict[str, Any]]:
+        sql, params = _page_sql(lambda i: "?", query, cursor)
+        rows = self._conn.execute(sql + "?", (*params, limit)).fetchall()
+        return [dict(zip(COLUMNS, r)) for r in rows]
+
+    async def page(self, limit: int, query: Optional[str] = None,
+                   cursor: Optional[Cursor] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._page, limit, query, cursor)
+
+    def _top(self, n: int, since: str) -> List[str]:
+        rows = self._conn.execute(TOP_SQL.format(p1="?", p2="?"), (since, n)).fetchall()
+        return [r[0] for r in rows]
+
+    async def top_queries(self, n: int, since: str) -> List[str]:
+        return await asyncio.to_thread(self._top, n, since)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+
+class PostgresHistory:
+    """asyncpg connection pool (``pip install asyncpg``)"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool = None
+
+    async def open(self) -> None:
+        import asyncpg
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        async with self._pool.acquire() as conn:
+            for stmt in SCHEMA:
+                await conn.execute(stmt)
+
+    async def write_many(self, rows: List[Dict[str, Any]]) -> None:
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in COLUMNS if c != "job_id")
+        sql = (f"INSERT INTO job_history ({', '.join(COLUMNS)}) "
+               f"VALUES ({', '.join(f'${i + 1}' for i in range(len(COLUMNS)))}) "
+               f"ON CONFLICT (job_id) DO UPDATE SET {updates}")
+        async with self._pool.acquire() as conn:
+            await conn.executemany(sql, [tuple(row.get(c) for c in COLUMNS) for row in rows])
+
+    async def page(self, limit: int, query: Optional[str] = None,
+                   cursor: Optional[Cursor] = None) -> List[Dict[str, Any]]:
+        sql, params = _page_sql(lambda i: f"${i}", query, cursor)
+        sql += f"${len(params) + 1}"
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(sql, *params, limit)
+        return [dict(r) for r in rows]
+
+    async def top_queries(self, n: int, since: str) -> List[str]:
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(TOP_SQL.format(p1="$1", p2="$2"), since, n)
+        return [r[0] for r in rows]
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def make_backend(url: str):
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresHistory(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteHistory(url[len("sqlite:///"):] or ":memory:")
+    raise ValueError(f"Unsupported DATABASE_URL: {url}")
+
+
+class JobHistory:
+    """Write-behind queue in front of a history backend.
+
+    ``record`` only enqueues, so the request path never waits on the
+    database. A background task drains the queue and commits up to
+    ``batch_size`` rows at a time, at least every ``flush_s`` seconds. When
+    the queue is full new rows are dropped and counted rather than blocking.
+    """
+
+    def __init__(self, url: str = DATABASE_URL, batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_s: float = HISTORY_FLUSH_S, max_queue: int = HISTORY_QUEUE_MAX):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.max_queue = max_queue
+        self.backend = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def start(self) -> None:
+        backend = make_backend(self.url)
+        try:
+            await backend.open()
+        except Exception as e:
+            logger.error("Job history disabled, could not open %s: %s", backend.__class__.__name__, e,
+                         extra=_STAGE)
+            return
+        self.backend = backend
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._writer())
+
+    def record(self, row: Dict[str, Any]) -> None:
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            metrics.inc("history_dropped_total")
+            return
+        metrics.set("history_queue_depth", self._queue.qsize())
+
+    async def _next_batch(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Up to ``batch_size`` rows, and whether ``stop`` was requested"""
+        row = await self._queue.get()
+        if row is _STOP:
+            return [], True
+        batch = [row]
+        deadline = time.monotonic() + self.flush_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            await self.backend.write_many(batch)
+        except Exception as e:
+            metrics.inc("history_write_errors_total")
+            logger.error("Job history write of %d rows failed: %s", len(batch), e, extra=_STAGE)
+            return
+        metrics.inc("history_rows_written_total", len(batch))
+        metrics.observe("history_batch_seconds", time.perf_counter() - start)
+        metrics.set("history_queue_depth", self._queue.qsize())
+
+    async def _writer(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+        # Rows recorded while the last batch was being written
+        pending = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not _STOP:
+                pending.append(row)
+        for i in range(0, len(pending), self.batch_size):
+            await self._flush(pending[i:i + self.batch_size])
+
+    async def stop(self) -> None:
+        """Flush whatever is queued, then close the backend"""
+        if self._task is None:
+            return
+        # Not cancelled: the writer may be holding a half-collected batch
+        await self._queue.put(_STOP)
+        await self._task
+        await self.backend.close()
+        self.backend, self._queue, self._task = None, None, None
+
+    async def top_queries(self, n: int, since: str) -> List[str]:
+        """Up to ``n`` most frequent queries created at or after ``since``"""
+        return await self.backend.top_queries(n, since)
+
+    async def page(self, limit: int = 20, query: Optional[str] = None,
+                   cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Newest-first page of jobs plus the cursor for the next one"""
+        items = await self.backend.page(limit, query, decode_cursor(cursor) if cursor else None)
+        for item in items:
+            for col in ("timings", "log_summary"):
+                if isinstance(item.get(col), str):
+                    item[col] = json.loads(item[col])
+        next_cursor = None
+        if len(items) == limit:
+            next_cursor = encode_cursor((items[-1]["created_at"], items[-1]["job_id"]))
+        return {"items": items, "next_cursor": next_cursor}
+
+
+def summarize_logs(logs: LogRing) -> Dict[str, Any]:
+    """Counts per level plus the last error, instead of the full log"""
+    counts: Dict[str, int] = {}
+    last_error = None
+    for entry in logs:
+        counts[entry.level] = counts.get(entry.level, 0) + 1
+        if entry.level == "error":
+            last_error = entry.message
+    return {"entries": logs.total, "kept": len(logs), "levels": counts, "last_error": last_error}
+
+
+history = JobHistory()
@@ -0,0 +1,249 @@
+"""
+Process-wide rate limiting for LLM calls
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from core.config import (
+    LLM_RPM,
+    LLM_TPM,
+    LLM_MAX_CONCURRENCY,
+    LLM_MIN_CONCURRENCY,
+    LLM_LATENCY_TARGET_S,
+)
+from core.metrics import metrics
+
+# Lower value is served first
+PRIORITY_FILMSCOUT = 0
+PRIORITY_VIDSCOUT = 1
+PRIORITY_BACKGROUND = 5
+
+# Raised by background work (core/prefetch.py) so every LLM call it makes,
+# including those on agent threads, queues behind foreground calls
+priority_floor: ContextVar[int] = ContextVar("llm_priority_floor", default=0)
+
+PRIORITY_NAMES = {PRIORITY_FILMSCOUT: "filmscout", PRIORITY_VIDSCOUT: "vidscout",
+                  PRIORITY_BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Refills continuously at ``per_minute / 60`` units per second"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (0 if it already is)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate else float("inf")
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: float = field(compare=False)
+    wake: object = field(compare=False, default=None)   # callable that wakes the waiter
+    granted: bool = field(compare=False, default=False)
+    cancelled: bool = field(compare=False, default=False)
+
+
+@dataclass
+class Permit:
+    priority: int
+    tokens: float
+    started: float
+
+
+class LLMLimiter:
+    """Token buckets for requests/min and tokens/min plus an AIMD window.
+
+    The concurrency window grows by ~1 per window's worth of successful
+    calls and is halved on a 429 or a call slower than the latency target
+    (at most once per second). Waiters are served strictly by priority,
+    then arrival, so FilmScout calls overtake queued VidScout steps. Both
+    agent threads (``acquire_sync``) and coroutines (``acquire``) can wait.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 min_concurrency: int = LLM_MIN_CONCURRENCY,
+                 latency_target: float = LLM_LATENCY_TARGET_S):
+        self.requests = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.max_window = float(max_concurrency)
+        self.min_window = float(min_concurrency)
+        self.window = float(max_concurrency)
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # -- waiting -------------------------------------------------------------
+
+    def _head(self) -> Optional[_Waiter]:
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    def _try_grant(self, w: _Waiter) -> Optional[float]:
+        """Grant ``w`` if possible. Returns None when granted, else a hint of
+        how long to wait (0 means "until someone releases")."""
+        if self._head() is not w:
+            return 0.0
+        if self.in_flight >= int(self.window):
+            return 0.0
+        now = time.monotonic()
+        delay = max(self.requests.wait_time(1, now), self.token_bucket.wait_time(w.tokens, now))
+        if delay > 0:
+            return delay
+        heapq.heappop(self._heap)
+        self.requests.take(1)
+        self.token_bucket.take(w.tokens)
+        self.in_flight += 1
+        w.granted = True
+        self._wake_head()
+        metrics.set("llm_in_flight", self.in_flight)
+        metrics.set("llm_queue_depth", len(self._heap))
+        return None
+
+    def _wake_head(self) -> None:
+        head = self._head()
+        if head is not None and head.wake is not None:
+            head.wake()
+
+    def _enqueue(self, priority: int, tokens: float, wake) -> _Waiter:
+        w = _Waiter(priority, next(self._seq), tokens, wake)
+        heapq.heappush(self._heap, w)
+        metrics.set("llm_queue_depth", len(self._heap))
+        return w
+
+    def _permit(self, w: _Waiter, enqueued: float) -> Permit:
+        waited = time.monotonic() - enqueued
+        metrics.observe("llm_wait_seconds", waited, priority=PRIORITY_NAMES.get(w.priority, w.priority))
+        return Permit(w.priority, w.tokens, time.monotonic())
+
+    def acquire_sync(self, priority: int, tokens: float) -> Permit:
+        """Block the calling thread until the call may proceed"""
+        event = threading.Event()
+        enqueued = time.monotonic()
+        with self._lock:
+            w = self._enqueue(priority, tokens, event.set)
+        try:
+            while True:
+                with self._lock:
+                    hint = self._try_grant(w)
+                if hint is None:
+                    return self._permit(w, enqueued)
+                event.wait(hint or 1.0)
+                event.clear()
+        except BaseException:
+            self._abandon(w)
+            raise
+
+    async def acquire(self, priority: int, tokens: float) -> Permit:
+        """Wait on the event loop until the call may proceed"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        enqueued = time.monotonic()
+        with self._lock:
+            w = self._enqueue(priority, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        try:
+            while True:
+                with self._lock:
+                    hint = self._try_grant(w)
+                if hint is None:
+                    return self._permit(w, enqueued)
+                try:
+                    await asyncio.wait_for(event.wait(), hint or 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            self._abandon(w)
+            raise
+
+    def _abandon(self, w: _Waiter) -> None:
+        with self._lock:
+            if w.granted:
+                self._finish()
+            else:
+                w.cancelled = True
+                self._wake_head()
+
+    def has_waiters_above(self, priority: int) -> bool:
+        """Whether a more urgent call (lower value) than ``priority`` is queued"""
+        with self._lock:
+            return any(w.priority < priority and not w.cancelled for w in self._heap)
+
+    # -- completion ----------------------------------------------------------
+
+    def _finish(self) -> None:
+        self.in_flight -= 1
+        metrics.set("llm_in_flight", self.in_flight)
+        self._wake_head()
+
+    def release(self, permit: Permit, ok: bool = True, throttled: bool = False,
+                tokens_used: Optional[float] = None) -> None:
+        latency = time.monotonic() - permit.started
+        with self._lock:
+            if tokens_used is not None and tokens_used < permit.tokens:
+                self.token_bucket.give_back(permit.tokens - tokens_used)
+            now = time.monotonic()
+            if throttled or latency > self.latency_target:
+                if now - self._last_decrease > 1.0:
+                    self.window = max(self.min_window, self.window / 2)
+                    self._last_decrease = now
+            elif ok:
+                self.window = min(self.max_window, self.window + 1.0 / self.window)
+            self._finish()
+        metrics.set("llm_concurrency_window", self.window)
+        metrics.observe("llm_call_seconds", latency, priority=PRIORITY_NAMES.get(permit.priority, permit.priority))
+        if throttled:
+            metrics.inc("llm_throttled_total")
+
+    def cancel(self, permit: Permit) -> None:
+        """Give back the permit of a call that was cancelled; its latency
+        says nothing about the provider, so the window is left alone"""
+        with self._lock:
+            self._finish()
+        metrics.inc("llm_cancelled_total")
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """Whether an exception looks like a provider quota/rate-limit error"""
+    text = f"{type(exc).__name__} {exc}".lower()
+    return "429" in text or "resourceexhausted" in text or "resource has been exhausted" in text \
+        or "quota" in text or "rate limit" in text
+
+
+def estimate_tokens(text: str, completion: int = 256) -> int:
+    """Rough prompt + completion token count (about 4 characters per token)"""
+    return len(text) // 4 + completion
+
+
+llm_limiter = LLMLimiter()
@@ -1,49 +1,113 @@
-import asyncio
-import datetime as dt
+"""
+Structured, queue-backed logging for the whole backend
+"""
+import atexit
+import json
 import logging
-from langchain.callbacks.base import BaseCallbackHandler
-
-logger = logging.getLogger(__name__)
-
-class LogHandler(BaseCallbackHandler):
-    def __init__(self, state): 
-        self.state = state
-        self._last_tool = None
-
-    def _add_sync(self, msg: str, lvl: str = "info"):
-        """Synchronous logging without WebSocket broadcast"""
-        ts = dt.datetime.utcnow().isoformat()
-        log_entry = {"type": lvl, "message": msg, "timestamp": ts}
-        
-        self.state.logs.append(log_entry)
-        logger.info(msg)
-        
-        # Don't use asyncio.create_task here - it causes event loop issues
-
-    def on_llm_start(self, serialized, prompts, **kw):
-        self._add_sync(f"🧠 LLM thinking...", "debug")
-
-    def on_llm_end(self, response, **kw):
-        text = response.generations[0][0].text.strip()
-        if "Thought:" in text:
-            thought = text.split("Thought:")[-1].split("Action:")[0].strip()
-            if thought:
-                self._add_sync(f"💭 {thought}", "debug")
-
-    def on_tool_start(self, tool, input_str, **kw):
-        tool_name = tool.name if hasattr(tool, 'name') else str(tool)
-        self._last_tool = tool_name
-        # Don't log here to avoid duplicates with tool functions
-
-    def on_tool_end(self, output, **kw):
-        # Don't log here - tools handle their own logging
-        pass
-
-    def on_agent_finish(self, finish, **kw):
-        output = finish.return_values.get("output", "")
-        if "FINISH:" in output.upper():
-            url = output.split(":", 1)[1].strip()
-            self._add_sync(f"🎯 Agent finished with: {url}", "success")
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+from core.config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE
+
+# Every backend logger lives under this name, so configuring it leaves
+# uvicorn's and the libraries' loggers alone
+ROOT = "sidedoor"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _ContextFilter(logging.Filter):
+    """Runs in the caller's thread: stamps the current job id and samples
+    DEBUG records at LOG_DEBUG_SAMPLE"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE < 1.0 and random.random() >= LOG_DEBUG_SAMPLE:
+            return False
+        if not hasattr(record, "job_id"):
+            from core.state import get_current_state
+            state = get_current_state()
+            record.job_id = state.job_id if state else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra={...}`` fields are included"""
+
+    _std = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._std and value is not None:
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        job = getattr(record, "job_id", None)
+        stage = getattr(record, "stage", None)
+        prefix = "".join(f"[{v}] " for v in (job and job[:8], stage) if v)
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        line = f"{stamp} {record.levelname:<7} {record.name}: {prefix}{record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _levels(spec: str) -> Dict[str, int]:
+    """``search=DEBUG,validation=WARNING`` -> {"sidedoor.search": 10, ...}"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[f"{ROOT}.{name.strip()}"] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def configure_logging() -> None:
+    """Route ``sidedoor.*`` through a queue to one stderr writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger(ROOT)
+    root.setLevel(LOG_LEVEL.upper())
+    root.propagate = False
+    for name, level in _levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else _TextFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(_ContextFilter())
+    root.addHandler(handler)
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """``get_logger("search")`` -> the ``sidedoor.search`` logger"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+logger = get_logger("app")
+
+# LogHandler lives in core/callbacks.py so importing the logger doesn't pull
+# in LangChain.
 
 # """
 # Logging handlers and utilities
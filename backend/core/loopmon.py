@@ -0,0 +1,150 @@
+"""
+Event-loop lag monitor, stall stacks and an on-demand sampling profiler
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from core.config import LOOPMON_INTERVAL_S, LOOPMON_STALL_MS, LOOPMON_MAX_STALLS
+from core.logging import get_logger
+from core.metrics import metrics
+
+logger = get_logger("loopmon")
+_STAGE = {"stage": "loopmon"}
+
+
+class LoopMonitor:
+    """Measures how late the event loop runs a timer, every ``interval_s``.
+
+    The lag goes into the ``event_loop_lag_ms`` histogram. A watchdog
+    thread checks the monitor's heartbeat; once the loop has not come back
+    for ``stall_ms``, it captures the loop thread's stack (the callback
+    that is blocking it) into ``stalls``, once per stall.
+    """
+
+    def __init__(self, interval_s: float = LOOPMON_INTERVAL_S, stall_ms: float = LOOPMON_STALL_MS,
+                 max_stalls: int = LOOPMON_MAX_STALLS):
+        self.interval_s = interval_s
+        self.stall_s = stall_ms / 1000
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    async def _tick(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            now = time.monotonic()
+            self._beat = now
+            metrics.observe("event_loop_lag_ms", max(0.0, now - expected) * 1000)
+
+    def _watch(self) -> None:
+        captured_for = None
+        while not self._stop.wait(self.interval_s / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval_s
+            if stalled < self.stall_s or captured_for == beat:
+                continue
+            captured_for = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = traceback.format_stack(frame) if frame is not None else []
+            self.stalls.append({"at": time.time(), "stalled_ms": round(stalled * 1000, 1),
+                                "stack": [line.rstrip() for line in stack[-15:]]})
+            metrics.inc("event_loop_stalls_total")
+            where = stack[-1].strip().splitlines()[0] if stack else "unknown"
+            logger.warning("Event loop blocked for %.0fms at %s", stalled * 1000, where, extra=_STAGE)
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        count, p50 = metrics.quantile("event_loop_lag_ms", 0.5)
+        _, p99 = metrics.quantile("event_loop_lag_ms", 0.99)
+        return {"samples": count, "lag_p50_ms": round(p50, 2), "lag_p99_ms": round(p99, 2),
+                "stall_threshold_ms": self.stall_s * 1000, "stalls": list(self.stalls)}
+
+
+def _frames(frame) -> List[str]:
+    """Root-first ``function (file:line)`` names for one thread's stack"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def sample_stacks(seconds: float, interval_s: float) -> Counter:
+    """Sample every thread's stack for ``seconds``; blocking, so run it in
+    a worker thread. Keys are (thread name, *frames) tuples."""
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    samples: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                samples[(names.get(ident, str(ident)), *_frames(frame))] += 1
+        time.sleep(interval_s)
+    return samples
+
+
+def collapsed(samples: Counter) -> str:
+    """Brendan Gregg's folded format, for flamegraph.pl or speedscope"""
+    return "\n".join(f"{';'.join(stack)} {n}" for stack, n in samples.most_common())
+
+
+def speedscope(samples: Counter, interval_s: float) -> Dict[str, Any]:
+    """A speedscope 'sampled' profile per thread"""
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    by_thread: Dict[str, List] = {}
+    for (thread, *stack), n in samples.items():
+        ids = []
+        for name in stack:
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({"name": name})
+            ids.append(index[name])
+        stacks, weights = by_thread.setdefault(thread, ([], []))
+        stacks.append(ids)
+        weights.append(n * interval_s * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [
+            {"type": "sampled", "name": thread, "unit": "milliseconds",
+             "startValue": 0, "endValue": sum(weights), "samples": stacks, "weights": weights}
+            for thread, (stacks, weights) in by_thread.items()
+        ],
+        "exporter": "sidedoor-loopmon",
+    }
+
+
+loop_monitor = LoopMonitor()
+
+# One profile at a time; sampling every thread isn't free
+profile_lock = asyncio.Lock()
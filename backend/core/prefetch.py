@@ -0,0 +1,156 @@
+"""
+Background prefetch of popular queries to warm the caches
+"""
+import asyncio
+import datetime as dt
+import os
+from typing import Any, Dict, List, Optional
+
+from core.cache import result_cache
+from core.config import (
+    PREFETCH_SOURCES,
+    PREFETCH_INTERVAL_S,
+    PREFETCH_FILE,
+    PREFETCH_REDIS_KEY,
+    PREFETCH_TOP_N,
+    PREFETCH_HISTORY_DAYS,
+    PREFETCH_MAX_FOREGROUND,
+    REDIS_URL,
+)
+from core.fairness import scheduler
+from core.history import history
+from core.limiter import PRIORITY_BACKGROUND, llm_limiter, priority_floor
+from core.logging import get_logger
+from core.metrics import metrics
+from utils.helpers import normalize_query
+
+logger = get_logger("prefetch")
+_STAGE = {"stage": "prefetch"}
+
+# How often a running prefetch checks whether it should give way
+CHECK_INTERVAL_S = 0.5
+
+
+def _read_redis(key: str) -> List[str]:
+    import redis
+    client = redis.Redis.from_url(REDIS_URL, decode_responses=True, socket_timeout=2)
+    try:
+        return client.lrange(key, 0, -1)
+    finally:
+        client.close()
+
+
+def _read_file(path: str) -> List[str]:
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class Prefetcher:
+    """Runs popular queries through the pipeline while the server is quiet.
+
+    Queries come from ``sources`` (any of ``redis``, ``file``, ``history``),
+    are de-duplicated by normalized form and skipped while their result is
+    still cached. One query runs at a time with every LLM call demoted to
+    background priority. Before and during each run the prefetcher checks
+    foreground load (running jobs above ``max_foreground``, or any
+    foreground call waiting on the LLM limiter); when it rises the run is
+    cancelled and the pass stops until the next interval.
+    """
+
+    def __init__(self, sources: List[str] = PREFETCH_SOURCES, interval_s: float = PREFETCH_INTERVAL_S,
+                 max_foreground: int = PREFETCH_MAX_FOREGROUND):
+        self.sources = sources
+        self.interval_s = interval_s
+        self.max_foreground = max_foreground
+        self.last_pass: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def foreground_busy(self) -> bool:
+        return scheduler.running > self.max_foreground or llm_limiter.has_waiters_above(PRIORITY_BACKGROUND)
+
+    async def popular_queries(self) -> List[str]:
+        queries: List[str] = []
+        for source in self.sources:
+            try:
+                if source == "redis":
+                    queries += await asyncio.to_thread(_read_redis, PREFETCH_REDIS_KEY)
+                elif source == "file":
+                    queries += await asyncio.to_thread(_read_file, PREFETCH_FILE)
+                elif source == "history" and history.enabled:
+                    since = (dt.datetime.utcnow() - dt.timedelta(days=PREFETCH_HISTORY_DAYS)).isoformat()
+                    queries += await history.top_queries(PREFETCH_TOP_N, since)
+            except Exception as e:
+                logger.warning("Prefetch source %s unavailable: %s", source, e, extra=_STAGE)
+        seen, unique = set(), []
+        for q in queries:
+            key = normalize_query(q)
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(q)
+        return unique
+
+    async def _run_one(self, query: str, n: int) -> bool:
+        """Run one query; False if it was pre-empted by foreground load"""
+        from inference import run_backend
+
+        async def job():
+            priority_floor.set(PRIORITY_BACKGROUND)
+            return await run_backend(query, job_id=f"prefetch-{n}")
+
+        task = asyncio.create_task(job())
+        while not task.done():
+            await asyncio.wait({task}, timeout=CHECK_INTERVAL_S)
+            if not task.done() and self.foreground_busy():
+                # Cancelled LLM calls give back their limiter permits, and a
+                # running agent thread stops at its next step
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return False
+        if task.exception() is not None:
+            logger.warning("Prefetch of %r failed: %s", query, task.exception(), extra=_STAGE)
+        return True
+
+    async def run_pass(self) -> Dict[str, Any]:
+        stats = {"queries": 0, "ran": 0, "cached": 0, "preempted": False,
+                 "started_at": dt.datetime.utcnow().isoformat()}
+        queries = await self.popular_queries()
+        stats["queries"] = len(queries)
+        for n, query in enumerate(queries):
+            if normalize_query(query) in result_cache:
+                stats["cached"] += 1
+                continue
+            if self.foreground_busy() or not await self._run_one(query, n):
+                stats["preempted"] = True
+                metrics.inc("prefetch_preempted_total")
+                break
+            stats["ran"] += 1
+            metrics.inc("prefetch_runs_total")
+        self.last_pass = stats
+        return stats
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                stats = await self.run_pass()
+                logger.info("Prefetch pass: %s", stats, extra=_STAGE)
+            except Exception as e:
+                logger.error("Prefetch pass failed: %s", e, extra=_STAGE)
+            await asyncio.sleep(self.interval_s)
+
+    def start(self) -> None:
+        if self._task is None and self.sources:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,105 @@
+"""
+Compact in-memory job records and per-job log rings
+"""
+import datetime as dt
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from core.config import JOB_LOG_MAX, LOG_MESSAGE_MAX_CHARS
+
+
+def iso(ts: Optional[float]) -> Optional[str]:
+    """Epoch seconds as the naive UTC ISO string the API has always sent"""
+    if ts is None:
+        return None
+    return dt.datetime.fromtimestamp(ts, dt.timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class LogEntry:
+    __slots__ = ("ts", "level", "message")
+
+    def __init__(self, level: str, message: str, ts: Optional[float] = None):
+        self.ts = time.time() if ts is None else ts
+        self.level = sys.intern(level)   # a handful of distinct values
+        if len(message) > LOG_MESSAGE_MAX_CHARS:
+            message = message[:LOG_MESSAGE_MAX_CHARS] + "…"
+        self.message = message
+
+    @property
+    def timestamp(self) -> str:
+        return iso(self.ts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": self.level, "message": self.message, "timestamp": self.timestamp}
+
+
+class LogRing:
+    """A job's log: the newest ``maxlen`` entries plus a running count.
+
+    Entries are numbered from 0 in the order they were added; ``since``
+    pages by that number, so a cursor stays valid after older entries have
+    been dropped.
+    """
+
+    __slots__ = ("_entries", "total")
+
+    def __init__(self, maxlen: int = JOB_LOG_MAX):
+        self._entries: Deque[LogEntry] = deque(maxlen=maxlen)
+        self.total = 0
+
+    def add(self, level: str, message: str) -> LogEntry:
+        entry = LogEntry(level, message)
+        self._entries.append(entry)
+        self.total += 1
+        return entry
+
+    @property
+    def dropped(self) -> int:
+        return self.total - len(self._entries)
+
+    def since(self, after: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Entries numbered ``after`` and up (at most ``limit``) as dicts, and
+        the next cursor"""
+        start = max(after, self.dropped)
+        first = start - self.dropped
+        page = [self._entries[i].to_dict()
+                for i in range(first, min(first + limit, len(self._entries)))]
+        return page, start + len(page)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [e.to_dict() for e in self._entries]
+
+    def __iter__(self) -> Iterator[LogEntry]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"<LogRing {len(self._entries)}/{self.total} entries>"
+
+
+class JobRecord:
+    """One API job; serialized to dicts only when a response needs it"""
+
+    __slots__ = ("id", "status", "query", "results", "logs", "created", "completed", "error")
+
+    def __init__(self, job_id: str, query: str):
+        self.id = job_id
+        self.status = "pending"
+        self.query = query
+        self.results: List[Dict[str, Any]] = []
+        self.logs = LogRing()
+        self.created = time.time()
+        self.completed: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def created_at(self) -> str:
+        return iso(self.created)
+
+    @property
+    def completed_at(self) -> Optional[str]:
+        return iso(self.completed)
@@ -0,0 +1,83 @@
+"""
+Lazily constructed shared backends (LLM clients, Exa, agents)
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+@dataclass
+class _Entry:
+    factory: Callable[[], Any]
+    value: Any = None
+    initialized: bool = False
+    init_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Registry:
+    """Builds each registered object on first ``get`` and keeps it.
+
+    Construction is serialized per name, so concurrent first callers (the
+    event loop and agent threads) share one instance.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._entries[name] = _Entry(factory)
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        entry = self._entries[name]
+        if entry.initialized:
+            return entry.value
+        with self._locks[name]:
+            if not entry.initialized:
+                start = time.perf_counter()
+                try:
+                    entry.value = entry.factory()
+                except Exception as e:
+                    entry.error = str(e)
+                    raise
+                entry.init_ms = round((time.perf_counter() - start) * 1000, 1)
+                entry.error = None
+                entry.initialized = True
+        return entry.value
+
+    def override(self, name: str, value: Any) -> None:
+        """Install a ready-made object, e.g. a stand-in for benchmarks"""
+        entry = self._entries[name]
+        with self._locks[name]:
+            entry.value, entry.initialized, entry.error = value, True, None
+
+    def reset(self, name: str) -> None:
+        """Forget the built object so the next ``get`` rebuilds it"""
+        entry = self._entries[name]
+        with self._locks[name]:
+            entry.value, entry.initialized, entry.init_ms = None, False, None
+
+    def init_all(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Build everything (or ``names``) now; failures are recorded, not raised"""
+        for name in list(names or self._entries):
+            try:
+                self.get(name)
+            except Exception:
+                pass
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            name: {"initialized": e.initialized, "init_ms": e.init_ms, "error": e.error}
+            for name, e in self._entries.items()
+        }
+
+    @property
+    def ready(self) -> bool:
+        return all(e.initialized for e in self._entries.values())
+
+
+registry = Registry()
@@ -0,0 +1,87 @@
+"""
+JSON and msgpack encoding for HTTP responses and WebSocket frames
+"""
+import gzip
+import json
+from typing import Any
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from core.config import COMPRESS_MIN_BYTES
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+# WebSocket subprotocol for binary msgpack frames; clients opt in with
+# `new WebSocket(url, ["msgpack"])`
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON; orjson when installed, else the stdlib"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode()
+
+
+def _accepted(request: Request) -> set:
+    """Content codings the client accepts (q=0 means refused)"""
+    codings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            codings.add(name.lower())
+    return codings
+
+
+def compressed_json(request: Request, content: Any, status_code: int = 200) -> Response:
+    """JSON response, brotli- or gzip-compressed when at least
+    COMPRESS_MIN_BYTES and the client accepts it (brotli needs `brotli`)"""
+    body = dumps(content)
+    headers = {}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        codings = _accepted(request)
+        brotli = _brotli() if "br" in codings else None
+        if brotli is not None:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in codings:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def msgpack_available() -> bool:
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def packb(obj: Any) -> bytes:
+    import msgpack
+    return msgpack.packb(obj, use_bin_type=True, default=str)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with ``dumps``"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,87 @@
+"""
+Single-flight: concurrent callers with the same key share one call
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from core.metrics import metrics
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Thread-safe: the first caller for a key runs ``fn``; callers arriving
+    while it runs wait for and share its result (or exception). Nothing is
+    kept once the call returns, so this de-duplicates, it doesn't cache."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.inc("singleflight_shared_total", name=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Event-loop counterpart of SingleFlight for coroutines. Create one per
+    scope whose callers may share work (e.g. one batch of queries); with
+    ``keep_results`` successful results are also reused for the scope's
+    lifetime."""
+
+    def __init__(self, name: str, keep_results: bool = False):
+        self.name = name
+        self.keep_results = keep_results
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._calls.get(key)
+        if fut is not None:
+            metrics.inc("singleflight_shared_total", name=self.name)
+            # Shielded: one follower giving up mustn't cancel the others
+            return await asyncio.shield(fut)
+        fut = self._calls[key] = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't warn about an unretrieved exception
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            del self._calls[key]
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            del self._calls[key]
+            raise
+        fut.set_result(value)
+        if not self.keep_results:
+            del self._calls[key]
+        return value
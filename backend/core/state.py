@@ -1,50 +1,61 @@
 """
 State management and dataclasses
 """
-import datetime as dt
+from contextvars import ContextVar
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 
-# Global state for tools to access
-current_state = None
+from core.records import LogRing
+
+# Per-job state for tools to access. A ContextVar rather than a plain global
+# so concurrent jobs don't see each other's state; asyncio tasks and
+# asyncio.to_thread both carry it into the agent's tool calls.
+current_state: ContextVar[Optional["SearchState"]] = ContextVar("current_state", default=None)
 
 @dataclass
 class SearchState:
     query: str
     iter: int = 0 
     bad_urls: List[str] = field(default_factory=list)
-    logs: List[Dict[str, Any]] = field(default_factory=list)
+    logs: LogRing = field(default_factory=LogRing)
     websocket_manager: Optional[Any] = None   
     job_id: str = ""
     scratchpad: List[Dict[str, str]] = field(default_factory=list)
     last_obs: str = ""
     search_terms: List[str] = field(default_factory=list)
     candidates: List[str] = field(default_factory=list)
+    seen_urls: Set[str] = field(default_factory=set)      # canonical URLs surfaced to the agent
+    verdicts: Dict[str, str] = field(default_factory=dict)  # canonical URL -> "OK" / "BAD"
     results: Dict[str, Any] = field(default_factory=dict)
     verified: List[Any] = field(default_factory=list)
     best: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> total ms
+    llm_calls: int = 0         # VidScout model round trips
+    parse_failures: int = 0    # replies that weren't a usable action
+    prompt_tokens: int = 0     # estimated VidScout prompt tokens
+    obs_tokens_saved: int = 0  # estimated tokens trimmed from observations
+    url_aliases: Dict[str, str] = field(default_factory=dict)  # shortened URL -> full URL
+
+    def add_timing(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds * 1000, 1)
 
     async def log(self, message: str, level: str = "info"):
-        ts = dt.datetime.utcnow().isoformat()
-        self.logs.append({"type": level, "message": message, "timestamp": ts})
+        entry = self.logs.add(level, message)
         
         if self.websocket_manager:
             await self.websocket_manager.broadcast(
                 self.job_id,
-                {"type": "log", "message": message, "timestamp": ts, "level": level},
+                {"type": "log", "message": entry.message, "timestamp": entry.timestamp, "level": level},
             )
 
 def set_current_state(state: SearchState) -> None:
-    """Set the global current state for tools to access"""
-    global current_state
-    current_state = state
+    """Set the current job's state for tools to access"""
+    current_state.set(state)
 
 def get_current_state() -> Optional[SearchState]:
-    """Get the current global state"""
-    global current_state
-    return current_state
+    """Get the current job's state"""
+    return current_state.get()
 
 def clear_current_state() -> None:
-    """Clear the global state"""
-    global current_state
-    current_state = None
+    """Clear the current job's state"""
+    current_state.set(None)
@@ -0,0 +1,244 @@
+"""
+Append-only trace archive for finished agent runs
+"""
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from core.config import (
+    TRACE_DIR,
+    TRACE_COMPRESSION,
+    TRACE_SEGMENT_MB,
+    TRACE_MAX_SEGMENTS,
+    TRACE_QUEUE_MAX,
+)
+from core.logging import get_logger
+from core.metrics import metrics
+from core.records import iso
+
+logger = get_logger("traces")
+_STAGE = {"stage": "traces"}
+
+INDEX_FILE = "index.tsv"
+
+_STOP = object()
+
+
+def _codec(name: str):
+    """(file suffix, compress(bytes), open-for-streaming(fileobj)) for a codec.
+
+    Every record is compressed on its own, so a segment is a concatenation
+    of complete gzip members / zstd frames: readable as one stream by
+    ``zcat``/``zstdcat`` and seekable per record through the index.
+    """
+    if name == "zstd":
+        import zstandard
+        compressor = zstandard.ZstdCompressor()
+        return (".jsonl.zst", compressor.compress,
+                lambda f: zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True))
+    return ".jsonl.gz", lambda data: gzip.compress(data, mtime=0), lambda f: gzip.GzipFile(fileobj=f)
+
+
+def _decompress(suffix: str, data: bytes) -> bytes:
+    if suffix.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class TraceArchive:
+    """Writes trace records from a background thread.
+
+    ``submit`` takes a ``trace_record`` snapshot and never blocks: records
+    go through a bounded queue and are dropped (and counted) when it is
+    full. Segments rotate once they pass ``segment_mb``, and only the newest
+    ``max_segments`` are kept; ``index.tsv`` gets a ``job_id, segment,
+    offset, length`` line for each record written.
+    """
+
+    def __init__(self, directory: str = TRACE_DIR, compression: str = TRACE_COMPRESSION,
+                 segment_mb: float = TRACE_SEGMENT_MB, max_queue: int = TRACE_QUEUE_MAX,
+                 max_segments: int = TRACE_MAX_SEGMENTS):
+        self.directory = directory
+        self.compression = compression
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.max_segments = max_segments
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_name = ""
+        self._index = None
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("trace_dropped_total")
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out what is queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # -- writer thread -------------------------------------------------------
+
+    def _open_segment(self, suffix: str, rotate: bool = False) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        existing = [n for n in os.listdir(self.directory) if n.startswith("traces-")]
+        number = max((int(n[7:13]) for n in existing if n[7:13].isdigit()), default=0)
+        name = f"traces-{number:06d}{suffix}"
+        path = os.path.join(self.directory, name)
+        if rotate or not os.path.exists(path) or os.path.getsize(path) >= self.segment_bytes:
+            name = f"traces-{number + 1:06d}{suffix}"
+        self._segment_name = name
+        self._segment = open(os.path.join(self.directory, name), "ab")
+        self._prune()
+
+    def _prune(self) -> None:
+        """Delete the oldest segments past ``max_segments``; their index
+        lines stay behind and read as missing"""
+        if self.max_segments <= 0:
+            return
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("traces-"))
+        for name in names[:-self.max_segments]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning("Could not delete trace segment %s: %s", name, e, extra=_STAGE)
+                continue
+            metrics.inc("trace_segments_pruned_total")
+
+    def _run(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        suffix, compress, _ = _codec(self.compression)
+        self._index = open(os.path.join(self.directory, INDEX_FILE), "a", encoding="utf-8")
+        self._open_segment(suffix)
+        try:
+            while True:
+                record = self._queue.get()
+                if record is _STOP:
+                    break
+                try:
+                    self._write(_formatted(record), suffix, compress)
+                except Exception as e:
+                    metrics.inc("trace_write_errors_total")
+                    logger.error("Trace write failed for %s: %s", record.get("job_id"), e,
+                                 extra={**_STAGE, "job_id": record.get("job_id") or ""})
+        finally:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
+
+    def _write(self, record: Dict[str, Any], suffix: str, compress) -> None:
+        data = compress(json.dumps(record, default=str).encode() + b"\n")
+        if self._segment.tell() + len(data) > self.segment_bytes and self._segment.tell() > 0:
+            self._open_segment(suffix, rotate=True)
+        offset = self._segment.tell()
+        self._segment.write(data)
+        self._segment.flush()
+        self._index.write(f"{record.get('job_id', '')}\t{self._segment_name}\t{offset}\t{len(data)}\n")
+        self._index.flush()
+        metrics.inc("trace_records_total")
+        metrics.inc("trace_bytes_total", len(data))
+
+
+class TraceReader:
+    """Random access by job_id through the index, or a streaming scan"""
+
+    def __init__(self, directory: str = TRACE_DIR):
+        self.directory = directory
+        self._offsets: Dict[str, Tuple[str, int, int]] = {}
+        self._index_pos = 0
+
+    def _refresh_index(self) -> None:
+        """Pick up index lines written since the last call"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            f.seek(self._index_pos)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break   # writer is mid-line; read it next time
+                job_id, segment, offset, length = line.rstrip("\n").split("\t")
+                self._offsets[job_id] = (segment, int(offset), int(length))
+                self._index_pos = f.tell()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._refresh_index()
+        entry = self._offsets.get(job_id)
+        if entry is None:
+            return None
+        segment, offset, length = entry
+        path = os.path.join(self.directory, segment)
+        if not os.path.exists(path):
+            return None   # pruned
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return json.loads(_decompress(segment, f.read(length)))
+
+    def segments(self) -> Iterator[str]:
+        if not os.path.isdir(self.directory):
+            return iter(())
+        return iter(sorted(n for n in os.listdir(self.directory) if n.startswith("traces-")))
+
+    def iter_records(self, segment: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records one at a time, decompressing as a stream"""
+        for name in ([segment] if segment else self.segments()):
+            _, _, stream = _codec("zstd" if name.endswith(".zst") else "gzip")
+            with open(os.path.join(self.directory, name), "rb") as raw:
+                for line in io.TextIOWrapper(stream(raw), encoding="utf-8"):
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def trace_record(state, status: str) -> Dict[str, Any]:
+    """Everything worth keeping from a finished job's SearchState.
+
+    Only copies, so it is cheap on the event loop and later changes to the
+    state don't leak in; ``_formatted`` turns it into JSON-ready form in
+    the writer thread.
+    """
+    return {
+        "job_id": state.job_id,
+        "query": state.query,
+        "status": status,
+        "url": state.best,
+        "events": list(state.logs),
+        "scratchpad": [dict(step) for step in state.scratchpad],
+        "search_terms": list(state.search_terms),
+        "candidates": list(state.candidates),
+        "verdicts": dict(state.verdicts),
+        "timings": dict(state.timings),
+        "agent": {"llm_calls": state.llm_calls, "parse_failures": state.parse_failures,
+                  "prompt_tokens": state.prompt_tokens, "obs_tokens_saved": state.obs_tokens_saved},
+        "finished_at": time.time(),
+    }
+
+
+def _formatted(record: Dict[str, Any]) -> Dict[str, Any]:
+    """A ``trace_record`` snapshot as stored: event dicts and ISO times"""
+    return {**record, "events": [e.to_dict() for e in record["events"]],
+            "finished_at": iso(record["finished_at"])}
+
+
+archive = TraceArchive()
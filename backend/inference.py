@@ -1,90 +1,216 @@
-import json
-from typing import Dict, Any
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from core.records import LogRing
 from core.state import SearchState, set_current_state, clear_current_state
-from core.logging import LogHandler, logger
+from core.logging import get_logger
+from core.config import URL_RE, TRACES_ENABLED, VIDSCOUT_MODE, ARCHIVE_RESOLVER
+from core.metrics import metrics
+from core.traces import archive as trace_archive, trace_record
+from core.breaker import breakers
 from agents.film_scout import recommend_titles
 from agents.vid_scout import run_vid_agent
-from utils.helpers import parse_agent_result
+from utils.helpers import normalize_query
+from core.cache import result_cache
+from core.singleflight import AsyncSingleFlight
 from core.state import SearchState
 from tools.validation import check_playable
-import re
+from tools.observe import expand_url
+from tools.archive import resolve as resolve_archive
 
+logger = get_logger("inference")
 
-async def run_backend(user_query: str, websocket_manager=None, job_id: str = "") -> Dict[str, Any]:
-    # global current_state 
+
+async def _scout(state: SearchState, mv: Dict[str, Any]) -> Optional[str]:
+    """One VidScout run for a suggested film; the playable URL or None.
+    Cancelling it also ends the agent's worker thread at its next step."""
+    # Create callback INSIDE the loop to ensure fresh state reference
+    # (imported here so importing inference doesn't load LangChain)
+    from core.callbacks import LogHandler
+    cb = LogHandler(state)
+    
+    seed = f"\"{mv.get('title', '')}\" {mv.get('year', '')} full movie watch online"
+    prompt = (f"Find a playable link for \"{mv.get('title', '')}\" ({mv.get('year', '')}). "
+              f"Start with the query: {seed}")
+
+    # Cancelling the task doesn't reach the agent's thread; this does
+    stop = threading.Event()
+    started = time.perf_counter()
+    try:
+        result: str = await run_vid_agent(prompt, [cb], stop)
+    except asyncio.CancelledError:
+        stop.set()
+        raise
+    finally:
+        state.add_timing("vidscout", time.perf_counter() - started)
+    await state.log(f"VidScout step: {result}")
+
+    # parse VidScout response
+    link = None
+    if isinstance(result, str):
+        if result.lstrip().upper().startswith("FINISH:"):
+            link = result.split(":", 1)[1].strip()
+            await state.log(f"Found link: {link}", "success")
+        else:
+            m = URL_RE.search(result)
+            link = m.group(0) if m else None
+            await state.log(f"Found link: {link}", "success")
+    return expand_url(link, state) if link else None
+
+
+async def _archive(state: SearchState, mv: Dict[str, Any]) -> Optional[str]:
+    """archive.org fast path for a suggested film; a direct file URL or None"""
+    started = time.perf_counter()
     try:
-        state = SearchState(
-            query=user_query,
-            websocket_manager=websocket_manager,  # Now this will be set!
-            job_id=job_id  # Now this will be set!
-        )
+        hit = await asyncio.to_thread(resolve_archive, mv.get("title", ""), mv.get("year"))
+    finally:
+        state.add_timing("archive", time.perf_counter() - started)
+    if hit is None:
+        return None
+    await state.log(f"archive.org match: {hit.identifier} ({hit.score:.2f}) → {hit.file}", "success")
+    return hit.url
+
+
+async def _find(state: SearchState, mv: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """A playable URL for a suggested film and the path that found it"""
+    if mv.get("catalog") and mv.get("url"):
+        # Known-good source from a catalog entry; nothing to discover
+        await state.log(f"Catalog source → {mv['url']}", "success")
+        return mv["url"], "catalog"
+    if ARCHIVE_RESOLVER == "first":
+        link = await _archive(state, mv)
+        if link:
+            return link, "archive"
+    elif ARCHIVE_RESOLVER == "race":
+        pending = {asyncio.create_task(_archive(state, mv)): "archive",
+                   asyncio.create_task(_scout(state, mv)): "vidscout"}
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    path = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result():
+                        return task.result(), path
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None:
+            raise error
+        return None, "vidscout"
+    return await _scout(state, mv), "vidscout"
+
+
+async def _find_detached(mv: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """``_find`` for a film several jobs wait on, with a state of its own so
+    its agent logs, verdicts and timings land in no one job's record; the
+    waiting jobs each log the shared (link, source)"""
+    scratch = SearchState(query=f"{mv.get('title', '')} {mv.get('year', '')}")
+
+    async def run():
+        # A task of its own, so tools see ``scratch`` as the current state
+        set_current_state(scratch)
+        return await _find(scratch, mv)
 
-        current_state = state
+    return await asyncio.create_task(run())
+
+
+async def run_backend(user_query: str, websocket_manager=None, job_id: str = "",
+                      shared: Optional[AsyncSingleFlight] = None,
+                      logs: Optional[LogRing] = None) -> Dict[str, Any]:
+    """Recommend films for ``user_query`` and find a playable link for one.
+
+    ``shared`` lets concurrent jobs (one batch) share FilmScout calls and
+    per-film agent runs. Log entries are appended to ``logs`` if given.
+    """
+    # global current_state 
+    state = SearchState(
+        query=user_query,
+        websocket_manager=websocket_manager,  # Now this will be set!
+        job_id=job_id,  # Now this will be set!
+        logs=logs if logs is not None else LogRing(),
+    )
+    try:
+        set_current_state(state)
         
         await state.log(f"Starting search: {user_query}")
 
+        # Same request answered recently (or warmed by the prefetcher)
+        cache_key = normalize_query(user_query)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            state.best = cached["url"]
+            await state.log(f"Cached result → {cached['url']}", "success")
+            if state.websocket_manager:
+                await state.websocket_manager.broadcast(
+                    state.job_id, {"type": "result", "result": dict(cached)}
+                )
+            return {"status": "completed", "result": dict(cached), "logs": state.logs,
+                    "timings": state.timings}
+
         try:
-            movies = await recommend_titles(user_query)
+            started = time.perf_counter()
+            if shared is not None:
+                movies = await shared.do(("rec", cache_key), lambda: recommend_titles(user_query))
+            else:
+                movies = await recommend_titles(user_query)
+            state.add_timing("filmscout", time.perf_counter() - started)
             await state.log(f"Planner step: {movies}")
-            logger.info(f"recommend_titles returned: {movies}")
+            logger.info("recommend_titles returned %d titles", len(movies or []), extra={"stage": "recommend"})
         except Exception as e:
-            logger.error(f"Error in recommend_titles: {e}", exc_info=True)
+            logger.error("Error in recommend_titles: %s", e, exc_info=True, extra={"stage": "recommend"})
             await state.log(f"Error in recommend_titles: {e}", "error")
-            return {"status": "error", "logs": state.logs, "error": str(e)}
+            return {"status": "error", "logs": state.logs, "error": str(e), "timings": state.timings}
         
         if not movies:
             await state.log("FilmScout returned nothing", "error")
-            return {"status": "error", "logs": state.logs}
+            return {"status": "error", "logs": state.logs, "timings": state.timings}
 
         # Variables to track the successful movie and link
         successful_movie = None
         found_link = None
 
         for mv in movies:
+            # Every agent step needs Gemini; don't start runs that can only fail
+            if breakers.get("gemini").is_open:
+                await state.log("Gemini is unavailable (circuit open); stopping early", "error")
+                break
             try:
                 await state.log(f"Trying {mv.get('title', 'Unknown')} ({mv.get('year', 'Unknown')}) …")
-                
-                # Create callback INSIDE the loop to ensure fresh state reference
-                cb = LogHandler(state)
-                
-                seed = f"\"{mv.get('title', '')}\" {mv.get('year', '')} full movie watch online"
-                prompt = (f"Find a playable link for \"{mv.get('title', '')}\" ({mv.get('year', '')}). "
-                          f"Start with the query: {seed}")
-
-                result: str = await run_vid_agent(prompt, [cb])
-                await state.log(f"VidScout step: {result}")
-
-                # After agent completes, merge any additional logs from callback
-                if hasattr(cb, 'state') and cb.state.logs:
-                    for log_entry in cb.state.logs:
-                        if log_entry not in state.logs:
-                            state.logs.append(log_entry)
-
-                # parse VidScout response
-                link = None
-                await state.log(f"Links: {link}")
-                if isinstance(result, str):
-                    if result.lstrip().upper().startswith("FINISH:"):
-                        link = result.split(":", 1)[1].strip()
-                        await state.log(f"Found link: {link}", "success")
-                    else:
-                        m = URL_RE.search(result)
-                        link = m.group(0) if m else None
-                        await state.log(f"Found link: {link}", "success")
+                if shared is not None:
+                    # Queries in a batch that suggest the same film share its agent run
+                    title_key = normalize_query(f"{mv.get('title', '')} {mv.get('year', '')}")
+                    started = time.perf_counter()
+                    link, source = await shared.do(("title", title_key), lambda: _find_detached(mv))
+                    state.add_timing("shared_find", time.perf_counter() - started)
+                    await state.log(f"Shared lookup for {mv.get('title', 'Unknown')}: "
+                                    f"{link or 'nothing playable'} ({source})")
+                else:
+                    link, source = await _find(state, mv)
 
                 if link:
                     state.best = link
                     successful_movie = mv  # Store the successful movie
                     found_link = link      # Store the found link
-                    await state.log(f"Success → {link}", "success")
+                    metrics.inc("resolved_total", path=source)
+                    await state.log(f"Success ({source}) → {link}", "success")
                     break
                     
             except Exception as e:
-                logger.error(f"Error processing movie {mv}: {e}", exc_info=True)
+                logger.error("Error processing movie %s: %s", mv, e, exc_info=True, extra={"stage": "vidscout"})
                 await state.log(f"Error processing movie {mv}: {e}", "error")
                 continue
         
-        current_state = None
+        clear_current_state()
+
+        # Round trips and format failures per job, to compare VidScout modes
+        metrics.observe("vidscout_llm_calls_per_job", state.llm_calls, mode=VIDSCOUT_MODE)
+        metrics.observe("vidscout_parse_failures_per_job", state.parse_failures, mode=VIDSCOUT_MODE)
+        metrics.observe("vidscout_prompt_tokens_per_job", state.prompt_tokens, mode=VIDSCOUT_MODE)
+        metrics.observe("vidscout_obs_tokens_saved_per_job", state.obs_tokens_saved, mode=VIDSCOUT_MODE)
 
         if not found_link or not successful_movie:
             await state.log("No playable link found for any suggestion", "error")
@@ -94,7 +220,7 @@ async def run_backend(user_query: str, websocket_manager=None, job_id: str = "")
                     state.job_id,
                     {"type": "error", "message": "No playable movies found"}
                 )
-            return {"status": "error", "logs": state.logs}
+            return {"status": "error", "logs": state.logs, "timings": state.timings}
 
         # Build the final result
         final_result = {
@@ -102,16 +228,15 @@ async def run_backend(user_query: str, websocket_manager=None, job_id: str = "")
             "year":  successful_movie.get("year", "Unknown"), 
             "why":   successful_movie.get("why", ""),
             "url":   found_link,
+            "source": source,
         }
         
-        # Right before the WebSocket broadcast, add this:
-        print(f"🔧 About to broadcast result via WebSocket: {state.websocket_manager}")
-        print(f"🔧 Job ID: {state.job_id}")
-        print(f"🔧 Result to broadcast: {final_result}")
+        result_cache.set(cache_key, final_result)
+
+        logger.debug("Broadcasting result: %s", final_result.get("url"), extra={"stage": "result"})
 
         # Send result via WebSocket
         if state.websocket_manager:
-            print("Broadcasting result...")
             await state.websocket_manager.broadcast(
                 state.job_id,
                 {
@@ -119,22 +244,21 @@ async def run_backend(user_query: str, websocket_manager=None, job_id: str = "")
                     "result": final_result
                 }
             )
-            print("Broadcast complete!")
-        else:
-            print("No websocket_manager available!")
-        
-        # Debug print to see what we're returning
-        print(f"Backend returning: {json.dumps(final_result, indent=2)}")
         
         # Still return for any other consumers
         return {
             "status": "completed",
             "result": final_result,
             "logs": state.logs,
+            "timings": state.timings,
         }
     except Exception as e:
-        logger.error(f"Unexpected error in run_backend: {e}", exc_info=True)
-        return {"status": "error", "error": str(e), "logs": getattr(state, 'logs', [])}
+        logger.error("Unexpected error in run_backend: %s", e, exc_info=True)
+        return {"status": "error", "error": str(e), "logs": state.logs, "timings": state.timings}
+    finally:
+        # Handed to the archive's writer thread; nothing is written here
+        if TRACES_ENABLED:
+            trace_archive.submit(trace_record(state, "completed" if state.best else "error"))
 
 main = run_backend
 
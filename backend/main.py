@@ -1,16 +1,20 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 import uuid
 import asyncio
+import hmac
 import json
+import math
 import os
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Set
 
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
@@ -19,10 +23,49 @@ sys.path.append(str(Path(__file__).parent.absolute()))
 
 # UPDATED IMPORT: Use the new modular inference
 from inference import main as run_backend
+from core.config import (
+    PRELOAD_BACKENDS,
+    HISTORY_ENABLED,
+    BATCH_MAX_QUERIES,
+    LOOPMON_ENABLED,
+    PROFILE_MAX_S,
+    ADMIN_TOKEN,
+)
+from core.breaker import breakers
+from core.fairness import Throttled, client_id, scheduler
+from core.history import history, summarize_logs
+from core.logging import get_logger
+from core.loopmon import collapsed, loop_monitor, profile_lock, sample_stacks, speedscope
+from core.metrics import metrics
+from core.cache import cache_sizes
+from core.prefetch import prefetcher
+from core.traces import archive as trace_archive
+from core.records import JobRecord
+from core.registry import registry
+from core.serialization import (
+    FastJSONResponse,
+    MSGPACK_SUBPROTOCOL,
+    compressed_json,
+    dumps_str,
+    msgpack_available,
+    packb,
+)
+from core.singleflight import AsyncSingleFlight
+from tools import http as http_client
+from tools.ranker import ranker
+from utils.helpers import normalize_query
+
+logger = get_logger("api")
 # Remove the old S import since it's now in core/state.py
 # from core.state import SearchState  # Only import if you need it
 
-app = FastAPI(title="Media Search API")
+app = FastAPI(title="Media Search API", default_response_class=FastJSONResponse)
+
+# Import-time and startup measurements, reported by /api/ready
+STARTUP: Dict[str, Optional[float]] = {
+    "import_ms": round((time.perf_counter() - _IMPORT_START) * 1000, 1),
+    "preload_ms": None,
+}
 
 # Set up CORS
 app.add_middleware(
@@ -34,7 +77,8 @@ app.add_middleware(
 )
 
 # In-memory storage for job status and results
-jobs: Dict[str, Dict] = {}
+jobs: Dict[str, JobRecord] = {}
+batches: Dict[str, Dict] = {}
 active_connections: Dict[str, Set[WebSocket]] = {}
 
 class SearchRequest(BaseModel):
@@ -48,27 +92,62 @@ class SearchResponse(BaseModel):
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.event_queues: Dict[str, Set[asyncio.Queue]] = {}
+        self.binary: Set[WebSocket] = set()   # sockets that asked for msgpack frames
 
     async def connect(self, websocket: WebSocket, job_id: str):
-        await websocket.accept()
+        wants_msgpack = MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+        if wants_msgpack and msgpack_available():
+            await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+            self.binary.add(websocket)
+        else:
+            await websocket.accept()
         if job_id not in self.active_connections:
             self.active_connections[job_id] = set()
         self.active_connections[job_id].add(websocket)
 
     def disconnect(self, websocket: WebSocket, job_id: str):
+        self.binary.discard(websocket)
         if job_id in self.active_connections:
             self.active_connections[job_id].discard(websocket)
             if not self.active_connections[job_id]:
                 del self.active_connections[job_id]
 
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Register a queue that receives every message broadcast for a job"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self.event_queues.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, job_id: str):
+        if job_id in self.event_queues:
+            self.event_queues[job_id].discard(queue)
+            if not self.event_queues[job_id]:
+                del self.event_queues[job_id]
+
+    async def send(self, websocket: WebSocket, message: dict):
+        if websocket in self.binary:
+            await websocket.send_bytes(packb(message))
+        else:
+            await websocket.send_text(dumps_str(message))
+
     async def broadcast(self, job_id: str, message: dict):
+        for queue in self.event_queues.get(job_id, ()):
+            queue.put_nowait(message)
         if job_id in self.active_connections:
+            # Encoded at most once per format, however many sockets listen
+            text = packed = None
             disconnected = set()
-            for connection in self.active_connections[job_id]:
+            for connection in list(self.active_connections[job_id]):
                 try:
-                    await connection.send_json(message)
+                    if connection in self.binary:
+                        packed = packed or packb(message)
+                        await connection.send_bytes(packed)
+                    else:
+                        text = text or dumps_str(message)
+                        await connection.send_text(text)
                 except Exception as e:
-                    print(f"Error sending message: {e}")
+                    logger.warning("Error sending message for job %s: %s", job_id, e)
                     disconnected.add(connection)
             # Clean up disconnected clients
             for connection in disconnected:
@@ -76,10 +155,112 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+class BatchRelay:
+    """Message sink for a batch's jobs: each message goes to the job's own
+    subscribers and, tagged with its job id, to the batch's"""
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+
+    async def broadcast(self, job_id: str, message: dict):
+        await manager.broadcast(job_id, message)
+        await manager.broadcast(self.batch_id, {**message, "job_id": job_id})
+
+async def _preload_backends():
+    start = time.perf_counter()
+    await asyncio.to_thread(registry.init_all)
+    STARTUP["preload_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+@app.on_event("startup")
+async def startup():
+    # Build clients off the event loop so the server accepts requests at once
+    if PRELOAD_BACKENDS:
+        asyncio.create_task(_preload_backends())
+    if HISTORY_ENABLED:
+        await history.start()
+    if ranker:
+        await asyncio.to_thread(ranker.load)
+    prefetcher.start()
+    if LOOPMON_ENABLED:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await loop_monitor.stop()
+    await prefetcher.stop()
+    await history.stop()
+    await asyncio.to_thread(trace_archive.close)
+    if ranker:
+        await asyncio.to_thread(ranker.save)
+    await asyncio.to_thread(http_client.close)
+
 @app.get("/")
 async def root():
     return {"message": "Media Search API is running"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+@app.get("/api/debug/breakers")
+async def get_breakers():
+    return breakers.snapshot()
+
+@app.get("/api/debug/clients")
+async def get_clients():
+    """Per-client queue depth and throttle counts"""
+    return scheduler.snapshot()
+
+@app.get("/api/debug/prefetch")
+async def get_prefetch():
+    return {"sources": prefetcher.sources, "last_pass": prefetcher.last_pass, "caches": cache_sizes()}
+
+def _require_admin(request: Request) -> None:
+    """Fail closed: hidden without ADMIN_TOKEN, 403 without the right header"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/debug/loop")
+async def get_loop(request: Request):
+    """Event-loop lag and the stacks of recent stalls"""
+    _require_admin(request)
+    return loop_monitor.snapshot()
+
+@app.get("/api/debug/profile")
+async def get_profile(request: Request, seconds: float = 5, interval_ms: float = 5, format: str = "collapsed"):
+    """Sample every thread's stack for ``seconds``; ``format`` is
+    ``collapsed`` (folded stacks) or ``speedscope`` (JSON for speedscope.app)"""
+    _require_admin(request)
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'speedscope'")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    seconds = max(0.1, min(seconds, PROFILE_MAX_S))
+    interval_s = max(1.0, interval_ms) / 1000
+    async with profile_lock:
+        samples = await asyncio.to_thread(sample_stacks, seconds, interval_s)
+    if format == "speedscope":
+        return FastJSONResponse(speedscope(samples, interval_s),
+                                headers={"Content-Disposition": "attachment; filename=profile.speedscope.json"})
+    return PlainTextResponse(collapsed(samples))
+
+@app.get("/api/history")
+async def get_history(limit: int = 20, cursor: Optional[str] = None, q: Optional[str] = None):
+    """Completed jobs, newest first; pass ``next_cursor`` back as ``cursor``"""
+    if not history.enabled:
+        raise HTTPException(status_code=503, detail="Job history is disabled")
+    try:
+        return await history.page(max(1, min(limit, 100)), normalize_query(q) if q else None, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/ready")
+async def ready():
+    """Which backends are built; 503 until all of them are"""
+    body = {"ready": registry.ready, "backends": registry.status(), "startup": STARTUP}
+    return FastJSONResponse(body, status_code=200 if registry.ready else 503)
+
 @app.post("/api/ask")
 async def ask_question(request: Request):
     try:
@@ -88,39 +269,120 @@ async def ask_question(request: Request):
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter 'q' is required")
         
-        # Create a new job
-        job_id = str(uuid.uuid4())
-        jobs[job_id] = {
-            "id": job_id,
-            "status": "pending",
-            "query": query,
-            "results": [],
-            "logs": [],
-            "created_at": datetime.utcnow().isoformat(),
-            "completed_at": None
-        }
+        client = client_id(request.headers, request.client.host if request.client else None)
+        try:
+            scheduler.admit(client)
+        except Throttled as e:
+            return FastJSONResponse(
+                {"detail": e.reason, "retry_after": round(e.retry_after, 1)},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+        
+        job_id = _new_job(query)
         
-        # Start the search in the background
-        asyncio.create_task(process_search(job_id, query))
+        # Queued behind other clients' jobs if the server is at capacity
+        scheduler.submit(client, lambda: process_search(job_id, query))
         
         return {"job_id": job_id, "status": "started"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/ask/batch")
+async def ask_batch(request: Request):
+    """Many queries at once, e.g. one per catalog tile.
+
+    Returns a job id per query plus a batch id. The batch's jobs share
+    FilmScout calls and agent runs for films suggested by several queries
+    (Exa searches and URL checks are shared between all concurrent jobs);
+    ``/api/ws/batch/{batch_id}`` streams every job's messages, tagged with
+    ``job_id``, then ``batch_done``.
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    queries = data.get("queries") if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        raise HTTPException(status_code=400, detail="'queries' must be a non-empty list of strings")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+
+    # One rate-limit token per batch (a page of tiles is one user action),
+    # but every query counts against the client's queued-job cap
+    client = client_id(request.headers, request.client.host if request.client else None)
+    try:
+        scheduler.admit(client, jobs=len(queries))
+    except Throttled as e:
+        return FastJSONResponse(
+            {"detail": e.reason, "retry_after": round(e.retry_after, 1)},
+            status_code=429,
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+    batch_id = str(uuid.uuid4())
+    relay = BatchRelay(batch_id)
+    shared = AsyncSingleFlight("batch", keep_results=True)
+    job_ids = [_new_job(q) for q in queries]
+    batches[batch_id] = {"id": batch_id, "job_ids": job_ids, "pending": len(job_ids),
+                         "created_at": datetime.utcnow().isoformat()}
+    for job_id, query in zip(job_ids, queries):
+        scheduler.submit(client, lambda j=job_id, q=query: _batch_job(batch_id, j, q, relay, shared))
+    metrics.inc("batch_queries_total", len(job_ids))
+
+    return {"batch_id": batch_id, "status": "started",
+            "jobs": [{"q": q, "job_id": j} for q, j in zip(queries, job_ids)]}
+
+async def _batch_job(batch_id: str, job_id: str, query: str, relay: BatchRelay, shared: AsyncSingleFlight):
+    try:
+        await process_search(job_id, query, relay, shared)
+    finally:
+        batch = batches[batch_id]
+        batch["pending"] -= 1
+        if batch["pending"] == 0:
+            await manager.broadcast(batch_id, {"type": "batch_done", "batch_id": batch_id})
+            asyncio.get_running_loop().call_later(300, batches.pop, batch_id, None)
+
+@app.get("/api/batch/{batch_id}")
+async def poll_batch(batch_id: str):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch = batches[batch_id]
+    return {
+        "batch_id": batch_id,
+        "pending": batch["pending"],
+        "created_at": batch["created_at"],
+        "jobs": [
+            {"job_id": j, "query": jobs[j].query, "status": jobs[j].status, "results": jobs[j].results}
+            for j in batch["job_ids"] if j in jobs
+        ],
+    }
+
 @app.get("/api/poll/{job_id}")
-async def poll_job(job_id: str):
+async def poll_job(job_id: str, request: Request, after: int = 0, limit: int = 100):
+    """Job status plus results after the ``after`` cursor; pass ``next`` back"""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
     
     job = jobs[job_id]
-    return {
+    results, next_after = _page(job.results, after, limit)
+    return compressed_json(request, {
         "job_id": job_id,
-        "status": job["status"],
-        "results": job["results"],
-        "query": job["query"],
-        "created_at": job["created_at"],
-        "completed_at": job["completed_at"]
-    }
+        "status": job.status,
+        "results": results,
+        "next": next_after,
+        "query": job.query,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at
+    })
+
+def _page(items: List, after: int, limit: int):
+    """Entries of an append-only list after a cursor, and the next cursor"""
+    after = max(0, after)
+    page = items[after:after + max(1, min(limit, 1000))]
+    return page, after + len(page)
 
 @app.websocket("/api/ws/{job_id}")
 async def websocket_endpoint(websocket: WebSocket, job_id: str):
@@ -133,27 +395,118 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
         while True:
             # Keep the connection alive
             await asyncio.sleep(10)
-            await websocket.send_json({"type": "ping", "timestamp": time.time()})
+            await manager.send(websocket, {"type": "ping", "timestamp": time.time()})
     except WebSocketDisconnect:
         manager.disconnect(websocket, job_id)
 
-async def process_search(job_id: str, query: str):
+@app.websocket("/api/ws/batch/{batch_id}")
+async def batch_websocket(websocket: WebSocket, batch_id: str):
+    if batch_id not in batches:
+        await websocket.close(code=1008, reason="Batch not found")
+        return
+    
+    await manager.connect(websocket, batch_id)
+    try:
+        while True:
+            await asyncio.sleep(10)
+            await manager.send(websocket, {"type": "ping", "timestamp": time.time()})
+    except WebSocketDisconnect:
+        manager.disconnect(websocket, batch_id)
+
+def _terminal_event(job: JobRecord) -> Optional[Dict]:
+    """The last message a finished job broadcast, rebuilt from its record"""
+    if job.status == "completed" and job.results:
+        return {"type": "result", "result": job.results[0]}
+    if job.status == "failed":
+        return {"type": "error", "message": job.error or "Unknown error"}
+    return None
+
+@app.get("/api/events/{job_id}")
+async def job_events(job_id: str):
+    """Server-Sent Events stream of the same messages the WebSocket receives.
+
+    Opens with the job's current status, or its final message if it has
+    already finished, and ends after the final message or once the job is
+    evicted.
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Subscribe and read the record in the same step, so nothing
+    # broadcast in between is missed
+    queue = manager.subscribe(job_id)
+    job = jobs[job_id]
+    first = _terminal_event(job) or {"type": "status", "status": job.status}
+
+    async def stream():
+        try:
+            message = first
+            while True:
+                yield f"data: {dumps_str(message)}\n\n"
+                if message.get("type") in ("result", "error"):
+                    break
+                while True:
+                    try:
+                        message = await asyncio.wait_for(queue.get(), timeout=10)
+                        break
+                    except asyncio.TimeoutError:
+                        pass
+                    if job_id not in jobs:
+                        return
+                    # Finished without a broadcast this stream could see
+                    message = _terminal_event(job)
+                    if message:
+                        break
+                    # Keep the connection alive through proxies
+                    yield ": ping\n\n"
+        finally:
+            manager.unsubscribe(queue, job_id)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+def _new_job(query: str) -> str:
+    job_id = str(uuid.uuid4())
+    jobs[job_id] = JobRecord(job_id, query)
+    return job_id
+
+def _history_row(job_id: str, result: Dict) -> Dict:
+    job = jobs[job_id]
+    movie = (result or {}).get("result") or {}
+    return {
+        "job_id": job_id,
+        "query": job.query,
+        "normalized_query": normalize_query(job.query),
+        "title": movie.get("title"),
+        "year": str(movie["year"]) if movie.get("year") is not None else None,
+        "url": movie.get("url"),
+        "status": job.status,
+        "error": job.error,
+        "timings": json.dumps((result or {}).get("timings", {})),
+        "log_summary": json.dumps(summarize_logs(job.logs)),
+        "created_at": job.created_at,
+        "completed_at": job.completed_at or datetime.utcnow().isoformat(),
+    }
+
+async def process_search(job_id: str, query: str, websocket_manager=manager,
+                         shared: Optional[AsyncSingleFlight] = None):
+    result = None
     try:
         # Update job status
-        jobs[job_id]["status"] = "processing"
-        await manager.broadcast(job_id, {"type": "status", "status": "processing"})
+        jobs[job_id].status = "processing"
+        await websocket_manager.broadcast(job_id, {"type": "status", "status": "processing"})
         
         # UPDATED CALL: Use the new modular backend
-        result = await run_backend(query, manager, job_id)
+        # The job's log list is the state's, so /api/logs sees entries live
+        result = await run_backend(query, websocket_manager, job_id, shared, logs=jobs[job_id].logs)
         
-        print(f"🔧 Main.py received result: {result}")
+        logger.debug("Job %s finished with status %s", job_id, result.get("status"), extra={"job_id": job_id})
         
         # Handle the result format (same as before)
         if result.get("status") == "completed" and result.get("result"):
             movie_result = result["result"]
             
             # Store in the old format for backward compatibility (polling endpoint)
-            jobs[job_id]["results"] = [{
+            jobs[job_id].results = [{
                 "title": movie_result.get("title", "Untitled"),
                 "year": movie_result.get("year", "Unknown"),
                 "why": movie_result.get("why", ""),
@@ -166,48 +519,52 @@ async def process_search(job_id: str, query: str):
             }]
             
             # Update job status
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
-            jobs[job_id]["logs"] = result.get("logs", [])  # Store logs for debugging
+            jobs[job_id].status = "completed"
+            jobs[job_id].completed = time.time()
             
         elif result.get("status") == "error":
             # Handle error case
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = result.get("error", "Unknown error")
-            jobs[job_id]["logs"] = result.get("logs", [])
+            jobs[job_id].status = "failed"
+            jobs[job_id].error = result.get("error", "Unknown error")
             
             # Send error via WebSocket if not already sent
-            await manager.broadcast(job_id, {
+            await websocket_manager.broadcast(job_id, {
                 "type": "error",
                 "message": result.get("error", "Unknown error occurred")
             })
             
     except Exception as e:
-        print(f"Error processing job {job_id}: {str(e)}")
+        logger.error("Error processing job %s: %s", job_id, e, exc_info=True, extra={"job_id": job_id})
         if job_id in jobs:
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = str(e)
-            await manager.broadcast(job_id, {
+            jobs[job_id].status = "failed"
+            jobs[job_id].error = str(e)
+            await websocket_manager.broadcast(job_id, {
                 "type": "error",
                 "message": f"Search failed: {str(e)}"
             })
     finally:
-        # Clean up after some time
-        await asyncio.sleep(300)  # Keep results for 5 minutes
+        # Enqueue only; the history writer commits in the background
         if job_id in jobs:
-            del jobs[job_id]
+            history.record(_history_row(job_id, result))
+        # Keep results for 5 minutes; a timer rather than a sleep so the
+        # job's scheduler slot is released as soon as the search is done
+        asyncio.get_running_loop().call_later(300, jobs.pop, job_id, None)
 
 # Optional: Add a debug endpoint to see job logs
 @app.get("/api/logs/{job_id}")
-async def get_job_logs(job_id: str):
+async def get_job_logs(job_id: str, request: Request, after: int = 0, limit: int = 500):
+    """Log entries after the ``after`` cursor (live while the job runs)"""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return {
+    logs, next_after = jobs[job_id].logs.since(max(0, after), max(1, min(limit, 1000)))
+    return compressed_json(request, {
         "job_id": job_id,
-        "logs": jobs[job_id].get("logs", []),
-        "status": jobs[job_id]["status"]
-    }
+        "logs": logs,
+        "next": next_after,
+        "dropped": jobs[job_id].logs.dropped,
+        "status": jobs[job_id].status
+    })
 
 if __name__ == "__main__":
     import uvicorn
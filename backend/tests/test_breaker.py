@@ -0,0 +1,61 @@
+"""
+Circuit breaker: opening on errors and slow calls, and the half-open probe
+"""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    settings = dict(window_s=60, min_calls=4, error_rate=0.5, slow_call_s=1, slow_rate=0.5, open_s=0.05)
+    settings.update(kwargs)
+    return CircuitBreaker("test", **settings)
+
+
+def test_opens_once_the_error_rate_is_crossed():
+    breaker = _breaker()
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.state == CLOSED   # fewer than min_calls outcomes
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_opens_on_slow_calls():
+    breaker = _breaker()
+    for latency in (0.1, 2, 0.1, 2):
+        breaker.record(True, latency)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()   # the probe is outstanding
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
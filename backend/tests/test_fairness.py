@@ -0,0 +1,79 @@
+"""
+Fair scheduler: admission limits, round-robin order and client identity
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core.fairness
+from core.fairness import FairScheduler, Throttled, client_id
+
+
+def test_admit_throttles_over_rate_and_queue_cap():
+    scheduler = FairScheduler(rate_per_min=60, burst=2, max_pending=3)
+    scheduler.admit("a")
+    scheduler.admit("a")
+    with pytest.raises(Throttled) as exc:
+        scheduler.admit("a")
+    assert exc.value.reason == "rate limit exceeded"
+    assert exc.value.retry_after > 0
+
+    with pytest.raises(Throttled) as exc:
+        scheduler.admit("b", jobs=4)
+    assert exc.value.reason == "too many queued jobs"
+
+
+def test_a_single_job_is_not_stuck_behind_a_large_batch():
+    scheduler = FairScheduler(max_concurrent=1, rate_per_min=0)
+    order = []
+
+    def job(name):
+        async def run():
+            order.append(name)
+            await asyncio.sleep(0)
+        return run
+
+    async def main():
+        for i in range(5):
+            scheduler.submit("batch", job(f"batch-{i}"))
+        scheduler.submit("single", job("single"))
+        while scheduler.running or scheduler.queued:
+            await asyncio.sleep(0.001)
+
+    asyncio.run(main())
+    # batch-0 was already running; then at most one round of the batch
+    assert order.index("single") <= 2
+    assert len(order) == 6
+
+
+def test_failing_job_frees_its_slot():
+    scheduler = FairScheduler(max_concurrent=1, rate_per_min=0)
+    done = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def ok():
+        done.append(1)
+
+    async def main():
+        scheduler.submit("a", fail)
+        scheduler.submit("a", ok)
+        while scheduler.running or scheduler.queued:
+            await asyncio.sleep(0.001)
+
+    asyncio.run(main())
+    assert done == [1]
+    assert scheduler.snapshot()["clients"]["a"]["running"] == 0
+
+
+def test_client_id_trusts_only_the_proxy_hops(monkeypatch):
+    monkeypatch.setattr(core.fairness, "FORWARDED_HOPS", 1)
+    headers = {"x-forwarded-for": "6.6.6.6, 1.2.3.4"}
+    assert client_id(headers, "10.0.0.1") == "ip:1.2.3.4"
+    assert client_id({}, "10.0.0.1") == "ip:10.0.0.1"
+    assert client_id({"X-API-Key": "secret"}, "10.0.0.1").startswith("key:")
@@ -0,0 +1,67 @@
+"""
+Hedged calls: the loser is cancelled without leaking limiter or breaker state
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.llm import GuardedChatModel
+from benchmarks.fakes import FakeGemini, LatencyModel
+from core.breaker import breakers
+from core.hedge import Hedger
+from core.limiter import llm_limiter
+
+
+def _hedger() -> Hedger:
+    hedger = Hedger("test", percentile=0.5, budget=1.0, min_samples=1, min_delay=0.05)
+    hedger._record(0.05, False)
+    return hedger
+
+
+def _models(name: str, *latencies: str):
+    return [GuardedChatModel(inner=FakeGemini(latency=LatencyModel.parse(l)), priority=0, breaker_name=name)
+            for l in latencies]
+
+
+def test_hedge_wins_and_loser_is_released():
+    slow, fast = _models("test-hedge", "const:2000", "const:10")
+    calls = iter([slow, fast])
+    hedger = _hedger()
+
+    async def go():
+        result = await hedger.acall(lambda: next(calls).ainvoke("FilmScout: anything"))
+        await asyncio.sleep(0.05)
+        return result
+
+    assert asyncio.run(go()).content
+    assert llm_limiter.in_flight == 0
+    breaker = breakers.get("test-hedge")
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_cancelled_hedged_call_frees_the_probe():
+    breaker = breakers.get("test-hedge-probe")
+    breaker.open_s, breaker.opened_at = 0.0, 0.0
+    breaker._set_state("open")
+    slow, = _models("test-hedge-probe", "const:2000")
+    hedger = _hedger()
+
+    async def go():
+        try:
+            await asyncio.wait_for(hedger.acall(lambda: slow.ainvoke("FilmScout: anything")), 0.3)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.05)
+
+    asyncio.run(go())
+    assert llm_limiter.in_flight == 0
+    # The probe was cancelled: open again, and the next probe goes through
+    assert breaker.state == "open" and breaker.allow()
+
+
+def test_no_hedge_before_enough_samples():
+    hedger = Hedger("test-cold", min_samples=5)
+    assert hedger.delay() is None
+    assert asyncio.run(hedger.acall(lambda: asyncio.sleep(0, "done"))) == "done"
@@ -0,0 +1,44 @@
+"""
+Jobs in one batch share a film's lookup result, not each other's records
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inference
+from core.singleflight import AsyncSingleFlight
+from core.state import get_current_state
+
+
+def test_shared_lookup_stays_out_of_job_records(monkeypatch):
+    calls = []
+
+    async def recommend_titles(question):
+        return [{"title": "Detour", "year": 1945, "why": "noir"}]
+
+    async def find(state, mv):
+        calls.append(state)
+        assert get_current_state() is state
+        await state.log("agent step")
+        state.verdicts["http://x/detour"] = "OK"
+        await asyncio.sleep(0.05)
+        return "http://x/detour.mp4", "vidscout"
+
+    monkeypatch.setattr(inference, "recommend_titles", recommend_titles)
+    monkeypatch.setattr(inference, "_find", find)
+
+    async def go():
+        shared = AsyncSingleFlight("test-batch", keep_results=True)
+        return await asyncio.gather(*(inference.run_backend(f"shared lookup test {i}", job_id=f"job-{i}",
+                                                            shared=shared) for i in range(3)))
+
+    results = asyncio.run(go())
+    assert len(calls) == 1
+    for out in results:
+        assert out["result"]["url"] == "http://x/detour.mp4"
+        messages = [e.message for e in out["logs"]]
+        assert "agent step" not in messages
+        assert any(m.startswith("Shared lookup for Detour") for m in messages)
+    assert [e.message for e in calls[0].logs] == ["agent step"]
@@ -0,0 +1,76 @@
+"""
+LLM limiter: priority order, the AIMD window and abandoned waiters
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.limiter import LLMLimiter, PRIORITY_BACKGROUND, PRIORITY_FILMSCOUT
+
+
+def _limiter(**kwargs) -> LLMLimiter:
+    settings = dict(rpm=10000, tpm=10_000_000, max_concurrency=1, min_concurrency=1, latency_target=10)
+    settings.update(kwargs)
+    return LLMLimiter(**settings)
+
+
+def test_urgent_waiters_overtake_queued_background_calls():
+    limiter = _limiter()
+    order = []
+
+    async def waiter(name, priority):
+        permit = await limiter.acquire(priority, 10)
+        order.append(name)
+        limiter.release(permit)
+
+    async def main():
+        held = await limiter.acquire(PRIORITY_FILMSCOUT, 10)
+        background = asyncio.create_task(waiter("background", PRIORITY_BACKGROUND))
+        await asyncio.sleep(0.01)
+        urgent = asyncio.create_task(waiter("urgent", PRIORITY_FILMSCOUT))
+        await asyncio.sleep(0.01)
+        assert limiter.has_waiters_above(PRIORITY_BACKGROUND)
+        limiter.release(held)
+        await asyncio.gather(background, urgent)
+
+    asyncio.run(main())
+    assert order == ["urgent", "background"]
+    assert limiter.in_flight == 0
+
+
+def test_window_halves_on_throttle_and_grows_on_success():
+    limiter = _limiter(max_concurrency=8)
+    limiter.release(limiter.acquire_sync(PRIORITY_FILMSCOUT, 10), ok=False, throttled=True)
+    assert limiter.window == 4
+
+    limiter.release(limiter.acquire_sync(PRIORITY_FILMSCOUT, 10))
+    assert limiter.window == 4.25
+    assert limiter.in_flight == 0
+
+
+def test_cancel_frees_the_slot_without_moving_the_window():
+    limiter = _limiter(max_concurrency=4)
+    permit = limiter.acquire_sync(PRIORITY_FILMSCOUT, 10)
+    limiter.cancel(permit)
+    assert limiter.in_flight == 0
+    assert limiter.window == 4
+
+
+def test_cancelled_waiter_does_not_block_the_queue():
+    limiter = _limiter()
+
+    async def main():
+        held = await limiter.acquire(PRIORITY_FILMSCOUT, 10)
+        gone = asyncio.create_task(limiter.acquire(PRIORITY_FILMSCOUT, 10))
+        await asyncio.sleep(0.01)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+        later = asyncio.create_task(limiter.acquire(PRIORITY_BACKGROUND, 10))
+        limiter.release(held)
+        limiter.release(await asyncio.wait_for(later, 1))
+
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+    assert not limiter.has_waiters_above(PRIORITY_BACKGROUND + 1)
@@ -0,0 +1,112 @@
+"""
+The guarded chat model gives back what it holds on every exit path
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.llm import GuardedChatModel, guarded_call
+from benchmarks.fakes import FakeGemini, LatencyModel, SimulatedFailure
+from core.breaker import breakers
+from core.limiter import llm_limiter
+
+
+def _model(latency: str, fail: float = 0.0, name: str = "test-llm") -> GuardedChatModel:
+    breakers.get(name).record(True)
+    return GuardedChatModel(inner=FakeGemini(latency=LatencyModel.parse(latency, fail)),
+                            priority=0, breaker_name=name)
+
+
+def test_cancelled_calls_release_their_permits():
+    llm = _model("const:2000")
+
+    async def go():
+        calls = [asyncio.create_task(llm.ainvoke("FilmScout: anything")) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        assert llm_limiter.in_flight == 3
+        for task in calls:
+            task.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+
+    asyncio.run(go())
+    assert llm_limiter.in_flight == 0
+
+
+def test_failed_calls_release_their_permits():
+    llm = _model("const:1", fail=1.0)
+    with pytest.raises(SimulatedFailure):
+        asyncio.run(llm.ainvoke("FilmScout: anything"))
+    with pytest.raises(SimulatedFailure):
+        llm.invoke("FilmScout: anything")
+    assert llm_limiter.in_flight == 0
+
+
+def test_guarded_call_releases_on_error():
+    def boom():
+        raise RuntimeError("no")
+
+    with pytest.raises(RuntimeError):
+        guarded_call(boom, 0, "prompt", breaker_name="test-raw")
+    assert guarded_call(lambda: "ok", 0, "prompt", breaker_name="test-raw") == "ok"
+    assert llm_limiter.in_flight == 0
+
+
+def _half_open(name: str):
+    breaker = breakers.get(name)
+    breaker.open_s = 0.0
+    breaker.opened_at = 0.0
+    breaker._set_state("open")
+    return breaker
+
+
+def test_cancelled_probe_does_not_strand_the_breaker():
+    llm = _model("const:2000", name="test-probe")
+    breaker = _half_open("test-probe")
+
+    async def go():
+        probe = asyncio.create_task(llm.ainvoke("FilmScout: anything"))
+        await asyncio.sleep(0.1)
+        assert breaker.state == "half_open" and not breaker.allow()
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+    asyncio.run(go())
+    assert llm_limiter.in_flight == 0
+    # The cancelled probe counts as a failure; the next one is let through
+    assert breaker.state == "open"
+    assert _model("const:1", name="test-probe").invoke("FilmScout: anything")
+    assert breaker.state == "closed"
+
+
+def test_probe_is_taken_after_limiter_admission():
+    breaker = _half_open("test-queued")
+    held = llm_limiter.window
+
+    async def go():
+        # A full limiter: the queued call must not hold the probe meanwhile
+        llm_limiter.window = 0
+        queued = asyncio.create_task(_model("const:1", name="test-queued").ainvoke("FilmScout: x"))
+        await asyncio.sleep(0.1)
+        assert breaker.allow()
+        breaker.cancel()
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+    try:
+        asyncio.run(go())
+    finally:
+        llm_limiter.window = held
+    assert llm_limiter.in_flight == 0
+
+
+def test_lost_probe_expires():
+    breaker = _half_open("test-lost")
+    breaker.probe_timeout_s = 0.05
+    assert breaker.allow() and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
@@ -0,0 +1,58 @@
+"""
+A pre-empted prefetch leaves nothing behind: no limiter permits, no agent
+thread still running
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inference
+from agents.llm import GuardedChatModel
+from benchmarks.fakes import FakeGemini, LatencyModel
+from core.limiter import llm_limiter
+from core.prefetch import Prefetcher
+from core.state import SearchState
+
+
+def test_preempted_prefetch_releases_llm_permits(monkeypatch):
+    llm = GuardedChatModel(inner=FakeGemini(latency=LatencyModel.parse("const:5000")),
+                           priority=0, breaker_name="test-prefetch")
+
+    async def run_backend(query, job_id=""):
+        return await llm.ainvoke(f"FilmScout: {query}")
+
+    monkeypatch.setattr(inference, "run_backend", run_backend)
+    prefetcher = Prefetcher(sources=[])
+    busy = iter([False, True])
+    monkeypatch.setattr(prefetcher, "foreground_busy", lambda: next(busy, True))
+    monkeypatch.setattr("core.prefetch.CHECK_INTERVAL_S", 0.1)
+
+    assert asyncio.run(prefetcher._run_one("noir", 0)) is False
+    assert llm_limiter.in_flight == 0
+
+
+def test_cancelled_scout_stops_the_agent_thread(monkeypatch):
+    stopped = threading.Event()
+
+    async def run_vid_agent(prompt, callbacks, stop=None):
+        def agent():
+            # One "step" at a time until told to stop
+            while not stop.wait(0.01):
+                pass
+            stopped.set()
+        await asyncio.to_thread(agent)
+        return ""
+
+    monkeypatch.setattr(inference, "run_vid_agent", run_vid_agent)
+
+    async def go():
+        task = asyncio.create_task(inference._scout(SearchState(query="q"), {"title": "Detour"}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(go())
+    assert stopped.wait(1.0)
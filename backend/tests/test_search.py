@@ -0,0 +1,26 @@
+"""
+search_exa bookkeeping: rejected URLs drop out, the rest become candidates
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.cache import search_cache
+from core.state import SearchState, clear_current_state, set_current_state
+from tools import search
+from tools.canonical import canonicalize
+
+
+def test_bad_urls_are_skipped_and_the_rest_line_up(monkeypatch):
+    monkeypatch.setattr(search, "ranker", None)
+    state = SearchState(query="q", job_id="test-search")
+    state.verdicts[canonicalize("https://a.com/x")] = "BAD"
+    search_cache.set(("detour 1945", 20), ["https://a.com/x", "https://b.com/y", "https://c.com/z"])
+    set_current_state(state)
+    try:
+        search.search_exa("Detour 1945")
+    finally:
+        clear_current_state()
+    assert state.candidates == ["https://b.com/y", "https://c.com/z"]
+    assert state.seen_urls == {canonicalize("https://b.com/y"), canonicalize("https://c.com/z")}
@@ -0,0 +1,94 @@
+"""
+Single-flight: concurrent callers share one call, its result and its error
+"""
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def fn():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "value"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, "key", fn)
+        started.wait(1)
+        followers = [pool.submit(flight.do, "key", fn) for _ in range(3)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ["value"] * 4
+    assert len(calls) == 1
+    assert flight.do("key", fn) == "value" and len(calls) == 2   # nothing kept
+
+
+def test_coroutines_share_result_and_error():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def fn(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    async def main():
+        shared = await asyncio.gather(*(flight.do("ok", lambda: fn("value")) for _ in range(3)))
+        failed = await asyncio.gather(*(flight.do("bad", lambda: fn(ValueError("boom"))) for _ in range(3)),
+                                      return_exceptions=True)
+        return shared, failed
+
+    shared, failed = asyncio.run(main())
+    assert shared == ["value"] * 3
+    assert all(isinstance(e, ValueError) for e in failed)
+    assert len(calls) == 2
+
+
+def test_keep_results_reuses_the_value():
+    flight = AsyncSingleFlight("test", keep_results=True)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        return await flight.do("key", fn), await flight.do("key", fn)
+
+    assert asyncio.run(main()) == (1, 1)
+
+
+def test_cancelled_leader_frees_the_key():
+    flight = AsyncSingleFlight("test")
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await flight.do("key", fast)
+
+    assert asyncio.run(main()) == "value"
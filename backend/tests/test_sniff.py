@@ -0,0 +1,61 @@
+"""
+Sniffing verdicts over the fixtures in benchmarks/bench_sniff.py
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_sniff import FIXTURES, _Handler
+from tools.sniff import HTML, MP4, UNKNOWN, sniff
+
+
+@pytest.mark.parametrize("path", sorted(FIXTURES))
+def test_fixture_prefix(path):
+    ctype, body, _, expected = FIXTURES[path]
+    assert sniff(body[:8192], ctype).playable is expected
+
+
+@pytest.mark.parametrize("body", [b"See free versions", b"Tom skip to the end", b"    wide shots"])
+def test_box_type_in_text_is_not_mp4(body):
+    assert sniff(body, "text/plain").kind == UNKNOWN
+
+
+def test_box_size_forms():
+    assert sniff(b"\x00\x00\x00\x01mdat" + bytes(8)).kind == MP4
+    assert sniff(b"\x00\x00\x00\x00mdat").kind == MP4
+    assert sniff(b"\x00\x00\x00\x04ftypisom").kind != MP4
+
+
+def test_html_without_player():
+    assert sniff(b"<html><body>video</body></html>").kind == HTML
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    from http.server import ThreadingHTTPServer
+    from tools import http
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    http.close()
+
+
+@pytest.mark.parametrize("path", sorted(FIXTURES))
+def test_sniff_check(base_url, path):
+    from core.breaker import breakers
+    from tools import validation
+    breakers.host("127.0.0.1").record(True, 0.0)
+    assert validation._sniff_ok(base_url + path) == ("OK" if FIXTURES[path][3] else "BAD")
+
+
+def test_sniff_mode_reads_heuristic_urls():
+    from tools.validation import _precheck
+    assert _precheck("https://example.com/video/detour")[0] == "OK"
+    assert _precheck("https://example.com/video/detour", sniffing=True)[0] is None
+    assert _precheck("https://fmovies.to/film/detour", sniffing=True)[0] is None
+    assert _precheck("https://archive.org/details/Detour", sniffing=True)[0] == "OK"
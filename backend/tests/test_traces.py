@@ -0,0 +1,24 @@
+"""
+The trace archive keeps only its newest segments
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.traces import TraceArchive, TraceReader
+
+
+def test_old_segments_are_pruned(tmp_path):
+    # Every record overflows the tiny segment, so each one rotates
+    archive = TraceArchive(directory=str(tmp_path), segment_mb=0.0001, max_segments=2)
+    for i in range(5):
+        archive.submit({"job_id": f"job-{i}", "query": "x" * 200, "events": [], "finished_at": 0})
+    archive.close()
+
+    segments = [n for n in os.listdir(tmp_path) if n.startswith("traces-")]
+    assert len(segments) == 2
+    reader = TraceReader(str(tmp_path))
+    assert reader.get("job-0") is None
+    assert reader.get("job-4")["job_id"] == "job-4"
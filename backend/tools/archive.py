@@ -0,0 +1,148 @@
+"""
+archive.org fast path: a film's title and year to a direct video file
+"""
+import difflib
+import math
+import re
+import time
+import unicodedata
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import quote
+
+from core.breaker import breakers
+from core.cache import archive_cache
+from core.config import ARCHIVE_BASE_URL, ARCHIVE_MIN_SCORE, ARCHIVE_ROWS
+from core.logging import get_logger
+from core.metrics import metrics
+from tools import http
+
+logger = get_logger("archive")
+
+# Derivatives browsers play directly, best first
+PLAYABLE_FORMATS = ("h.264", "h.264 IA", "512Kb MPEG4", "MPEG4", "HiRes MPEG4", "WebM", "Ogg Video")
+_FORMAT_RANK = {f.lower(): i for i, f in enumerate(PLAYABLE_FORMATS)}
+
+_LUCENE_SPECIAL = re.compile(r'[+\-!(){}\[\]^"~*?:\\/&|]')
+_ARTICLE = re.compile(r"^(?:the|a|an) ")
+_YEAR = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+# Items that are about a film rather than the film itself
+_NOT_FEATURE = re.compile(r"\b(?:trailer|teaser|clip|preview|review|featurette|soundtrack)s?\b")
+
+
+class ArchiveHit(NamedTuple):
+    identifier: str
+    title: str
+    year: Optional[int]
+    file: str
+    url: str
+    score: float
+
+
+def _norm(title: str) -> str:
+    text = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode().lower()
+    text = " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+    return _ARTICLE.sub("", text)
+
+
+def _year(value: Any) -> Optional[int]:
+    match = _YEAR.search(str(value or ""))
+    return int(match.group(1)) if match else None
+
+
+def _first(value: Any) -> str:
+    """archive.org fields are a string or a list of strings"""
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    return str(value or "")
+
+
+def score(doc: Dict[str, Any], title: str, year: Optional[int]) -> float:
+    """Title similarity in [0, 1], adjusted for the year and, slightly,
+    for popularity. A title that opens with the wanted one ("Nosferatu,
+    eine Symphonie des Grauens") counts as a near match."""
+    wanted, name = _norm(title), _norm(_first(doc.get("title")))
+    s = difflib.SequenceMatcher(None, wanted, name).ratio()
+    if wanted and name.startswith(wanted + " "):
+        s = max(s, 0.8)
+    if _NOT_FEATURE.search(name) and not _NOT_FEATURE.search(wanted):
+        s -= 0.5
+    doc_year = _year(doc.get("year") or doc.get("date"))
+    if year and doc_year:
+        gap = abs(year - doc_year)
+        s += 0.15 if gap == 0 else 0.05 if gap == 1 else -0.25
+    downloads = doc.get("downloads") or 0
+    return s + min(math.log10(1 + float(downloads)) / 100, 0.05)
+
+
+def pick_file(files: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The most widely playable video file in an item's file list"""
+    playable = [f for f in files if str(f.get("format", "")).lower() in _FORMAT_RANK]
+    if not playable:
+        return None
+    return min(playable, key=lambda f: (_FORMAT_RANK[str(f["format"]).lower()], f.get("name", "")))
+
+
+def _search(title: str) -> List[Dict[str, Any]]:
+    words = _LUCENE_SPECIAL.sub(" ", title).strip()
+    params = {
+        "q": f"title:({words}) AND mediatype:(movies)",
+        "fl[]": ["identifier", "title", "year", "date", "downloads"],
+        "rows": ARCHIVE_ROWS,
+        "output": "json",
+    }
+    r = http.client().get(f"{ARCHIVE_BASE_URL}/advancedsearch.php", params=params)
+    r.raise_for_status()
+    return r.json().get("response", {}).get("docs", [])
+
+
+def _files(identifier: str) -> List[Dict[str, Any]]:
+    r = http.client().get(f"{ARCHIVE_BASE_URL}/metadata/{quote(identifier)}/files")
+    r.raise_for_status()
+    return r.json().get("result", [])
+
+
+def _lookup(title: str, year: Optional[int]) -> Optional[ArchiveHit]:
+    docs = _search(title)
+    if not docs:
+        return None
+    best = max(docs, key=lambda d: score(d, title, year))
+    best_score = score(best, title, year)
+    if best_score < ARCHIVE_MIN_SCORE:
+        logger.debug("Best archive.org match for %r scored %.2f: %s", title, best_score,
+                     best.get("identifier"), extra={"stage": "archive"})
+        return None
+    identifier = best["identifier"]
+    chosen = pick_file(_files(identifier))
+    if chosen is None:
+        return None
+    url = f"{ARCHIVE_BASE_URL}/download/{quote(identifier)}/{quote(chosen['name'])}"
+    return ArchiveHit(identifier, _first(best.get("title")), _year(best.get("year") or best.get("date")),
+                      chosen["name"], url, round(best_score, 3))
+
+
+def resolve(title: str, year: Any = None) -> Optional[ArchiveHit]:
+    """A direct file URL for the film on archive.org, in at most two calls
+    (advanced search, then the item's file list); None when there is no
+    confident match. Blocking; run it in a worker thread."""
+    year = _year(year)
+    key = (_norm(title), year)
+    cached = archive_cache.get(key)
+    if cached is not None:
+        return cached or None
+
+    breaker = breakers.get("archive")
+    if not breaker.allow():
+        metrics.inc("archive_resolve_total", result="unavailable")
+        return None
+    started = time.monotonic()
+    try:
+        hit = _lookup(title, year)
+    except Exception as e:
+        breaker.record(False, time.monotonic() - started)
+        metrics.inc("archive_resolve_total", result="error")
+        logger.info("archive.org lookup failed for %r: %s", title, e, extra={"stage": "archive"})
+        return None
+    breaker.record(True, time.monotonic() - started)
+    metrics.inc("archive_resolve_total", result="hit" if hit else "miss")
+    archive_cache.set(key, hit or False)
+    return hit
@@ -0,0 +1,163 @@
+"""
+URL canonicalization and de-duplication
+"""
+import hashlib
+import math
+import re
+import threading
+import time
+from typing import Iterable, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change what a page plays
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "referrer", "source", "si", "feature",
+    "spm", "share", "app", "pp", "ab_channel", "_ga", "yclid",
+})
+TRACKING_PREFIXES = ("utm_",)
+
+_YT_ID = re.compile(r"^[A-Za-z0-9_-]{6,}$")
+_TRAILING_JUNK = ".,;:!?)]}>'\""
+
+
+def _youtube_id(host: str, path: str, query: dict) -> Optional[str]:
+    if host == "youtu.be":
+        vid = path.strip("/").split("/")[0]
+    elif path == "/watch":
+        vid = query.get("v", "")
+    else:
+        parts = path.strip("/").split("/")
+        vid = parts[1] if len(parts) > 1 and parts[0] in ("embed", "shorts", "v", "live") else ""
+    return vid if _YT_ID.match(vid) else None
+
+
+def canonicalize(url: str, keep_scheme: bool = False) -> str:
+    """Map URL variants of the same video to one key.
+
+    The key is itself a working URL: https, no ``www.`` (except YouTube's
+    canonical form), no fragment, no tracking parameters, sorted query and
+    per-site rewrites (youtu.be/embed/shorts -> watch?v=, archive.org
+    embed -> details, player.vimeo.com/video -> vimeo.com). With
+    ``keep_scheme`` an ``http`` URL on an unknown site stays ``http``, for
+    handing back to callers that will fetch it.
+    """
+    url = url.strip().rstrip(_TRAILING_JUNK)
+    try:
+        parts = urlsplit(url if "://" in url else "https://" + url)
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https"):
+        return url
+
+    host = (parts.hostname or "").rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m.") and host[2:] in ("youtube.com", "vimeo.com", "dailymotion.com"):
+        host = host[2:]
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    pairs = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+
+    if host in ("youtube.com", "youtu.be", "youtube-nocookie.com"):
+        vid = _youtube_id(host, path, dict(pairs))
+        if vid:
+            return f"https://www.youtube.com/watch?v={vid}"
+    elif host in ("archive.org", "ia.archive.org"):
+        segs = path.strip("/").split("/")
+        if len(segs) >= 2 and segs[0] in ("details", "embed"):
+            return f"https://archive.org/details/{segs[1]}"
+    elif host == "player.vimeo.com":
+        segs = path.strip("/").split("/")
+        if len(segs) >= 2 and segs[0] == "video" and segs[1].isdigit():
+            return f"https://vimeo.com/{segs[1]}"
+
+    query = urlencode(sorted(pairs))
+    return urlunsplit((scheme if keep_scheme else "https", netloc, path, query, ""))
+
+
+def dedupe(urls: Iterable[str], seen: Optional[Set[str]] = None) -> List[str]:
+    """Canonicalize and drop repeats, keeping first-seen order.
+
+    Keys already in ``seen`` are skipped; new keys are added to it, so the
+    same set can be threaded through every search in a job. Returned URLs
+    are canonical but keep their original scheme.
+    """
+    seen = set() if seen is None else seen
+    out = []
+    for url in urls:
+        key = canonicalize(url)
+        if key not in seen:
+            seen.add(key)
+            out.append(canonicalize(url, keep_scheme=True))
+    return out
+
+
+class BloomFilter:
+    """Compact, thread-safe set membership with a bounded false-positive rate.
+
+    Keeps two generations: once ``capacity`` keys have been added, or the
+    current bit array is ``max_age_s`` old, it becomes the previous one and
+    a fresh one starts, so memory stays fixed and old entries age out. With
+    ``max_age_s`` set a key is remembered for between one and two max ages.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001,
+                 max_age_s: Optional[float] = None):
+        self.capacity = capacity
+        self.max_age_s = max_age_s
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._current = bytearray((self.size + 7) // 8)
+        self._previous: Optional[bytearray] = None
+        self._count = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    @staticmethod
+    def _has(bits: bytearray, positions: List[int]) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def _rotate(self) -> None:
+        """Swap generations when full or expired; call with the lock held"""
+        age = time.monotonic() - self._started
+        if self.max_age_s is not None and age >= 2 * self.max_age_s:
+            # Both generations expired while idle
+            self._previous = None
+        elif self._count < self.capacity and (self.max_age_s is None or age < self.max_age_s):
+            return
+        else:
+            self._previous = self._current
+        self._current = bytearray(len(self._current))
+        self._count = 0
+        self._started = time.monotonic()
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate()
+            for p in positions:
+                self._current[p >> 3] |= 1 << (p & 7)
+            self._count += 1
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate()
+            if self._has(self._current, positions):
+                return True
+            return self._previous is not None and self._has(self._previous, positions)
@@ -0,0 +1,100 @@
+"""
+Domain classification for candidate URLs
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Tuple
+
+from core.config import (
+    TRUSTED_DOMAINS,
+    TRUSTED_BRANDS,
+    MEDIA_EXTENSIONS,
+    HEURISTIC_PATH_RE,
+    HEURISTIC_HOST_RE,
+)
+
+TRUSTED = "trusted_host"
+HEURISTIC = "heuristic"
+UNKNOWN = "unknown"
+
+# Lower sorts first when ranking
+CLASS_RANK = {TRUSTED: 0, HEURISTIC: 1, UNKNOWN: 2}
+
+
+class UrlClass(NamedTuple):
+    kind: str
+    host: str
+    rule: str = ""
+
+    @property
+    def rank(self) -> int:
+        return CLASS_RANK[self.kind]
+
+    @property
+    def trusted(self) -> bool:
+        return self.kind == TRUSTED
+
+
+# optional scheme, then netloc, then path and query up to any fragment
+_URL_RE = re.compile(r"(?:[^:/?#]+://)?([^/?#]*)([^#]*)")
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Return (host, path) without the scheme, userinfo, port or fragment"""
+    netloc, path = _URL_RE.match(url).groups()
+    if "@" in netloc:
+        netloc = netloc.rpartition("@")[2]
+    if ":" in netloc:
+        netloc = netloc.partition(":")[0]
+    return netloc.lower().rstrip("."), path
+
+
+@lru_cache(maxsize=4096)
+def _host_rule(host: str) -> Tuple[str, str]:
+    """Classify a host on its own: (TRUSTED, rule) or (UNKNOWN, first label).
+
+    Walks the host's suffixes from longest to shortest, so a subdomain of a
+    known domain matches with one set lookup per label.
+    """
+    suffix = host
+    while suffix:
+        if suffix in TRUSTED_DOMAINS:
+            return TRUSTED, suffix
+        suffix = suffix.partition(".")[2]
+
+    first, _, rest = host.partition(".")
+    if first == "www" and "." in rest:
+        first = rest.partition(".")[0]
+    if first in TRUSTED_BRANDS:
+        return TRUSTED, f"{first}.*"
+    return UNKNOWN, first
+
+
+def _classify(url: str) -> UrlClass:
+    host, path = split_url(url)
+    if not host:
+        return UrlClass(UNKNOWN, host)
+
+    kind, rule = _host_rule(host)
+    if kind == TRUSTED:
+        return UrlClass(TRUSTED, host, rule)
+
+    path = path.partition("?")[0]
+    if path.lower().endswith(MEDIA_EXTENSIONS):
+        return UrlClass(HEURISTIC, host, "media-extension")
+    if HEURISTIC_PATH_RE.search(path):
+        return UrlClass(HEURISTIC, host, "path")
+    if HEURISTIC_HOST_RE.match(rule):
+        return UrlClass(HEURISTIC, host, "host")
+    return UrlClass(UNKNOWN, host)
+
+
+@lru_cache(maxsize=8192)
+def classify_url(url: str) -> UrlClass:
+    """Classify a URL as a trusted host, a heuristic match or unknown"""
+    return _classify(url)
+
+
+def rank_urls(urls: Iterable[str]) -> List[str]:
+    """Stable-sort URLs so trusted hosts come first, then heuristic matches"""
+    return sorted(urls, key=lambda u: classify_url(u).rank)
@@ -0,0 +1,62 @@
+"""
+Shared outbound HTTP client for URL checks
+"""
+import threading
+from typing import NamedTuple, Optional
+
+from core.config import HTTP_TIMEOUT_S, HTTP_MAX_CONNECTIONS
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+_client = None
+_lock = threading.Lock()
+
+
+class Prefix(NamedTuple):
+    status: int
+    content_type: str
+    body: bytes
+    url: str        # after redirects
+
+
+def client():
+    """The process-wide ``httpx.Client``; thread-safe, so validation threads
+    share its connection pool (httpx imported here to keep startup fast)"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import httpx
+                _client = httpx.Client(
+                    timeout=HTTP_TIMEOUT_S,
+                    follow_redirects=True,
+                    headers={"User-Agent": USER_AGENT},
+                    limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                        max_keepalive_connections=HTTP_MAX_CONNECTIONS // 4),
+                )
+    return _client
+
+
+def get_prefix(url: str, max_bytes: int) -> Prefix:
+    """Ranged GET of the first ``max_bytes`` of ``url``.
+
+    Reading stops at ``max_bytes`` even when the server ignores the Range
+    header; the connection is then dropped rather than drained. The body is
+    requested uncompressed so the budget counts bytes on the wire.
+    """
+    headers = {"Range": f"bytes=0-{max_bytes - 1}", "Accept-Encoding": "identity"}
+    body = bytearray()
+    with client().stream("GET", url, headers=headers) as r:
+        for chunk in r.iter_raw():
+            body += chunk[:max_bytes - len(body)]
+            if len(body) >= max_bytes:
+                break
+        return Prefix(r.status_code, r.headers.get("content-type", ""), bytes(body), str(r.url))
+
+
+def close() -> None:
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
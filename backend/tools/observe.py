@@ -0,0 +1,66 @@
+"""
+Compact agent observations
+"""
+import re
+from typing import List, Tuple
+
+from core.config import OBS_TOP_K, OBS_SHORTEN_URLS
+from core.limiter import estimate_tokens
+from core.metrics import metrics
+from tools.canonical import canonicalize
+
+_SCHEME_RE = re.compile(r"^https://(?:www\.)?", re.I)
+
+
+def shorten_url(url: str) -> str:
+    """Drop ``https://`` and ``www.``; ``http`` URLs are left whole so they
+    can't be mistaken for https ones"""
+    return _SCHEME_RE.sub("", url) if OBS_SHORTEN_URLS else url
+
+
+def expand_url(url: str, state=None) -> str:
+    """Undo shorten_url for a URL the agent passed back"""
+    url = url.strip().strip("<>\"'`")
+    if state is not None and url in state.url_aliases:
+        return state.url_aliases[url]
+    return url if "://" in url else "https://" + url
+
+
+def _verdict_rank(key: str) -> int:
+    from tools.validation import VERIFIED_OK, VERIFIED_BAD
+    if key in VERIFIED_OK:
+        return 0
+    if key in VERIFIED_BAD:
+        return 2
+    return 1
+
+
+def format_urls(urls: List[str], raw: str, state=None, top_k: int = OBS_TOP_K) -> Tuple[str, int]:
+    """Top ``top_k`` of ``urls`` as a compact observation.
+
+    ``urls`` should already be de-duplicated and ranked. Verdicts from
+    earlier jobs move known-good URLs to the front and known-bad ones to
+    the back, keeping the incoming order otherwise. Returns the observation and
+    the estimated prompt tokens saved against ``raw``, the text the agent
+    would otherwise have seen.
+    """
+    keyed = [(u, canonicalize(u)) for u in urls]
+    keyed.sort(key=lambda uk: _verdict_rank(uk[1]))
+
+    shown = []
+    for url, _ in keyed[:top_k]:
+        short = shorten_url(url)
+        if state is not None and short != url:
+            state.url_aliases[short] = url
+        shown.append(short)
+    hidden = len(keyed) - len(shown)
+    if hidden > 0:
+        shown.append(f"(+{hidden} more; search again if none of these play)")
+    text = "\n".join(shown)
+
+    saved = max(0, estimate_tokens(raw, completion=0) - estimate_tokens(text, completion=0))
+    metrics.observe("observation_tokens_saved", saved)
+    if state is not None:
+        state.obs_tokens_saved += saved
+    return text, saved
+
@@ -0,0 +1,148 @@
+"""
+Online ranking of candidate URLs from past validation verdicts
+"""
+import os
+import threading
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from core.config import (
+    RANKER_ENABLED,
+    RANKER_PATH,
+    RANKER_DIM,
+    RANKER_PRIOR_STRENGTH,
+    RANKER_SAVE_EVERY,
+)
+from core.logging import get_logger
+from core.metrics import metrics
+from tools.classify import TRUSTED, HEURISTIC, classify_url, split_url
+
+logger = get_logger("ranker")
+_STAGE = {"stage": "ranker"}
+
+# Prior mean playability per domain class, before any verdicts
+CLASS_PRIOR = {TRUSTED: 0.9, HEURISTIC: 0.6}
+UNKNOWN_PRIOR = 0.3
+
+_LISTING_WORDS = ("search", "results", "tag", "tags", "category", "list", "browse")
+
+
+def url_features(url: str) -> List[str]:
+    """What the ranker learns from: host, site, domain class and URL shape"""
+    verdict = classify_url(url)
+    host, path = split_url(url)
+    if host.startswith("www."):
+        host = host[4:]
+    site = ".".join(host.rsplit(".", 2)[-2:])
+    path, _, query = path.partition("?")
+    segs = [s for s in path.split("/") if s]
+    head = segs[0].lower() if segs else ""
+    ext = segs[-1].rpartition(".")[2].lower() if segs and "." in segs[-1] else ""
+    shape = "listing" if head in _LISTING_WORDS or "q=" in query else f"depth{min(len(segs), 4)}"
+    return [
+        "host:" + host,
+        "site:" + site,
+        "class:" + verdict.kind + ":" + verdict.rule,
+        "prefix:" + site + "/" + head,
+        "shape:" + shape + (":query" if query else ""),
+        "ext:" + ext,
+    ]
+
+
+class UrlRanker:
+    """Thompson sampling over hashed per-feature verdict counts.
+
+    Each feature of a URL (see ``url_features``) hashes to one of ``dim``
+    slots holding its OK and BAD counts. A URL's posterior is a Beta whose
+    prior mean comes from its domain class (``prior_strength`` pseudo
+    verdicts) plus the mean counts of its features; ``rank`` draws one
+    sample per URL and sorts by it, so well-proven URL shapes go first
+    while untried ones still get checked now and then. ``update`` is called
+    with every fresh verdict and the counts are saved to ``path`` every
+    ``save_every`` updates and on ``save``.
+    """
+
+    def __init__(self, path: str = RANKER_PATH, dim: int = RANKER_DIM,
+                 prior_strength: float = RANKER_PRIOR_STRENGTH, save_every: int = RANKER_SAVE_EVERY):
+        self.path = path
+        self.dim = dim
+        self.prior_strength = prior_strength
+        self.save_every = save_every
+        self.ok = np.zeros(dim)
+        self.bad = np.zeros(dim)
+        self._unsaved = 0
+        self._rng = np.random.default_rng()
+        self._lock = threading.Lock()
+
+    def _index(self, urls: List[str]) -> np.ndarray:
+        return np.array([[zlib.crc32(f.encode()) % self.dim for f in url_features(u)] for u in urls])
+
+    def _prior(self, urls: List[str]) -> np.ndarray:
+        return np.array([CLASS_PRIOR.get(classify_url(u).kind, UNKNOWN_PRIOR) for u in urls])
+
+    def scores(self, urls: List[str], sample: bool = True) -> np.ndarray:
+        """Sampled (or, with ``sample=False``, mean) playability per URL"""
+        idx = self._index(urls)
+        prior = self._prior(urls)
+        with self._lock:
+            ok = self.ok[idx].mean(axis=1)
+            bad = self.bad[idx].mean(axis=1)
+        a = prior * self.prior_strength + ok
+        b = (1 - prior) * self.prior_strength + bad
+        if not sample:
+            return a / (a + b)
+        with self._lock:
+            return self._rng.beta(a, b)
+
+    def rank(self, urls: List[str]) -> List[str]:
+        if len(urls) < 2:
+            return list(urls)
+        order = np.argsort(-self.scores(urls), kind="stable")
+        return [urls[i] for i in order]
+
+    def update(self, url: str, ok: bool) -> None:
+        idx = self._index([url])[0]
+        with self._lock:
+            np.add.at(self.ok if ok else self.bad, idx, 1.0)
+            self._unsaved += 1
+            due = self.save_every > 0 and self._unsaved >= self.save_every
+        metrics.inc("ranker_updates_total", verdict="ok" if ok else "bad")
+        if due:
+            self.save()
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                ok, bad = data["ok"], data["bad"]
+        except Exception as e:
+            logger.warning("Could not load URL ranker from %s: %s", self.path, e, extra=_STAGE)
+            return False
+        if ok.shape != (self.dim,):
+            logger.warning("Ignoring URL ranker at %s: dim %d != %d", self.path, ok.shape[0], self.dim,
+                           extra=_STAGE)
+            return False
+        with self._lock:
+            self.ok, self.bad = ok.astype(float), bad.astype(float)
+            self._unsaved = 0
+        return True
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            ok, bad = self.ok.copy(), self.bad.copy()
+            self._unsaved = 0
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, ok=ok, bad=bad)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("Could not save URL ranker to %s: %s", self.path, e, extra=_STAGE)
+
+
+ranker: Optional[UrlRanker] = UrlRanker() if RANKER_ENABLED else None
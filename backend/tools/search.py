@@ -1,37 +1,101 @@
-from exa_py import Exa
-from core.config import EXA_API_KEY
+import logging
+import time
+from typing import List, Optional
+from core.breaker import breakers
+from core.cache import search_cache
+from core.config import HEDGE_EXA, require_env
+from core.hedge import Hedger
+from core.registry import registry
+from core.singleflight import SingleFlight
 from core.state import get_current_state
-from core.logging import logger
+from core.logging import get_logger
+from tools.canonical import canonicalize, dedupe
+from tools.classify import rank_urls
+from tools.observe import format_urls
+from tools.ranker import ranker
 
-exa = Exa(api_key=EXA_API_KEY)
+def _build_exa():
+    from exa_py import Exa
+    return Exa(api_key=require_env("EXA_API_KEY"))
+
+registry.register("exa", _build_exa)
+
+logger = get_logger("search")
+
+_hedger = Hedger("exa")
+_flight = SingleFlight("exa")   # jobs searching the same thing at once share one call
+
+# Observation returned while the Exa breaker is open
+EXA_UNAVAILABLE = ("Search is temporarily unavailable. Check URLs from earlier "
+                   "searches with check_playable, or finish if none are left.")
+
+def _search_exa_raw(query: str, k: int, current_state) -> Optional[List[str]]:
+    """Exa result URLs, or None while the Exa breaker is open"""
+    # Fail fast while Exa is degraded so the agent can work with the URLs
+    # it already has instead of burning an iteration on a timeout
+    breaker = breakers.get("exa")
+    if not breaker.allow():
+        logger.warning("Exa circuit open, skipping search: %r", query, extra={"stage": "search"})
+        return None
+    
+    started = time.monotonic()
+    try:
+        exa = registry.get("exa")
+        call = lambda: exa.search(query=query, num_results=k).results
+        results = _hedger.call(call) if HEDGE_EXA else call()
+    except Exception:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(True, time.monotonic() - started)
+    if current_state:
+        current_state.add_timing("search", time.monotonic() - started)
+    return [r.url for r in results]
 
 def search_exa(query: str, k: int = 20) -> str:
     """Fixed search function that actually works"""
     current_state = get_current_state()
     
     try:
-        print(f"🔧 DEBUG: search_exa called with: '{query}'")
-        print(f"🔧 DEBUG: current_state exists: {current_state is not None}")
+        logger.debug("search_exa called with %r", query, extra={"stage": "search"})
+        
+        # Popular titles repeat the same searches; keep raw Exa URLs a while
+        cache_key = (query.strip().lower(), k)
+        raw_urls = search_cache.get(cache_key)
+        if raw_urls is None:
+            raw_urls = _flight.do(cache_key, lambda: _search_exa_raw(query, k, current_state))
+            if raw_urls is None:
+                return EXA_UNAVAILABLE
+            search_cache.set(cache_key, raw_urls)
         
-        # Always try the search regardless of state
-        results = exa.search(query=query, num_results=k).results
-        urls = [r.url for r in results]
+        # One entry per canonical URL, minus anything already rejected in
+        # this job; likeliest to play first (learned from past verdicts, or
+        # known hosts first) so the agent's first pick is the best bet
+        urls = dedupe(raw_urls)
+        urls = ranker.rank(urls) if ranker else rank_urls(urls)
+        if current_state:
+            pairs = [(u, canonicalize(u)) for u in urls]
+            pairs = [(u, key) for u, key in pairs if current_state.verdicts.get(key) != "BAD"]
+            urls = [u for u, _ in pairs]
+            for u, key in pairs:
+                if key not in current_state.seen_urls:
+                    current_state.seen_urls.add(key)
+                    current_state.candidates.append(u)
         
-        print(f"🔧 DEBUG: Found {len(urls)} URLs from Exa")
+        # Ranked, truncated and shortened: this text is replayed in every
+        # later agent prompt
+        observation, saved = format_urls(urls, "\n".join(raw_urls), current_state)
         
-        # Log to console for debugging
         if urls:
-            print(f"🔍 Found {len(urls)} URLs:")
-            for i, url in enumerate(urls[:10]):
-                print(f"  {i+1:2d}. {url}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Found %d URLs for %r (observation saved ~%d tokens)", len(urls), query, saved,
+                             extra={"stage": "search", "urls": observation.splitlines()})
         else:
-            print(f"⚠️ No URLs found for: '{query}'")
+            logger.info("No URLs found for %r", query, extra={"stage": "search"})
             
-        return "\n".join(urls)
+        return observation
         
     except Exception as e:
-        print(f"❌ Exa search failed: {e}")
-        logger.error(f"Exa search failed for '{query}': {e}")
+        logger.error("Exa search failed for %r: %s", query, e, extra={"stage": "search"})
         return ""
 
 """
@@ -0,0 +1,86 @@
+"""
+Container and player signatures in the first bytes of a response
+"""
+import re
+from typing import NamedTuple
+
+MP4 = "mp4"
+WEBM = "webm"
+MATROSKA = "matroska"
+HLS = "hls"
+DASH = "dash"
+EMBED = "embed"
+MEDIA_TYPE = "media_type"
+HTML = "html"
+UNKNOWN = "unknown"
+
+# ISO-BMFF box types that can open an MP4 / QuickTime file
+_BMFF_BOXES = (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip")
+# Larger leading boxes use the 64-bit size; text has bytes >= 0x20 up front
+_BMFF_MAX_SIZE = 1 << 28
+_EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+
+# A player for a single title, not a link to a site
+_EMBED_RE = re.compile(
+    rb"""(?:src|href|content)\s*=\s*["']?(?:https?:)?//(?:www\.)?"""
+    rb"""(archive\.org/(?:embed|download)/[^"'\s>]+"""
+    rb"""|(?:youtube\.com|youtube-nocookie\.com)/embed/[\w-]{6,}"""
+    rb"""|youtu\.be/[\w-]{6,})""",
+    re.I,
+)
+_VIDEO_SRC_RE = re.compile(
+    rb"""<(?:video|source)\b[^>]*\bsrc\s*=\s*["']?[^"'\s>]+\.(?:mp4|m4v|webm|mkv|mov|ogv|m3u8|mpd)\b""",
+    re.I,
+)
+
+
+class Sniffed(NamedTuple):
+    kind: str
+    playable: bool
+    detail: str = ""
+
+
+def _text_head(body: bytes) -> bytes:
+    return body.lstrip(b"\xef\xbb\xbf \t\r\n")
+
+
+def _bmff_box(body: bytes) -> bool:
+    """A known box type after a plausible 32-bit box size"""
+    if len(body) < 8 or body[4:8] not in _BMFF_BOXES:
+        return False
+    size = int.from_bytes(body[:4], "big")
+    # 1: a 64-bit size follows; 0: the box runs to the end of the file
+    return size in (0, 1) or 8 <= size < _BMFF_MAX_SIZE
+
+
+def sniff(body: bytes, content_type: str = "") -> Sniffed:
+    """Classify a response from its first bytes; ``content_type`` only
+    decides when the bytes are not recognised"""
+    if _bmff_box(body):
+        brand = body[8:12].decode("latin-1").strip() if body[4:8] == b"ftyp" else ""
+        return Sniffed(MP4, True, brand or body[4:8].decode())
+    if body.startswith(_EBML_MAGIC):
+        if b"webm" in body[:64]:
+            return Sniffed(WEBM, True)
+        return Sniffed(MATROSKA, True)
+
+    head = _text_head(body)
+    if head.startswith(b"#EXTM3U"):
+        return Sniffed(HLS, True)
+    if b"<MPD" in head[:512]:
+        return Sniffed(DASH, True)
+
+    ct = content_type.partition(";")[0].strip().lower()
+    lowered = head[:256].lower()
+    if lowered.startswith((b"<!doctype html", b"<html")) or b"<head" in lowered or ct == "text/html":
+        match = _EMBED_RE.search(body)
+        if match:
+            return Sniffed(EMBED, True, match.group(1).decode("latin-1"))
+        match = _VIDEO_SRC_RE.search(body)
+        if match:
+            return Sniffed(EMBED, True, "video-src")
+        return Sniffed(HTML, False)
+
+    if ct.startswith(("video/", "audio/")):
+        return Sniffed(MEDIA_TYPE, True, ct)
+    return Sniffed(UNKNOWN, False, ct)
@@ -1,30 +1,80 @@
 import asyncio
-import httpx
-from core.config import WHITELIST, PLAYABLE_CT
+import time
+from typing import Optional, Tuple
+from core.breaker import CircuitBreaker, breakers
+from core.config import (
+    VERDICT_BLOOM_CAPACITY, VERDICT_BLOOM_ERROR_RATE, VERDICT_OK_TTL_S, VERDICT_BAD_TTL_S,
+    VALIDATE_MODE, SNIFF_MAX_BYTES,
+)
 from core.state import get_current_state
-from core.logging import logger
+from core.logging import get_logger
+from core.metrics import metrics
+from core.singleflight import SingleFlight
+from tools.observe import expand_url
+from tools.canonical import BloomFilter, canonicalize
+from tools.classify import classify_url, TRUSTED, HEURISTIC
+from tools.ranker import ranker
+from tools import http
+from tools.sniff import sniff
+
+logger = get_logger("validation")
+_STAGE = {"stage": "validation"}
+
+# Verdicts shared across jobs, keyed by canonical URL
+VERIFIED_OK = BloomFilter(VERDICT_BLOOM_CAPACITY, VERDICT_BLOOM_ERROR_RATE, VERDICT_OK_TTL_S)
+VERIFIED_BAD = BloomFilter(VERDICT_BLOOM_CAPACITY, VERDICT_BLOOM_ERROR_RATE, VERDICT_BAD_TTL_S)
+
+# Returned by the checks when the host's breaker is open
+UNAVAILABLE = "UNAVAILABLE"
+# Returned by the checks after a timeout, reset or 5xx: bad for this job,
+# but says nothing lasting about the URL
+UNREACHABLE = "UNREACHABLE"
+
+# Client errors that are about the request or the moment, not the URL
+_TRANSIENT_4XX = (405, 408, 429)
+
+def _failed(status: Optional[int]) -> str:
+    """BAD for a definitive client error, else UNREACHABLE"""
+    if status is not None and 400 <= status < 500 and status not in _TRANSIENT_4XX:
+        return "BAD"
+    return UNREACHABLE
+
+# Jobs checking the same canonical URL at once share one request
+_flight = SingleFlight("validation")
+
+def _precheck(url: str, sniffing: bool = False) -> Tuple[Optional[str], Optional[CircuitBreaker]]:
+    """A verdict that needs no request, else None and the host's breaker.
+
+    When ``sniffing``, only hosts in TRUSTED_DOMAINS pass unread; brand
+    matches (any TLD) and the path/host heuristics are only guesses.
+    """
+    # Known hosts and explicit path/host heuristics
+    verdict = classify_url(url)
+    brand = verdict.rule.endswith(".*")
+    if verdict.kind == TRUSTED and not (sniffing and brand):
+        logger.debug("Trusted host: %s", url, extra=_STAGE)
+        return "OK", None
+    if verdict.kind == HEURISTIC and not sniffing:
+        logger.debug("Streaming heuristic (%s): %s", verdict.rule, url, extra=_STAGE)
+        return "OK", None
+    
+    # Fail fast while this host keeps timing out or erroring
+    breaker = breakers.host(verdict.host)
+    if not breaker.allow():
+        logger.info("Skipping %s: circuit open for %s", url, verdict.host, extra=_STAGE)
+        return UNAVAILABLE, None
+    return None, breaker
 
 async def _head_ok_robust(url: str) -> str:
     """More robust URL checking"""
-    print(f"🔧 Checking URL: {url}")
-    
-    # Whitelist check
-    if WHITELIST.search(url):
-        print(f"✅ URL in whitelist: {url}")
-        return "OK"
-    
-    # Check for known streaming patterns in URL
-    streaming_indicators = [
-        'archive.org', 'youtube.com', 'youtu.be', 'vimeo.com',
-        'movie', 'watch', 'stream', 'video', 'film'
-    ]
-    
-    url_lower = url.lower()
-    if any(indicator in url_lower for indicator in streaming_indicators):
-        print(f"✅ URL contains streaming indicators: {url}")
-        return "OK"
+    result, breaker = _precheck(url)
+    if result:
+        return result
     
-    # Try actual HTTP check
+    # Try actual HTTP check (httpx imported here to keep API startup fast)
+    import httpx
+    started = time.monotonic()
+    status: Optional[int] = None
     try:
         async with httpx.AsyncClient(
             timeout=10,  # Increased timeout
@@ -35,37 +85,100 @@ async def _head_ok_robust(url: str) -> str:
         ) as c:
             try:
                 r = await c.head(url)
+                status = r.status_code
                 if r.status_code in [200, 301, 302]:
-                    print(f"✅ HEAD request successful: {url}")
+                    logger.debug("HEAD ok: %s", url, extra=_STAGE)
                     return "OK"
             except:
                 # If HEAD fails, try GET
                 try:
                     r = await c.get(url, headers={"Range": "bytes=0-1023"})
+                    status = r.status_code
                     if r.status_code in [200, 206]:
-                        print(f"✅ GET request successful: {url}")
+                        logger.debug("Ranged GET ok: %s", url, extra=_STAGE)
                         return "OK"
                 except:
                     pass
     except Exception as e:
-        print(f"❌ HTTP check failed for {url}: {e}")
+        logger.info("HTTP check failed for %s: %s", url, e, extra=_STAGE)
+    finally:
+        breaker.record(status is not None and status < 500, time.monotonic() - started)
     
-    print(f"❌ URL failed all checks: {url}")
-    return "BAD"
+    logger.debug("Failed all checks: %s", url, extra=_STAGE)
+    return _failed(status)
 
-def check_playable(url: str) -> str:
-    """Check if URL is playable"""
-    current_state = get_current_state()
-    
-    print(f"🔧 check_playable called with: {url}")
+def _sniff_ok(url: str) -> str:
+    """One ranged GET of the first SNIFF_MAX_BYTES over the shared client;
+    OK only for a media container, a manifest or an embedded player"""
+    result, breaker = _precheck(url, sniffing=True)
+    if result:
+        return result
     
+    started = time.monotonic()
+    status: Optional[int] = None
     try:
-        result = asyncio.run(_head_ok_robust(url))
-        print(f"🔧 check_playable result: {result}")
-        return result
+        prefix = http.get_prefix(url, SNIFF_MAX_BYTES)
+        status = prefix.status
+        if prefix.status in (200, 206):
+            sniffed = sniff(prefix.body, prefix.content_type)
+            metrics.inc("sniff_total", kind=sniffed.kind)
+            metrics.observe("sniff_bytes", len(prefix.body))
+            logger.debug("Sniffed %s as %s (%s)", url, sniffed.kind, sniffed.detail, extra=_STAGE)
+            # The body itself is not media: as definitive as a 404
+            return "OK" if sniffed.playable else "BAD"
     except Exception as e:
-        print(f"❌ check_playable error: {e}")
+        logger.info("HTTP check failed for %s: %s", url, e, extra=_STAGE)
+    finally:
+        breaker.record(status is not None and status < 500, time.monotonic() - started)
+    return _failed(status)
+
+def _verify(url: str, key: str) -> str:
+    """Run the check and record the verdict once, however many jobs wait on it"""
+    if VALIDATE_MODE == "sniff":
+        result = _sniff_ok(url)
+    else:
+        result = asyncio.run(_head_ok_robust(url))
+    if result in (UNAVAILABLE, UNREACHABLE):
+        # Not a verdict on the URL itself; don't remember it across jobs
         return "BAD"
+    (VERIFIED_OK if result == "OK" else VERIFIED_BAD).add(key)
+    if ranker:
+        ranker.update(url, result == "OK")
+    return result
+
+def check_playable(url: str) -> str:
+    """Check if URL is playable, at most once per canonical URL"""
+    current_state = get_current_state()
+    url = expand_url(url, current_state)
+    key = canonicalize(url)
+    
+    # Same URL (or a variant of it) already checked in this job or recently
+    if current_state and key in current_state.verdicts:
+        return current_state.verdicts[key]
+    if key in VERIFIED_OK:
+        result = "OK"
+    elif key in VERIFIED_BAD:
+        result = "BAD"
+    else:
+        started = time.monotonic()
+        try:
+            result = _flight.do(key, lambda: _verify(url, key))
+        except Exception as e:
+            logger.warning("check_playable error for %s: %s", url, e, extra=_STAGE)
+            return "BAD"
+        finally:
+            if current_state:
+                current_state.add_timing("validation", time.monotonic() - started)
+    
+    if current_state:
+        if not current_state.verdicts:
+            # How often the agent's first pick plays; what ranking is for
+            metrics.inc("first_check_total", result=result.lower())
+        current_state.verdicts[key] = result
+        if result == "BAD":
+            current_state.bad_urls.append(key)
+    logger.debug("check_playable %s -> %s", url, result, extra=_STAGE)
+    return result
 
 # """
 # URL validation and playability checking
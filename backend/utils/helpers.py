@@ -13,4 +13,9 @@ def parse_agent_result(result: str) -> str:
         return result.split(":", 1)[1].strip()
     else:
         m = URL_RE.search(result)
-        return m.group(0) if m else None
\ No newline at end of file
+        return m.group(0) if m else None
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace, so repeats of
+    the same request share one key"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Async load generator for the search API.
+
+Each session posts /api/ask, follows the job over the WebSocket, SSE or by
+polling, and records time-to-first-log, time-to-result and the failure
+kind. Runs closed-loop (fixed concurrency) or open-loop (Poisson arrivals).
+
+    python scripts/load_test.py --sessions 1                      # smoke test
+    python scripts/load_test.py --concurrency 20 --sessions 200 --follow ws
+    python scripts/load_test.py --rate 5 --duration 60 --queries queries.txt
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+
+import httpx
+
+API_BASE = "http://localhost:8000"
+DEFAULT_QUERIES = [
+    "Find me a good evening movie about finance and entrepreneurship.",
+    "A spooky black and white film",
+    "A silent comedy with great stunts",
+]
+TERMINAL = ("completed", "failed")
+
+
+@dataclass
+class Session:
+    query: str
+    client: str = ""
+    job_id: str = ""
+    started: float = 0.0
+    first_log: Optional[float] = None
+    finished: Optional[float] = None
+    outcome: str = "pending"
+
+    @property
+    def ttfl(self) -> Optional[float]:
+        return self.first_log - self.started if self.first_log else None
+
+    @property
+    def ttr(self) -> Optional[float]:
+        return self.finished - self.started if self.finished else None
+
+
+def load_queries(path: Optional[str]) -> List[Tuple[float, str]]:
+    """Read a query mix: one query per line, optionally ``weight<TAB>query``"""
+    if not path:
+        return [(1.0, q) for q in DEFAULT_QUERIES]
+    mix = []
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            weight, sep, query = line.partition("\t")
+            if sep:
+                mix.append((float(weight), query))
+            else:
+                mix.append((1.0, line))
+    return mix
+
+
+async def follow_ws(client: httpx.AsyncClient, s: Session, base: str, timeout: float) -> None:
+    import websockets
+
+    url = base.replace("http", "ws", 1) + f"/api/ws/{s.job_id}"
+    async with websockets.connect(url, open_timeout=timeout) as ws:
+        while True:
+            msg = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+            kind = msg.get("type")
+            if kind == "log" and s.first_log is None:
+                s.first_log = time.perf_counter()
+            elif kind == "result":
+                s.outcome = "ok"
+                return
+            elif kind == "error":
+                s.outcome = "job_error"
+                return
+
+
+async def follow_sse(client: httpx.AsyncClient, s: Session, base: str, timeout: float) -> None:
+    async with client.stream("GET", f"{base}/api/events/{s.job_id}", timeout=timeout) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            msg = json.loads(line[6:])
+            kind = msg.get("type")
+            if kind == "log" and s.first_log is None:
+                s.first_log = time.perf_counter()
+            elif kind == "result":
+                s.outcome = "ok"
+                return
+            elif kind == "error":
+                s.outcome = "job_error"
+                return
+
+
+async def follow_poll(client: httpx.AsyncClient, s: Session, base: str, timeout: float,
+                      interval: float = 0.5) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        if s.first_log is None:
+            logs = await client.get(f"{base}/api/logs/{s.job_id}")
+            if logs.status_code == 200 and logs.json().get("logs"):
+                s.first_log = time.perf_counter()
+        r = await client.get(f"{base}/api/poll/{s.job_id}")
+        r.raise_for_status()
+        status = r.json()["status"]
+        if status in TERMINAL:
+            s.outcome = "ok" if status == "completed" else "job_error"
+            return
+
+
+FOLLOWERS = {"ws": follow_ws, "sse": follow_sse, "poll": follow_poll}
+
+
+async def run_session(client: httpx.AsyncClient, s: Session, args) -> None:
+    s.started = time.perf_counter()
+    try:
+        headers = {"X-API-Key": s.client} if s.client else {}
+        r = await client.post(f"{args.base_url}/api/ask", json={"q": s.query}, headers=headers)
+        if r.status_code != 200:
+            s.outcome = f"http_{r.status_code}"
+            return
+        s.job_id = r.json()["job_id"]
+        await asyncio.wait_for(
+            FOLLOWERS[args.follow](client, s, args.base_url, args.timeout),
+            args.timeout,
+        )
+    except asyncio.TimeoutError:
+        s.outcome = "timeout"
+    except httpx.HTTPError as e:
+        s.outcome = type(e).__name__
+    except Exception as e:
+        s.outcome = f"{args.follow}_{type(e).__name__}"
+    finally:
+        if s.outcome == "ok":
+            s.finished = time.perf_counter()
+
+
+def percentiles(values: List[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(v * 1000 for v in values)
+
+    def pct(p: float) -> float:
+        k = (len(ordered) - 1) * p / 100.0
+        lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+        return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 1)
+
+    return {
+        "p50_ms": pct(50), "p90_ms": pct(90), "p95_ms": pct(95), "p99_ms": pct(99),
+        "max_ms": round(ordered[-1], 1), "mean_ms": round(statistics.fmean(ordered), 1),
+    }
+
+
+def summarize(sessions: List[Session], wall: float, args) -> dict:
+    outcomes = Counter(s.outcome for s in sessions)
+    ok = outcomes.get("ok", 0)
+    return {
+        "follow": args.follow,
+        "mode": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": None if args.rate else args.concurrency,
+        "sessions": len(sessions),
+        "ok": ok,
+        "errors": dict((k, v) for k, v in outcomes.items() if k != "ok"),
+        "wall_s": round(wall, 2),
+        "completed_per_s": round(ok / wall, 3) if wall else 0.0,
+        "time_to_first_log": percentiles([s.ttfl for s in sessions if s.ttfl is not None]),
+        "time_to_result": percentiles([s.ttr for s in sessions if s.ttr is not None]),
+    }
+
+
+def pick_client(args, rng) -> str:
+    """API key for a session, spreading load over --clients identities"""
+    return f"load-test-{rng.randrange(args.clients)}" if args.clients else ""
+
+
+async def closed_loop(client, mix, args, rng) -> List[Session]:
+    sessions: List[Session] = []
+    sem = asyncio.Semaphore(args.concurrency)
+    weights, queries = zip(*mix)
+
+    async def one():
+        async with sem:
+            s = Session(query=rng.choices(queries, weights)[0], client=pick_client(args, rng))
+            sessions.append(s)
+            await run_session(client, s, args)
+
+    await asyncio.gather(*(one() for _ in range(args.sessions)))
+    return sessions
+
+
+async def open_loop(client, mix, args, rng) -> List[Session]:
+    """Start sessions at Poisson arrivals regardless of how many are in flight"""
+    sessions: List[Session] = []
+    tasks = []
+    weights, queries = zip(*mix)
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline and (not args.sessions or len(sessions) < args.sessions):
+        s = Session(query=rng.choices(queries, weights)[0], client=pick_client(args, rng))
+        sessions.append(s)
+        tasks.append(asyncio.create_task(run_session(client, s, args)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    return sessions
+
+
+async def main_async(args) -> dict:
+    rng = random.Random(args.seed)
+    mix = load_queries(args.queries)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        if args.rate:
+            sessions = await open_loop(client, mix, args, rng)
+        else:
+            sessions = await closed_loop(client, mix, args, rng)
+        wall = time.perf_counter() - start
+
+    report = summarize(sessions, wall, args)
+    if args.raw:
+        report["raw"] = [
+            {**asdict(s), "ttfl": s.ttfl, "ttr": s.ttr} for s in sessions
+        ]
+    return report
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Async load generator for the search API")
+    p.add_argument("--base-url", default=API_BASE)
+    p.add_argument("--follow", choices=sorted(FOLLOWERS), default="ws",
+                   help="how each session tracks its job")
+    p.add_argument("--sessions", type=int, default=0,
+                   help="total sessions (closed loop) or cap on sessions (open loop)")
+    p.add_argument("--concurrency", type=int, default=10, help="closed loop: sessions in flight")
+    p.add_argument("--rate", type=float, default=0.0,
+                   help="open loop: mean arrivals per second (enables open loop)")
+    p.add_argument("--duration", type=float, default=60.0, help="open loop: seconds to generate arrivals")
+    p.add_argument("--queries", help="query mix file, one query or weight<TAB>query per line")
+    p.add_argument("--timeout", type=float, default=180.0, help="per-session timeout in seconds")
+    p.add_argument("--clients", type=int, default=0,
+                   help="send an X-API-Key from this many distinct clients (default: none, i.e. one IP)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--raw", action="store_true", help="include per-session records in the report")
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = p.parse_args(argv)
+    if not args.rate and not args.sessions:
+        args.sessions = args.concurrency
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(0 if report["ok"] == report["sessions"] else 1)
+
+
+if __name__ == "__main__":
+    main()